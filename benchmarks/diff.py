@@ -0,0 +1,91 @@
+"""Сравниваем новый дифф хранилища с прежним поэлементным.
+
+Прежний путь — цикл control_state с process_homework_changes, который на
+каждую домашку возвращал и перепривязывал всё хранилище.
+
+    python -m benchmarks.diff --sizes 1000 10000 100000
+"""
+import argparse
+import random
+import time
+
+import homework
+
+STATUSES = list(homework.VERDICT_STATUSES)
+
+
+def legacy_process_homework_changes(new_hw_state, homeworks_storage):
+    """Прежняя обработка одной домашки."""
+    msg_list = []
+    old_hw_state = homeworks_storage['homeworks_state'].get(new_hw_state.key)
+    homeworks_storage['homeworks_state'][new_hw_state.key] = new_hw_state
+    if old_hw_state is None:
+        msg_list.append(
+            f'На проверке новая домашка: {new_hw_state.homework_name}')
+        return homeworks_storage, msg_list
+    if new_hw_state.status != old_hw_state.status:
+        msg_list.append(
+            'Изменился статус проверки работы'
+            f' "{new_hw_state.homework_name}".'
+            f'{homework.VERDICT_STATUSES.get(new_hw_state.status, "")}')
+    return homeworks_storage, msg_list
+
+
+def legacy_diff(new_states, homeworks_storage):
+    """Прежний цикл из control_state."""
+    messages = []
+    for new_hw_state in new_states:
+        homeworks_storage, msg_list = legacy_process_homework_changes(
+            new_hw_state, homeworks_storage)
+        messages += msg_list
+    return messages
+
+
+def bulk_diff(new_states, homeworks_storage):
+    """Новый дифф одним проходом."""
+    changeset = homework.diff_homeworks(
+        homeworks_storage['homeworks_state'], new_states)
+    homework.apply_changeset(changeset, homeworks_storage)
+    return homework.render_messages(changeset)
+
+
+def make_states(size, changed_share=0.01):
+    """Хранилище на size домашек и ответ, где часть статусов сменилась."""
+    old_states = {}
+    new_states = []
+    for number in range(size):
+        status = random.choice(STATUSES)
+        old_states[number] = homework.HomeworkState(
+            number, f'hw{number}', status)
+        if random.random() < changed_share:
+            status = random.choice(STATUSES)
+        new_states.append(homework.HomeworkState(
+            number, f'hw{number}', status))
+    return old_states, new_states
+
+
+def run(diff, size):
+    """Время одного диффа в миллисекундах."""
+    random.seed(size)
+    old_states, new_states = make_states(size)
+    storage = {**homework.new_storage(), 'homeworks_state': old_states}
+    started = time.perf_counter()
+    diff(new_states, storage)
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    """Запускаем замер."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[1000, 10000, 100000, 1000000])
+    args = parser.parse_args()
+    for size in args.sizes:
+        legacy = min(run(legacy_diff, size) for _ in range(3))
+        bulk = min(run(bulk_diff, size) for _ in range(3))
+        print(f'{size:>8} домашек  поэлементно {legacy:9.2f} ms  '
+              f'одним проходом {bulk:9.2f} ms  x{legacy / bulk:.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Сравниваем задержку опроса без сессии и с пулом keep-alive соединений.
+
+Поднимаем локальный HTTPS-сервер (самоподписанный сертификат через
+openssl, без него — обычный HTTP) и гоняем через него get_api_answer.
+
+    python -m benchmarks.http_session --polls 200
+"""
+import argparse
+import json
+import os
+import shutil
+import ssl
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import homework
+
+BODY = json.dumps({'homeworks': [], 'current_date': 0}).encode()
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Отдаём один и тот же ответ API, не закрывая соединение."""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        """Отвечаем пустым списком ДЗ."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, format, *args):
+        """Не засоряем вывод замеров логами запросов."""
+        pass
+
+
+def make_certificate(directory):
+    """Выпускаем самоподписанный сертификат для localhost."""
+    if shutil.which('openssl') is None:
+        return None
+    cert = os.path.join(directory, 'cert.pem')
+    key = os.path.join(directory, 'key.pem')
+    subprocess.run(
+        ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes',
+         '-days', '1', '-subj', '/CN=localhost',
+         '-addext', 'subjectAltName=DNS:localhost',
+         '-keyout', key, '-out', cert],
+        check=True, capture_output=True)
+    return cert, key
+
+
+def start_server(certificate):
+    """Запускаем сервер в отдельном потоке и возвращаем его адрес."""
+    server = ThreadingHTTPServer(('localhost', 0), Handler)
+    scheme = 'http'
+    if certificate is not None:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(*certificate)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        scheme = 'https'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'{scheme}://localhost:{server.server_port}/'
+
+
+def measure(polls):
+    """Замеряем задержку каждого вызова get_api_answer в миллисекундах."""
+    latencies = []
+    for _ in range(polls):
+        started = time.perf_counter()
+        homework.get_api_answer(0)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def report(name, latencies):
+    """Печатаем среднее, p50 и p99."""
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f'{name:<12} mean {statistics.mean(latencies):7.2f} ms  '
+          f'p50 {statistics.median(latencies):7.2f} ms  p99 {p99:7.2f} ms')
+
+
+def main():
+    """Запускаем замер."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--polls', type=int, default=200)
+    parser.add_argument('--plain-http', action='store_true')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        certificate = None if args.plain_http else make_certificate(directory)
+        if certificate is not None:
+            os.environ['REQUESTS_CA_BUNDLE'] = certificate[0]
+        server, homework.ENDPOINT = start_server(certificate)
+        print(f'{args.polls} опросов {homework.ENDPOINT}')
+
+        homework.http_session = None
+        report('requests.get', measure(args.polls))
+
+        homework.http_session = homework.create_http_session()
+        measure(1)
+        report('session', measure(args.polls))
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
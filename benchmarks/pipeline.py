@@ -0,0 +1,249 @@
+"""Бенчмарк конвейера опрос -> разбор -> дифф -> уведомление.
+
+Синтетические ответы API на 10, 1k, 100k и 1M домашек со смесью статусов
+и долей битых записей прогоняются через check_response, parse_homeworks,
+control_state и bot_process. Для каждой стадии печатаем пропускную
+способность и задержки p50/p99 и сравниваем p50 с сохранённой базой:
+замедление больше допуска завершает запуск с кодом 1.
+
+    python -m benchmarks.pipeline                  # сравнить с базой
+    python -m benchmarks.pipeline --save-baseline  # обновить базу
+    python -m benchmarks.pipeline --sizes 10 1000  # только малые наборы
+
+База зависит от машины: обновляйте её на той же машине, где сравниваете.
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+import homework
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+SIZES = [10, 1000, 100000, 1000000]
+STATUSES = list(homework.VERDICT_STATUSES)
+BROKEN_RECORDS = [
+    lambda number: {'id': number, 'homework_name': f'hw{number}',
+                    'status': 'lost'},
+    lambda number: {'id': number, 'status': 'approved'},
+    lambda number: {},
+    lambda number: 'broken',
+]
+
+
+def make_homeworks(size, error_rate, seed):
+    """Ответ API: смесь статусов и error_rate битых записей."""
+    rng = random.Random(seed)
+    homeworks = []
+    for number in range(size):
+        if rng.random() < error_rate:
+            homeworks.append(rng.choice(BROKEN_RECORDS)(number))
+            continue
+        homeworks.append({
+            'id': number,
+            'homework_name': f'student__hw{number % 40}_{number}.zip',
+            'status': rng.choice(STATUSES),
+            'reviewer_comment': 'Всё нравится',
+            'date_updated': '2020-02-13T14:40:57Z',
+            'lesson_name': 'Итоговый проект',
+        })
+    return homeworks
+
+
+class FakeResponse:
+    """Ответ API с готовым телом."""
+
+    status_code = 200
+    headers = {}
+
+    def __init__(self, content):
+        """Запоминаем тело ответа."""
+        self.content = content
+
+    def json(self):
+        """Разбираем тело как requests."""
+        return json.loads(self.content)
+
+
+class NullOutbox:
+    """Outbox, который только считает сообщения."""
+
+    def __init__(self):
+        """Начинаем с нуля сообщений."""
+        self.messages = 0
+
+    def send(self, chat_id, messages, key=None):
+        """Считаем сообщения вместо отправки."""
+        self.messages += len(messages)
+        return True
+
+
+class Fixture:
+    """Всё, что нужно стадиям для одного размера ответа."""
+
+    def __init__(self, size, error_rate):
+        """Готовим ответ и хранилище, с которым он расходится."""
+        self.size = size
+        self.homeworks = make_homeworks(size, error_rate, seed=size)
+        self.response_json = {'homeworks': self.homeworks,
+                              'current_date': 1000198000}
+        self.content = json.dumps(self.response_json).encode()
+        # Хранилище с прошлого опроса: часть статусов в ответе сменилась
+        previous = make_homeworks(size, error_rate, seed=size + 1)
+        self.storage, _ = homework.control_state(
+            self.state(previous), homework.new_storage())
+        self.new_state = self.state(self.homeworks)
+
+    @staticmethod
+    def state(homeworks):
+        """Состояние, как его возвращает process_yandex_api."""
+        return {
+            'global_error': 0,
+            'homeworks_state': homework.parse_homeworks(homeworks),
+            'current_date': 1000198000,
+            'full_resync': True,
+        }
+
+    def fresh_storage(self):
+        """Копия хранилища, чтобы каждый прогон диффал одно и то же."""
+        return {
+            **self.storage,
+            'homeworks_state': dict(self.storage['homeworks_state']),
+        }
+
+
+def stages(fixture):
+    """Стадии конвейера: (название, подготовка, замеряемая функция)."""
+    def prepare_bot_process():
+        storage = fixture.fresh_storage()
+        return lambda: homework.bot_process(storage, NullOutbox())
+
+    def prepare_control_state():
+        storage = fixture.fresh_storage()
+        return lambda: homework.control_state(fixture.new_state, storage)
+
+    return [
+        ('check_response', lambda: lambda: homework.check_response(
+            fixture.response_json)),
+        ('parse', lambda: lambda: homework.parse_homeworks(
+            fixture.homeworks)),
+        ('control_state', prepare_control_state),
+        ('bot_process', prepare_bot_process),
+    ]
+
+
+def repeats_for(size):
+    """Больше повторов для малых наборов, меньше — для больших."""
+    return max(3, min(200, 2_000_000 // max(size, 1)))
+
+
+def measure(prepare, repeats):
+    """Задержки прогонов в миллисекундах."""
+    latencies = []
+    for _ in range(repeats):
+        run = prepare()
+        # Как timeit: сборщик мусора не должен попадать в замер
+        gc.collect()
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            run()
+            latencies.append((time.perf_counter() - started) * 1000)
+        finally:
+            gc.enable()
+    return sorted(latencies)
+
+
+def percentile(latencies, share):
+    """Перцентиль по ближайшему рангу."""
+    index = min(len(latencies) - 1, int(len(latencies) * share))
+    return latencies[index]
+
+
+def run_benchmarks(sizes, error_rate):
+    """Прогоняем все стадии на всех размерах."""
+    results = {}
+    request_api = homework.request_api
+    try:
+        for size in sizes:
+            run_size(size, error_rate, results)
+    finally:
+        homework.request_api = request_api
+    return results
+
+
+def run_size(size, error_rate, results):
+    """Прогоняем все стадии на одном размере ответа."""
+    fixture = Fixture(size, error_rate)
+    homework.request_api = lambda *args: FakeResponse(fixture.content)
+    repeats = repeats_for(size)
+    for stage, prepare in stages(fixture):
+        latencies = measure(prepare, repeats)
+        p50 = percentile(latencies, 0.5)
+        result = {
+            'p50_ms': round(p50, 4),
+            'p99_ms': round(percentile(latencies, 0.99), 4),
+            'records_per_s': round(size / (p50 / 1000)) if p50 else 0,
+        }
+        results[f'{stage}/{size}'] = result
+        print(f'{stage:<15} {size:>8}  {result["records_per_s"]:>14} зап/с'
+              f'  p50 {p50:10.3f} ms  p99 {result["p99_ms"]:10.3f} ms')
+
+
+def compare(results, baseline, tolerance, slack_ms):
+    """Ищем стадии, которые стали медленнее базы больше допуска."""
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        limit = base['p50_ms'] * (1 + tolerance) + slack_ms
+        if result['p50_ms'] > limit:
+            regressions.append(
+                f'{key}: p50 {result["p50_ms"]:.3f} ms, '
+                f'база {base["p50_ms"]:.3f} ms, предел {limit:.3f} ms')
+    return regressions
+
+
+def main():
+    """Запускаем бенчмарк и сравниваем с базой."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--error-rate', type=float, default=0.05)
+    parser.add_argument('--tolerance', type=float, default=0.3,
+                        help='допустимое замедление p50, доля от базы')
+    parser.add_argument('--slack-ms', type=float, default=0.05,
+                        help='абсолютный запас против шума на малых наборах')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    results = run_benchmarks(args.sizes, args.error_rate)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+        print(f'База сохранена в {args.baseline}')
+        return
+    if not os.path.exists(args.baseline):
+        print(f'Нет базы {args.baseline}, сравнивать не с чем')
+        return
+    with open(args.baseline, encoding='utf-8') as baseline_file:
+        baseline = json.load(baseline_file)
+    regressions = compare(results, baseline, args.tolerance, args.slack_ms)
+    if regressions:
+        print('\nРЕГРЕССИЯ ПРОИЗВОДИТЕЛЬНОСТИ:', file=sys.stderr)
+        for regression in regressions:
+            print(f'  {regression}', file=sys.stderr)
+        sys.exit(1)
+    print('\nРегрессий нет.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Замеряем время от запуска процесса бота до первого запроса к API.
+
+Бот стартует с холодным хранилищем против локальной заглушки API
+(tests/fake_api.py). Режим eager заранее импортирует telegram, requests
+и http.server, как это было до отложенных импортов.
+
+    python -m benchmarks.startup --runs 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from tests.fake_api import FakePracticumAPI
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = {
+    'lazy': "import runpy; runpy.run_path('homework.py', "
+            "run_name='__main__')",
+    'eager': "import telegram, requests, http.server, runpy; "
+             "runpy.run_path('homework.py', run_name='__main__')",
+}
+TOKEN = 'startup-token'
+
+
+def first_poll(api, code, directory, timeout=30):
+    """Запускаем бота и ждём его первый запрос.
+    Возвращаем время до запроса в мс и строку лога с разбивкой старта.
+    """
+    env = {
+        **os.environ,
+        'PRACTICUM_TOKEN': TOKEN,
+        'TELEGRAM_TOKEN': '123456:startup',
+        'TELEGRAM_CHAT_ID': '1',
+        'PRACTICUM_ENDPOINT': api.url,
+        'STORAGE_PATH': os.path.join(directory, 'storage.json'),
+        'METRICS_PORT': '0',
+    }
+    seen = len(api.requests)
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-c', code], cwd=ROOT,
+                               env=env, stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT, text=True)
+    try:
+        while len(api.requests) == seen:
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError('Бот не сделал ни одного запроса')
+            if process.poll() is not None:
+                raise RuntimeError(process.stdout.read())
+            time.sleep(0.001)
+        elapsed = (time.perf_counter() - started) * 1000
+        # Дожидаемся записи снимка, чтобы в логе была разбивка старта
+        time.sleep(0.2)
+    finally:
+        process.terminate()
+        output, _ = process.communicate(timeout=timeout)
+    os.remove(env['STORAGE_PATH'])
+    breakdown = [line for line in output.splitlines() if 'Старт за' in line]
+    return elapsed, breakdown[-1] if breakdown else ''
+
+
+def main():
+    """Запускаем замер."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    with FakePracticumAPI() as api, tempfile.TemporaryDirectory() as tmp:
+        api.add_homework(TOKEN, 1, 'approved')
+        for mode, code in MODES.items():
+            results = [first_poll(api, code, tmp) for _ in range(args.runs)]
+            latencies = [elapsed for elapsed, _ in results]
+            print(f'{mode:<6} до первого опроса: '
+                  f'p50 {statistics.median(latencies):7.1f} ms  '
+                  f'min {min(latencies):7.1f} ms')
+            print(f'       {results[-1][1]}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Замеряем лог смен статусов на миллионах записей.
+
+Дозапись пачками, первая хронология домашки (строит индекс), повторная
+хронология и срез по времени двоичным поиском.
+
+    python -m benchmarks.transitions --sizes 100000 1000000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from transitions import STATUSES, TransitionLog
+
+BATCH = 1000
+
+
+def measure(function):
+    """Время вызова в миллисекундах и его результат."""
+    started = time.perf_counter()
+    result = function()
+    return (time.perf_counter() - started) * 1000, result
+
+
+def run(size, directory):
+    """Заполняем лог на size записей и замеряем запросы."""
+    random.seed(size)
+    log = TransitionLog(os.path.join(directory, f'{size}.transitions'))
+    homeworks = max(size // 10, 1)
+    started = time.perf_counter()
+    for batch_start in range(0, size, BATCH):
+        log.append([(random.randrange(homeworks), random.choice(STATUSES))
+                    for _ in range(min(BATCH, size - batch_start))],
+                   timestamp=batch_start)
+    append = (time.perf_counter() - started) * 1000 / (size / BATCH)
+    first, _ = measure(lambda: log.timeline(0))
+    again, timeline = measure(lambda: log.timeline(1))
+    scan, records = measure(
+        lambda: sum(1 for _ in log.scan(size // 2, size // 2 + BATCH)))
+    print(f'{size:>8} записей  пачка {append:7.2f} ms  '
+          f'индекс {first:8.2f} ms  хронология {again:6.3f} ms '
+          f'({len(timeline)})  срез {scan:6.3f} ms ({records})')
+
+
+def main():
+    """Запускаем замер."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[100000, 1000000])
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            run(size, directory)
+
+
+if __name__ == '__main__':
+    main()
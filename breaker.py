@@ -0,0 +1,109 @@
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+import metrics
+from scheduler import MAX_RETRY_TIME
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# События, о которых стоит сообщить в чат
+DOWN = 'down'
+RECOVERED = 'recovered'
+
+# Сколько сбоев подряд размыкают цепь и на сколько секунд
+FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURES', 3))
+OPEN_TIME = float(os.getenv('BREAKER_OPEN_TIME', 30 * 60))
+
+TRANSITIONS = metrics.Counter(
+    'homework_breaker_transitions_total',
+    'Переходы выключателя API Практикума по состояниям', ['state'])
+SKIPPED_POLLS = metrics.Counter(
+    'homework_polls_skipped_total',
+    'Опросы, пропущенные, пока выключатель разомкнут')
+
+
+def new_breaker_state(open_time: float = OPEN_TIME) -> Dict:
+    """Состояние замкнутого выключателя для хранилища."""
+    return {
+        'state': CLOSED,
+        'failures': 0,
+        'opened_at': 0,
+        'open_time': open_time,
+    }
+
+
+class CircuitBreaker:
+    """Выключатель вокруг API Практикума.
+    closed — опрашиваем как обычно и считаем сбои подряд;
+    open — после failure_threshold сбоев не ходим в API open_time секунд;
+    half_open — время вышло, пробуем дешёвым пробным запросом.
+    Неудачная проба удваивает open_time до max_open_time. Состояние
+    живёт в словаре хранилища, поэтому переживает рестарт, а о падении
+    и восстановлении API сообщаем ровно по одному разу.
+    """
+
+    def __init__(self, state: Dict,
+                 failure_threshold: int = FAILURE_THRESHOLD,
+                 open_time: float = OPEN_TIME,
+                 max_open_time: float = MAX_RETRY_TIME, clock=time.time):
+        """Часы настенные: время размыкания сохраняется в снимке."""
+        self.data = state
+        self.failure_threshold = failure_threshold
+        self.open_time = open_time
+        self.max_open_time = max_open_time
+        self.clock = clock
+
+    @property
+    def state(self) -> str:
+        """Текущее состояние выключателя."""
+        return self.data['state']
+
+    def move(self, state: str) -> None:
+        """Переключаем состояние."""
+        logger.info('Выключатель API: %s -> %s', self.data['state'], state)
+        self.data['state'] = state
+        TRANSITIONS.inc(state=state)
+
+    def allow_request(self) -> bool:
+        """Можно ли сейчас обращаться к API."""
+        if self.state != OPEN:
+            return True
+        if self.clock() < self.data['opened_at'] + self.data['open_time']:
+            SKIPPED_POLLS.inc()
+            return False
+        self.move(HALF_OPEN)
+        return True
+
+    def record_success(self) -> Optional[str]:
+        """API ответил. Возвращаем RECOVERED, если цепь была разомкнута."""
+        self.data['failures'] = 0
+        if self.state == CLOSED:
+            return None
+        self.data['open_time'] = self.open_time
+        self.move(CLOSED)
+        return RECOVERED
+
+    def record_failure(self) -> Optional[str]:
+        """API не ответил. DOWN — цепь только что разомкнулась."""
+        self.data['failures'] += 1
+        if self.state == HALF_OPEN:
+            self.data['open_time'] = min(self.max_open_time,
+                                         self.data['open_time'] * 2)
+            self.open_circuit()
+            return None
+        if self.state == CLOSED and (
+                self.data['failures'] >= self.failure_threshold):
+            self.open_circuit()
+            return DOWN
+        return None
+
+    def open_circuit(self) -> None:
+        """Размыкаем цепь с текущего момента."""
+        self.data['opened_at'] = self.clock()
+        self.move(OPEN)
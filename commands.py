@@ -0,0 +1,134 @@
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import metrics
+from outbox import TokenBucket
+from startup import lazy_import
+
+telegram = lazy_import('telegram')
+
+logger = logging.getLogger(__name__)
+
+# Сколько секунд держим готовый ответ на команду
+REPLY_TTL = float(os.getenv('REPLY_TTL', 30))
+# Не больше COMMAND_BURST команд подряд и одной в 1 / COMMAND_RATE секунд
+COMMAND_RATE = 0.2
+COMMAND_BURST = 3
+# Таймаут long polling getUpdates
+UPDATES_TIMEOUT = 30
+UPDATES_RETRY_TIME = 5
+
+COMMANDS = metrics.Counter(
+    'homework_commands_total',
+    'Команды из Telegram: ответы и отброшенные лимитом',
+    ['command', 'result'])
+
+
+class ReplyCache:
+    """Готовые ответы на команды, живут ttl секунд."""
+
+    def __init__(self, ttl: float = REPLY_TTL, clock=time.monotonic):
+        """Ответы лежат по ключу (чат, команда)."""
+        self.ttl = ttl
+        self.clock = clock
+        self.entries: Dict = {}
+
+    def get(self, key, render: Callable[[], str]) -> str:
+        """Отдаём свежий ответ из кэша или собираем новый."""
+        now = self.clock()
+        entry = self.entries.get(key)
+        if entry is not None and now - entry[0] < self.ttl:
+            return entry[1]
+        reply = render()
+        self.entries[key] = (now, reply)
+        return reply
+
+
+class CommandListener:
+    """Отвечаем на команды из Telegram по уже известному состоянию.
+    Ответы собираются только из хранилища ДЗ в памяти, поэтому сколько
+    бы ни спрашивали, к API Практикума не уходит ни одного запроса.
+    get_storage(chat_id) возвращает хранилище чата или None, если
+    чат боту не знаком: таким чатам не отвечаем.
+    """
+
+    def __init__(self, bot, outbox, get_storage: Callable,
+                 handlers: Dict[str, Callable[[Dict], str]],
+                 ttl: float = REPLY_TTL, rate: float = COMMAND_RATE,
+                 burst: int = COMMAND_BURST, clock=time.monotonic):
+        """handlers: команда -> функция, собирающая ответ из хранилища."""
+        self.bot = bot
+        self.outbox = outbox
+        self.get_storage = get_storage
+        self.handlers = handlers
+        self.cache = ReplyCache(ttl, clock)
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.buckets: Dict = {}
+        self.offset = None
+        self.stopped = threading.Event()
+
+    def bucket(self, chat_id) -> TokenBucket:
+        """Ведро токенов чата."""
+        bucket = self.buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.buckets[chat_id] = TokenBucket(
+                self.rate, self.burst, self.clock)
+        return bucket
+
+    def help_text(self) -> str:
+        """Список команд."""
+        return 'Команды: ' + ', '.join(self.handlers)
+
+    def handle(self, chat_id, text: str) -> Optional[str]:
+        """Отвечаем на одну команду, None — ответа не будет."""
+        storage = self.get_storage(chat_id)
+        if storage is None:
+            return None
+        command = text.split()[0].split('@')[0].lower()
+        handler = self.handlers.get(command)
+        if handler is None:
+            command = '/help'
+        if not self.bucket(chat_id).try_acquire():
+            COMMANDS.inc(command=command, result='throttled')
+            return None
+        reply = self.cache.get(
+            (chat_id, command),
+            self.help_text if handler is None else lambda: handler(storage))
+        self.outbox.send(chat_id, [reply])
+        COMMANDS.inc(command=command, result='ok')
+        return reply
+
+    def poll(self) -> None:
+        """Забираем новые сообщения через long polling и отвечаем."""
+        updates = self.bot.get_updates(offset=self.offset,
+                                       timeout=UPDATES_TIMEOUT,
+                                       allowed_updates=['message'])
+        for update in updates:
+            self.offset = update.update_id + 1
+            message = update.message
+            if message is not None and (message.text or '').startswith('/'):
+                self.handle(message.chat_id, message.text)
+
+    def run(self) -> None:
+        """Слушаем команды, пока нас не остановят."""
+        while not self.stopped.is_set():
+            try:
+                self.poll()
+            except telegram.error.TelegramError as error:
+                logger.warning('Не удалось получить команды: %s', error)
+                self.stopped.wait(UPDATES_RETRY_TIME)
+
+    def start(self) -> 'CommandListener':
+        """Запускаем прослушивание в фоновом потоке."""
+        threading.Thread(target=self.run, name='commands',
+                         daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        """Просим поток остановиться после текущего getUpdates."""
+        self.stopped.set()
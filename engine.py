@@ -0,0 +1,298 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import signal
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import homework
+import metrics
+import profiling
+from journal import Journal
+from leases import LEASE_TTL, LeaseStore
+from logs import setup_logging
+from outbox import DeliveryPool, LazyBot, Outbox
+from scheduler import PollScheduler
+from transitions import TransitionLog
+
+logger = logging.getLogger(__name__)
+
+TENANTS_PATH = os.getenv('TENANTS_PATH', 'tenants.json')
+TENANTS_STORAGE_DIR = os.getenv('TENANTS_STORAGE_DIR', 'tenants_storage')
+# Общий журнал отправки всех студентов лежит рядом с их снимками
+JOURNAL_NAME = 'outbox.journal'
+# Аренды студентов: каждого опрашивает одна реплика движка на узле.
+# База локальная: SQLite в режиме WAL не работает на сетевом диске,
+# а между узлами флота студентов делит кольцо (fleet.HashRing)
+ENGINE_LEASE_PATH = os.getenv('ENGINE_LEASE_PATH', 'engine_leases.db')
+MAX_IN_FLIGHT = int(os.getenv('MAX_IN_FLIGHT', 64))
+
+
+class Tenant:
+    """Студент: токен Практикума, чат в Telegram и своё хранилище ДЗ."""
+
+    def __init__(self, practicum_token: str, chat_id,
+                 storage: Optional[Dict] = None):
+        """Запоминаем данные студента."""
+        self.practicum_token = practicum_token
+        self.chat_id = chat_id
+        self.storage = storage
+        self.transitions: Optional[TransitionLog] = None
+        self.headers = homework.make_headers(practicum_token)
+        # Стабильный ключ, чтобы не светить токен в логах и именах файлов
+        self.key = hashlib.sha1(practicum_token.encode()).hexdigest()[:16]
+
+    def storage_path(self, storage_dir: str) -> str:
+        """Путь к снимку хранилища этого студента."""
+        return os.path.join(storage_dir, f'{self.key}.json')
+
+    def transitions_path(self, storage_dir: str) -> str:
+        """Путь к логу смен статусов этого студента."""
+        return os.path.join(storage_dir, f'{self.key}.transitions')
+
+
+def load_tenants(path: str) -> List[Tenant]:
+    """Читаем список студентов из JSON-файла.
+    Формат: [{"practicum_token": "...", "chat_id": 123}, ...]
+    """
+    with open(path, encoding='utf-8') as tenants_file:
+        records = json.load(tenants_file)
+    return [
+        Tenant(record['practicum_token'], record['chat_id'])
+        for record in records
+    ]
+
+
+class PollingEngine:
+    """Опрашиваем API Практикума для многих студентов одновременно.
+    Блокирующие запросы уходят в пул потоков, а семафор ограничивает
+    число запросов в полёте, так что медленный студент занимает лишь
+    один слот и не задерживает остальных.
+    """
+
+    def __init__(self, tenants: List[Tenant], outbox,
+                 max_in_flight: int = MAX_IN_FLIGHT,
+                 retry_time: int = homework.RETRY_TIME,
+                 storage_dir: Optional[str] = TENANTS_STORAGE_DIR,
+                 shard=None, leases: Optional[LeaseStore] = None):
+        """Готовим пул потоков под max_in_flight запросов.
+        shard (fleet.Shard) — опрашиваем только свою долю студентов,
+        leases — и только тех, чью аренду удалось взять.
+        """
+        self.tenants = tenants
+        self.shard = shard
+        self.leases = leases
+        self.outbox = outbox
+        self.max_in_flight = max_in_flight
+        self.retry_time = retry_time
+        self.storage_dir = storage_dir
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight)
+        self.semaphore = None
+
+    def process_tenant(self, tenant: Tenant) -> None:
+        """Один цикл опроса студента, выполняется в пуле потоков."""
+        transitions = self.transition_log(tenant)
+        if tenant.storage is None:
+            path = self.snapshot_path(tenant)
+            restored = path and homework.restore_storage(path)
+            if restored:
+                tenant.storage = restored
+            else:
+                tenant.storage = homework.bot_startup(
+                    homework.new_storage(), tenant.headers, transitions)
+                self.save(tenant)
+                return
+        tenant.storage = homework.bot_process(
+            tenant.storage, self.outbox, tenant.headers, tenant.chat_id,
+            transitions)
+        self.save(tenant)
+
+    def owns(self, tenant: Tenant) -> bool:
+        """Наш ли это студент."""
+        return self.shard is None or self.shard.owns(tenant.key)
+
+    async def take_lease(self, tenant: Tenant) -> bool:
+        """Берём или продлеваем аренду студента до следующего опроса."""
+        if self.leases is None:
+            return True
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(
+                self.executor, self.leases.acquire, tenant.key)
+        except sqlite3.Error as error:
+            logger.error('Не удалось взять аренду студента %s: %s',
+                         tenant.key, error)
+            return False
+
+    async def drop(self, tenant: Tenant) -> None:
+        """Студент не наш: забываем хранилище и отдаём аренду."""
+        if tenant.storage is not None and self.leases is not None:
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(
+                    self.executor, self.leases.release, tenant.key)
+            except sqlite3.Error as error:
+                logger.error('Не удалось отдать аренду студента %s: %s',
+                             tenant.key, error)
+        # Если студент вернётся, поднимем свежий снимок, который писал
+        # другой воркер или реплика
+        tenant.storage = None
+
+    def snapshot_path(self, tenant: Tenant) -> Optional[str]:
+        """Путь к снимку студента, None если снимки отключены."""
+        if self.storage_dir is None:
+            return None
+        return tenant.storage_path(self.storage_dir)
+
+    def transition_log(self, tenant: Tenant) -> Optional[TransitionLog]:
+        """Лог смен статусов студента, None если снимки отключены."""
+        if self.storage_dir is None:
+            return None
+        if tenant.transitions is None:
+            tenant.transitions = TransitionLog(
+                tenant.transitions_path(self.storage_dir))
+        return tenant.transitions
+
+    def save(self, tenant: Tenant) -> None:
+        """Сохраняем снимок хранилища студента."""
+        path = self.snapshot_path(tenant)
+        if path is not None:
+            homework.persist_storage(tenant.storage, path)
+
+    async def poll_once(self, tenant: Tenant) -> None:
+        """Опрашиваем студента, не превышая лимит запросов в полёте."""
+        loop = asyncio.get_running_loop()
+        async with self.semaphore:
+            try:
+                await loop.run_in_executor(
+                    self.executor, self.process_tenant, tenant)
+            except Exception as error:
+                logger.exception('Сбой цикла студента %s: %s',
+                                 tenant.key, error)
+
+    async def run_tenant(self, tenant: Tenant) -> None:
+        """Бесконечно опрашиваем студента раз в retry_time секунд."""
+        loop = asyncio.get_running_loop()
+        # Разносим студентов по периоду, чтобы не было залпа запросов
+        await asyncio.sleep(random.uniform(0, self.retry_time))
+        scheduler = PollScheduler(self.retry_time, clock=loop.time)
+        while True:
+            if self.owns(tenant) and await self.take_lease(tenant):
+                await self.poll_once(tenant)
+            else:
+                await self.drop(tenant)
+            failures = (tenant.storage or {}).get('api_failures', 0)
+            await asyncio.sleep(scheduler.next_delay(failures))
+
+    async def replay_journal(self) -> None:
+        """Раз в retry_time дорассылаем недоставленное из журнала.
+        Иначе дайджест, исчерпавший попытки отправки, пока лежал
+        Telegram, ждал бы в журнале рестарта процесса.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.retry_time)
+            try:
+                await loop.run_in_executor(self.executor, self.outbox.replay)
+            except Exception as error:
+                logger.exception('Сбой переотправки из журнала: %s', error)
+
+    async def run(self) -> None:
+        """Запускаем опрос всех студентов."""
+        if self.storage_dir is not None:
+            os.makedirs(self.storage_dir, exist_ok=True)
+        self.semaphore = asyncio.Semaphore(self.max_in_flight)
+        tasks = [self.run_tenant(tenant) for tenant in self.tenants]
+        if self.shard is not None:
+            tasks.append(self.shard.run())
+        if self.outbox is not None:
+            tasks.append(self.replay_journal())
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            self.executor.shutdown(wait=False)
+
+
+def journal_name(shard=None) -> str:
+    """У каждого воркера флота свой журнал отправки."""
+    if shard is None:
+        return JOURNAL_NAME
+    return f'outbox-{shard.worker_id}.journal'
+
+
+def make_storage_lookup(tenants: List[Tenant],
+                        storage_dir: Optional[str] = None):
+    """Хранилище студента по чату для ответов на команды.
+    Студента другого воркера читаем из его снимка, а пока первый опрос
+    не прошёл, отвечаем по пустому хранилищу.
+    """
+    by_chat = {str(tenant.chat_id): tenant for tenant in tenants}
+
+    def get_storage(chat_id) -> Optional[Dict]:
+        tenant = by_chat.get(str(chat_id))
+        if tenant is None:
+            return None
+        if tenant.storage is None and storage_dir is not None:
+            restored = homework.restore_storage(
+                tenant.storage_path(storage_dir))
+            if restored is not None:
+                return restored
+        return tenant.storage or homework.new_storage()
+
+    return get_storage
+
+
+def main(shard=None, index: int = 0):
+    """Опрашиваем всех студентов из TENANTS_PATH.
+    Во флоте (fleet.py) — только долю воркера номер index.
+    """
+    listener = setup_logging()
+    try:
+        run_engine(shard, index)
+    finally:
+        listener.stop()
+
+
+def run_engine(shard=None, index: int = 0):
+    """Поднимаем сессию, бота и очередь отправки и запускаем движок."""
+    if homework.TELEGRAM_TOKEN is None:
+        logger.critical('Ошибка, не задан TELEGRAM_TOKEN')
+        sys.exit(1)
+    tenants = load_tenants(TENANTS_PATH)
+    logger.info('Запускаем опрос %s студентов', len(tenants))
+    homework.http_session = homework.create_http_session(MAX_IN_FLIGHT)
+    # Воркеры одного узла слушают метрики на соседних портах
+    metrics.start_metrics_server(
+        homework.METRICS_PORT and homework.METRICS_PORT + index)
+    signal.signal(signal.SIGTERM, homework.handle_sigterm)
+    profiling.PROFILER.install_signal_handlers()
+    bot = LazyBot(homework.create_bot)
+    os.makedirs(TENANTS_STORAGE_DIR, exist_ok=True)
+    journal = Journal.claim(
+        os.path.join(TENANTS_STORAGE_DIR, journal_name(shard)))
+    outbox = DeliveryPool(Outbox(bot), journal=journal)
+    outbox.replay()
+    # Аренда живёт дольше периода опроса: её продлевает сам опрос
+    leases = LeaseStore(
+        ENGINE_LEASE_PATH,
+        holder=shard and shard.worker_id,
+        ttl=homework.RETRY_TIME + LEASE_TTL)
+    if index == 0:
+        # getUpdates у бота может читать только один процесс
+        homework.start_commands(bot, outbox, make_storage_lookup(
+            tenants, TENANTS_STORAGE_DIR))
+    try:
+        asyncio.run(PollingEngine(
+            tenants, outbox, shard=shard, leases=leases).run())
+    finally:
+        outbox.close()
+        journal.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+import asyncio
+import bisect
+import hashlib
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Общий для всех узлов каталог, где воркеры отмечаются пульсом
+FLEET_DIR = os.getenv('FLEET_DIR', 'fleet')
+FLEET_NODE = os.getenv('FLEET_NODE', socket.gethostname())
+FLEET_WORKERS = int(os.getenv('FLEET_WORKERS', os.cpu_count() or 1))
+HEARTBEAT_TIME = float(os.getenv('FLEET_HEARTBEAT', 5))
+# Воркер без пульса дольше MEMBER_TTL считается ушедшим
+MEMBER_TTL = 3 * HEARTBEAT_TIME
+# Виртуальных точек на воркер: чем больше, тем ровнее делятся студенты
+VIRTUAL_NODES = 100
+RESTART_TIME = 1
+
+
+def ring_hash(value: str) -> int:
+    """Позиция на кольце."""
+    return int.from_bytes(
+        hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """Консистентное хеширование студентов по воркерам.
+    Когда воркер приходит или уходит, переезжают только студенты
+    соседних с ним участков кольца, примерно 1/N от всех.
+    """
+
+    def __init__(self, members: Iterable[str],
+                 replicas: int = VIRTUAL_NODES):
+        """Ставим на кольцо replicas точек каждого воркера."""
+        points = sorted(
+            (ring_hash(f'{member}#{replica}'), member)
+            for member in members for replica in range(replicas))
+        self.hashes = [point for point, _ in points]
+        self.owners = [member for _, member in points]
+
+    def node_for(self, key: str) -> Optional[str]:
+        """Воркер, которому принадлежит ключ."""
+        if not self.hashes:
+            return None
+        index = bisect.bisect(self.hashes, ring_hash(key))
+        return self.owners[index % len(self.owners)]
+
+
+class Membership:
+    """Живые воркеры флота по файлам-пульсам в общем каталоге.
+    Каталог может лежать на общем диске нескольких узлов; часы узлов
+    должны идти примерно одинаково (NTP), с точностью до MEMBER_TTL.
+    """
+
+    def __init__(self, directory: str, worker_id: str,
+                 ttl: float = MEMBER_TTL, clock=time.time):
+        """Файл воркера называется его id."""
+        self.directory = directory
+        self.worker_id = worker_id
+        self.ttl = ttl
+        self.clock = clock
+        self.path = os.path.join(directory, worker_id)
+
+    def heartbeat(self) -> None:
+        """Отмечаемся: обновляем время файла."""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path, 'a'):
+            pass
+        now = self.clock()
+        os.utime(self.path, (now, now))
+
+    def leave(self) -> None:
+        """Уходим из флота, не дожидаясь, пока истечёт пульс."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def members(self) -> List[str]:
+        """Воркеры с живым пульсом, включая нас самих."""
+        alive = {self.worker_id}
+        deadline = self.clock() - self.ttl
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            names = []
+        for name in names:
+            try:
+                beat = os.stat(os.path.join(self.directory, name)).st_mtime
+            except FileNotFoundError:
+                continue
+            if beat >= deadline:
+                alive.add(name)
+        return sorted(alive)
+
+
+class Shard:
+    """Доля студентов, которую опрашивает этот воркер."""
+
+    def __init__(self, membership: Membership,
+                 replicas: int = VIRTUAL_NODES):
+        """Пока состав флота не прочитан, считаем себя единственным."""
+        self.membership = membership
+        self.replicas = replicas
+        self.members: List[str] = []
+        self.ring = HashRing([membership.worker_id], replicas)
+
+    @property
+    def worker_id(self) -> str:
+        """Id этого воркера."""
+        return self.membership.worker_id
+
+    def refresh(self) -> bool:
+        """Отмечаемся и перечитываем состав флота.
+        Возвращаем True, если состав поменялся и студенты переехали.
+        """
+        self.membership.heartbeat()
+        members = self.membership.members()
+        if members == self.members:
+            return False
+        logger.info('Состав флота: %s', ', '.join(members))
+        self.members = members
+        self.ring = HashRing(members, self.replicas)
+        return True
+
+    def owns(self, key: str) -> bool:
+        """Опрашивает ли этот воркер студента с таким ключом."""
+        return self.ring.node_for(key) == self.worker_id
+
+    async def run(self, interval: float = HEARTBEAT_TIME) -> None:
+        """Пульс и пересчёт кольца, пока воркер жив."""
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                await loop.run_in_executor(None, self.refresh)
+                await asyncio.sleep(interval)
+        finally:
+            self.membership.leave()
+
+
+def worker_id(index: int, node: str = FLEET_NODE) -> str:
+    """Id воркера: узел и номер процесса на нём."""
+    return f'{node}-{index}'
+
+
+def run_worker(index: int) -> None:
+    """Процесс-воркер: движок опроса только для своей доли студентов."""
+    # Импорт здесь: каждый процесс сам поднимает бота и сессию
+    import engine
+
+    shard = Shard(Membership(FLEET_DIR, worker_id(index)))
+    shard.refresh()
+    engine.main(shard=shard, index=index)
+
+
+def start_worker(index: int) -> multiprocessing.Process:
+    """Запускаем воркер в отдельном чистом процессе (spawn, не fork)."""
+    context = multiprocessing.get_context('spawn')
+    process = context.Process(target=run_worker, args=(index,),
+                              name=worker_id(index))
+    process.start()
+    return process
+
+
+def supervise(workers: int = FLEET_WORKERS) -> None:
+    """Держим на узле workers процессов и перезапускаем упавшие.
+    Каждый процесс — отдельный интерпретатор со своим GIL, так что
+    пропускная способность растёт с числом ядер, а с узлами — через
+    общий FLEET_DIR.
+    """
+    processes: Dict[int, multiprocessing.Process] = {
+        index: start_worker(index) for index in range(workers)
+    }
+    try:
+        while True:
+            time.sleep(RESTART_TIME)
+            for index, process in processes.items():
+                if not process.is_alive():
+                    logger.error('Воркер %s завершился с кодом %s, '
+                                 'перезапускаем', process.name,
+                                 process.exitcode)
+                    processes[index] = start_worker(index)
+    finally:
+        for process in processes.values():
+            process.terminate()
+        for process in processes.values():
+            process.join()
+
+
+def main():
+    """Координатор флота на этом узле."""
+    from homework import handle_sigterm
+    from logs import setup_logging
+
+    listener = setup_logging()
+    signal.signal(signal.SIGTERM, handle_sigterm)
+    logger.info('Запускаем %s воркеров на узле %s', FLEET_WORKERS,
+                FLEET_NODE)
+    try:
+        supervise()
+    finally:
+        listener.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,38 +1,95 @@
+import hashlib
 import logging
 import os
+import re
+import signal
 import sys
 import time
+from collections import Counter
 from http import HTTPStatus
-from typing import Dict
+from typing import Dict, List, NamedTuple, Optional
 
-import requests
-import telegram
 from dotenv import load_dotenv
 
+import metrics
+import profiling
+from breaker import DOWN, HALF_OPEN, CircuitBreaker, new_breaker_state
+from commands import CommandListener
 from exceptions import (EmptyHomeworkException, EmptyResponseException,
                         NoKeyInHomeworkException, NoKeyInResponseException,
                         StatusCodeException, WrongKeyTypeResponseException,
                         WrongRecordHomeworkException,
                         WrongStatusInHomeworkException,
                         WrongTypeResponseException, YandexRequestException)
+from journal import Journal
+from leases import LEASE_PATH, Lease, LeaseStore
+from logs import setup_logging
+from outbox import DELIVERY_WORKERS, DeliveryPool, LazyBot, Outbox
+from scheduler import PollScheduler
+from singleflight import SingleFlight
+from startup import STARTUP, lazy_import
+from storage import load_storage, save_storage
+from stream import HomeworksStream
+from transitions import TransitionLog
+
+# Тяжёлые библиотеки грузим при первом запросе или отправке
+requests = lazy_import('requests')
+telegram = lazy_import('telegram')
 
 load_dotenv()
 
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO)
+# Обработчики вешает setup_logging() в main, а не импорт модуля
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-handler = logging.StreamHandler(stream=sys.stdout)
-logger.addHandler(handler)
 
 PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN', None)
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN', None)
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID', None)
+STORAGE_PATH = os.getenv('STORAGE_PATH', 'homework_storage.json')
+# Лог смен статусов: API помнит только последний статус домашки
+TRANSITIONS_PATH = os.getenv('TRANSITIONS_PATH', 'homework_transitions.log')
+# Журнал отправки: недоставленные уведомления переживают рестарт
+JOURNAL_PATH = os.getenv('JOURNAL_PATH', 'homework_outbox.journal')
+# Порт /metrics в формате Prometheus, 0 — метрики не поднимаем
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+# Отвечать ли на /status и /history в Telegram, 0 — не слушаем команды
+BOT_COMMANDS = int(os.getenv('BOT_COMMANDS', 1))
+# Сколько последних уведомлений помнит /history
+HISTORY_SIZE = 20
+# Сколько домашек показываем в ответе на /status
+STATUS_LIMIT = 50
 
 RETRY_TIME = 600
-ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
-HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
+# Таймауты (соединение, чтение) запроса к API Практикума
+CONNECT_TIMEOUT = float(os.getenv('CONNECT_TIMEOUT', 3.05))
+READ_TIMEOUT = float(os.getenv('READ_TIMEOUT', 20))
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 10))
+# Ответы больше порога (и без Content-Length) разбираем потоково
+STREAM_THRESHOLD = int(os.getenv('STREAM_THRESHOLD', 1024 * 1024))
+STREAM_CHUNK_SIZE = 64 * 1024
+# Запас окна при инкрементальном опросе: изменения на границе окон
+# придут повторно, но дифф по статусам их отфильтрует
+OVERLAP_TIME = 2 * RETRY_TIME
+# Раз в сутки (144 опроса по 10 минут) запрашиваем всю историю заново
+FULL_RESYNC_POLLS = 144
+ENDPOINT = os.getenv(
+    'PRACTICUM_ENDPOINT',
+    'https://practicum.yandex.ru/api/user_api/homework_statuses/')
+# Одновременные одинаковые запросы к API Практикума
+API_FLIGHTS = SingleFlight()
+
+
+def make_headers(practicum_token) -> Dict:
+    """Собираем заголовки авторизации для токена Практикума."""
+    return {'Authorization': f'OAuth {practicum_token}'}
+
+
+HEADERS = make_headers(PRACTICUM_TOKEN)
+
+# current_date меняется в каждом ответе, поэтому в отпечаток тела не входит
+CURRENT_DATE_RE = re.compile(rb'"current_date"\s*:\s*(-?\d+)')
+
+# Долгоживущая сессия с keep-alive, её создаёт main() при запуске бота
+http_session = None
 
 VERDICT_STATUSES = {
     'approved': 'Работа проверена: ревьюеру всё понравилось. Ура!',
@@ -49,6 +106,15 @@ EXCEPTION_TO_STR = {
     WrongKeyTypeResponseException: 'Неподходящий тип ответа от API Яндекс',
 }
 
+# Ошибки недоступности API, при которых опрашиваем реже
+BACKOFF_ERRORS = {
+    EXCEPTION_TO_STR[YandexRequestException],
+    EXCEPTION_TO_STR[StatusCodeException],
+}
+API_DOWN_MESSAGE = ('API Практикума недоступен: {}. Опрашиваю реже, '
+                    'сообщу, когда заработает.')
+API_RECOVERED_MESSAGE = 'API Практикума снова доступен.'
+
 HOMEWORK_EXCEPTIONS_TO_STR = {
     WrongRecordHomeworkException: 'Неправильная запись ДЗ',
     EmptyHomeworkException: 'Пустая запись ДЗ',
@@ -66,7 +132,8 @@ def check_tokens():
             raise Exception('Failed because token is not set.')
     except Exception as error:
         logger.critical(
-            f'Ошибка, не задан токен в качетсве переменной окружения: {error}'
+            'Ошибка, не задан токен в качетсве переменной окружения: %s',
+            error
         )
         return False
     else:
@@ -75,61 +142,189 @@ def check_tokens():
 
 def send_message(bot, message):
     """Отправляем сообщение."""
+    send_chat_message(bot, TELEGRAM_CHAT_ID, message)
+
+
+def send_chat_message(bot, chat_id, message):
+    """Отправляем сообщение в конкретный чат."""
     try:
-        logger.info(f'Сообщение успешно отправлено. Сообщение: {message}')
         bot.send_message(
-            chat_id=TELEGRAM_CHAT_ID,
+            chat_id=chat_id,
             text=message
         )
-    except requests.exceptions.RequestException as error:
-        logger.error(f'Сбой при отправке сообщения: {error}')
+        logger.info('Сообщение успешно отправлено. Сообщение: %s', message)
+    except (requests.exceptions.RequestException,
+            telegram.error.TelegramError) as error:
+        logger.error('Сбой при отправке сообщения: %s', error)
+
+
+def create_http_session(pool_size: int = HTTP_POOL_SIZE):
+    """Создаём сессию с пулом keep-alive соединений к API Практикума."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_http_client():
+    """Берём сессию бота, а без неё — обычный requests."""
+    if http_session is not None:
+        return http_session
+    return requests
 
 
 def get_api_answer(current_timestamp):
     """Запрашиваем данные с сервера Практикума."""
+    return get_tenant_api_answer(current_timestamp, HEADERS)
+
+
+def get_tenant_api_answer(current_timestamp, headers: Dict):
+    """Запрашиваем данные с сервера Практикума с заголовками студента."""
+    return request_api(current_timestamp, headers).json()
+
+
+def request_api(current_timestamp, headers: Dict, etag=None):
+    """Делаем запрос к API и возвращаем сырой ответ.
+    С etag запрос условный, и ответ 304 тоже считается успешным.
+    """
     timestamp = current_timestamp
     params = {'from_date': timestamp}
+    if etag:
+        headers = {**headers, 'If-None-Match': etag}
     try:
-        response = requests.get(ENDPOINT, headers=HEADERS, params=params)
+        with metrics.API_REQUEST_SECONDS.time():
+            response = get_http_client().get(
+                ENDPOINT, headers=headers, params=params,
+                timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), stream=True)
+        if response.status_code == HTTPStatus.NOT_MODIFIED and etag:
+            return response
         if response.status_code != HTTPStatus.OK:
+            # Тело не нужно: отпускаем соединение обратно в пул
+            release_response(response)
             raise StatusCodeException('Неверный статус код.')
     except requests.exceptions.RequestException as error:
         raise YandexRequestException(repr(error))
-    return response.json()
+    return response
+
+
+def release_response(response) -> None:
+    """Закрываем потоковый ответ, не дочитывая тело."""
+    close = getattr(response, 'close', None)
+    if close is not None:
+        close()
+
+
+def fingerprint_response(content: bytes):
+    """Считаем отпечаток тела ответа без current_date.
+    Возвращаем отпечаток и сам current_date, вырезанный регуляркой,
+    чтобы двигать курсор, не разбирая JSON.
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    match = CURRENT_DATE_RE.search(content)
+    if match is None:
+        hasher.update(content)
+        return hasher.hexdigest(), 0
+    hasher.update(content[:match.start()])
+    hasher.update(content[match.end():])
+    return hasher.hexdigest(), int(match.group(1))
+
+
+def get_unchanged_state(response, previous: Dict, current_timestamp):
+    """Проверяем, совпал ли ответ с предыдущим.
+    Для совпавшего ответа сразу собираем состояние без разбора JSON,
+    для изменившегося возвращаем None и отпечаток нового тела.
+    """
+    etag = response.headers.get('ETag')
+    if response.status_code == HTTPStatus.NOT_MODIFIED:
+        fingerprint, current_date = previous.get('fingerprint'), None
+    else:
+        fingerprint, current_date = fingerprint_response(response.content)
+        if fingerprint != previous.get('fingerprint'):
+            return None, fingerprint
+    logger.debug('Ответ API не изменился.')
+    return {
+        'global_error': 0,
+        'homeworks_state': [],
+        'current_date': current_date,
+        'full_resync': current_timestamp == 0,
+        'unchanged': True,
+        'etag': etag or previous.get('etag'),
+        'fingerprint': fingerprint,
+    }, fingerprint
+
+
+def compile_schema(schema, namespace: Optional[Dict] = None):
+    """Компилируем схему в одну функцию проверки.
+    Схема — кортеж (выражение над value, исключение, текст). Из неё
+    собирается цепочка if без вызовов функций на каждую проверку;
+    функция возвращает первую не прошедшую пару (исключение, текст)
+    или None, ничего не выбрасывая.
+    """
+    errors = tuple((exception, message) for _, exception, message in schema)
+    lines = ['def validate(value):']
+    for number, (expression, _, _) in enumerate(schema):
+        lines.append(f'    if not ({expression}):')
+        lines.append(f'        return errors[{number}]')
+    lines.append('    return None')
+    scope = {**(namespace or {}), 'errors': errors}
+    exec(compile('\n'.join(lines), '<schema>', 'exec'), scope)
+    return scope['validate']
+
+
+# Проверки идут по порядку: каждая следующая полагается на предыдущие
+RESPONSE_SCHEMA = (
+    ('value', EmptyResponseException, 'Response is empty.'),
+    ('isinstance(value, dict)',
+     WrongTypeResponseException, 'Респонс не является словарем'),
+    ("'homeworks' in value",
+     NoKeyInResponseException, 'Нет "homeworks" в ключах'),
+    ("isinstance(value['homeworks'], list)",
+     WrongKeyTypeResponseException, 'list'),
+)
+
+HOMEWORK_SCHEMA = (
+    ('isinstance(value, dict)',
+     WrongRecordHomeworkException, 'Неправильный тип записи ДЗ.'),
+    ('value', EmptyHomeworkException, 'Пустая запись ДЗ.'),
+    ("'homework_name' in value",
+     NoKeyInHomeworkException, 'В записи о ДЗ нет ключа "homework_name".'),
+    ("value.get('status') in VERDICT_STATUSES",
+     WrongStatusInHomeworkException, 'Неизвестный статус ДЗ.'),
+)
+
+validate_response = compile_schema(RESPONSE_SCHEMA)
+validate_homework = compile_schema(
+    HOMEWORK_SCHEMA, {'VERDICT_STATUSES': VERDICT_STATUSES})
+
+
+def validate_homeworks(homeworks) -> List:
+    """Проверяем пачку записей о ДЗ за один проход.
+    Возвращаем для каждой записи класс ошибки или None.
+    """
+    errors = []
+    for homework in homeworks:
+        error = validate_homework(homework)
+        errors.append(error and error[0])
+    return errors
 
 
 def check_response(response):
     """Проверяем ответ сервера."""
-    if not response:
-        raise EmptyResponseException('Response is empty.')
-    if not isinstance(response, dict):
-        raise WrongTypeResponseException('Респонс не является словарем')
-    if 'homeworks' not in response.keys():
-        raise NoKeyInResponseException('Нет "homeworks" в ключах')
-    if not isinstance(response.get('homeworks'), list):
-        raise WrongKeyTypeResponseException('list')
+    error = validate_response(response)
+    if error is not None:
+        exception, message = error
+        raise exception(message)
     return response.get('homeworks')
 
 
 def check_status(homework):
     """Проверяем статус ДЗ."""
-    if not isinstance(homework, dict):
-        raise WrongRecordHomeworkException('Неправильный тип записи ДЗ.')
-    if len(homework) == 0:
-        raise EmptyHomeworkException('Пустая запись ДЗ.')
-
-    if 'homework_name' not in homework:
-        raise NoKeyInHomeworkException(
-            'В записи о ДЗ нет ключа "homework_name".'
-        )
-
-    hw_status = homework.get('status', 'unknown')
-    hw_status_text = VERDICT_STATUSES.get(hw_status, None)
-
-    if hw_status_text is None:
-        raise WrongStatusInHomeworkException(
-            f'Неизвестный статус ДЗ: {hw_status}.'
-        )
+    error = validate_homework(homework)
+    if error is not None:
+        exception, message = error
+        raise exception(message)
 
 
 def parse_status(homework):
@@ -142,173 +337,446 @@ def parse_status(homework):
     return f'Изменился статус проверки работы "{homework_name}". {verdict}'
 
 
+class HomeworkState:
+    """Компактная запись о ДЗ: только поля, нужные для диффа.
+    Ключ записи — стабильный id домашки, а без него — её название.
+    Строки статусов и названий интернируем: у тысяч студентов они
+    одни и те же и в памяти хранятся в одном экземпляре.
+    """
+
+    __slots__ = ('homework_id', 'homework_name', 'status', 'error')
+
+    def __init__(self, homework_id, homework_name, status, error=0):
+        """Собираем запись, интернируя строки."""
+        self.homework_id = homework_id
+        self.homework_name = (
+            sys.intern(homework_name) if isinstance(homework_name, str)
+            else homework_name
+        )
+        self.status = sys.intern(status)
+        self.error = error
+
+    @classmethod
+    def from_homework(cls, homework, status=None, error=0):
+        """Берём из сырой записи API только нужные поля."""
+        return cls(homework.get('id'), homework['homework_name'],
+                   status or homework['status'], error)
+
+    @classmethod
+    def from_error(cls, error):
+        """Запись о ДЗ, которую не удалось разобрать."""
+        return cls(None, None, 'unknown', error)
+
+    @property
+    def key(self):
+        """Ключ записи в хранилище."""
+        if self.homework_id is not None:
+            return self.homework_id
+        return self.homework_name
+
+    def to_list(self):
+        """Компактное представление для снимка хранилища."""
+        return [self.homework_id, self.homework_name, self.status, self.error]
+
+    def __eq__(self, other):
+        """Записи равны, если совпадают все поля."""
+        if not isinstance(other, HomeworkState):
+            return NotImplemented
+        return self.to_list() == other.to_list()
+
+    def __repr__(self):
+        """Печатаем запись для логов и тестов."""
+        return f'HomeworkState{tuple(self.to_list())}'
+
+
+def make_homework_state(homework, error) -> HomeworkState:
+    """Сжимаем запись о ДЗ с учётом найденной в ней ошибки."""
+    if error is None:
+        return HomeworkState.from_homework(homework)
+    message = HOMEWORK_EXCEPTIONS_TO_STR[error]
+    if error is WrongStatusInHomeworkException:
+        return HomeworkState.from_homework(homework, status='unknown',
+                                           error=message)
+    return HomeworkState.from_error(message)
+
+
 def parse_hw_with_error(homework):
     """Обрабатываем ошибки при проверке ДЗ."""
+    error = validate_homework(homework)
+    if error is None:
+        return HomeworkState.from_homework(homework)
+    logger.error('%s: %s', HOMEWORK_EXCEPTIONS_TO_STR[error[0]], error[1])
+    metrics.ERRORS.inc(category=error[0].__name__)
+    return make_homework_state(homework, error[0])
+
+
+def parse_homeworks(homeworks) -> List[HomeworkState]:
+    """Проверяем и сжимаем пачку записей о ДЗ.
+    Ошибки не выбрасываются на каждую запись, а сводятся в одну
+    строку лога с числом записей каждого вида.
+    """
+    errors = validate_homeworks(homeworks)
+    error_counts = Counter(error for error in errors if error)
+    if error_counts:
+        logger.error('Ошибки в записях ДЗ: %s', {
+            HOMEWORK_EXCEPTIONS_TO_STR[error]: count
+            for error, count in error_counts.items()
+        })
+        for error, count in error_counts.items():
+            metrics.ERRORS.inc(count, category=error.__name__)
+    metrics.HOMEWORKS_PER_POLL.observe(len(homeworks))
+    return [
+        make_homework_state(homework, error)
+        for homework, error in zip(homeworks, errors)
+    ]
+
+
+def new_storage() -> Dict:
+    """Создаём пустое хранилище состояния ДЗ."""
+    return {
+        'global_error': 0,
+        'homeworks_state': dict(),
+        'current_date': 0,
+        'polls_since_resync': 0,
+        'etag': None,
+        'fingerprint': None,
+        'api_failures': 0,
+        'history': [],
+        'breaker': new_breaker_state(),
+        'cycle': 0,
+    }
+
+
+def get_from_date(homework_storage: Dict) -> int:
+    """Вычисляем from_date для следующего запроса.
+    Без курсора или раз в FULL_RESYNC_POLLS опросов запрашиваем всю историю.
+    """
+    current_date = homework_storage.get('current_date', 0)
+    polls = homework_storage.get('polls_since_resync', 0)
+    if not current_date or polls >= FULL_RESYNC_POLLS:
+        return 0
+    return max(current_date - OVERLAP_TIME, 0)
+
+
+def get_current_date(response_json) -> int:
+    """Достаём курсор current_date из ответа API, 0 если его нет."""
+    current_date = response_json.get('current_date')
+    if isinstance(current_date, int) and not isinstance(current_date, bool):
+        return current_date
+    return 0
+
+
+def read_response(response, previous: Dict, current_timestamp):
+    """Разбираем ответ API в состояние ДЗ."""
+    if is_large_response(response):
+        return read_response_stream(response, previous, current_timestamp)
+    with profiling.stage('decode'):
+        unchanged_state, fingerprint = get_unchanged_state(
+            response, previous, current_timestamp)
+        metrics.API_RESPONSE_BYTES.observe(len(response.content))
+        if unchanged_state is not None:
+            return unchanged_state
+        response_json = response.json()
+    with profiling.stage('validate'):
+        homeworks_state_list = parse_homeworks(check_response(response_json))
+    return {
+        'global_error': 0,
+        'homeworks_state': homeworks_state_list,
+        'current_date': get_current_date(response_json),
+        'full_resync': current_timestamp == 0,
+        'etag': response.headers.get('ETag'),
+        'fingerprint': fingerprint,
+    }
+
+
+def is_large_response(response) -> bool:
+    """Решаем, читать ли ответ потоково."""
+    if response.status_code != HTTPStatus.OK:
+        return False
+    if 'chunked' in response.headers.get('Transfer-Encoding', ''):
+        return True
+    content_length = response.headers.get('Content-Length', '')
+    return content_length.isdigit() and int(content_length) > STREAM_THRESHOLD
+
+
+def read_response_stream(response, previous: Dict, current_timestamp):
+    """Разбираем большой ответ по одной записи о ДЗ.
+    Сырые записи не копятся: каждую сразу сжимаем в HomeworkState.
+    Отпечаток ответа становится известен только в конце, поэтому
+    на этом пути пропускается лишь дифф, а не разбор.
+    """
+    stream = HomeworksStream(response.iter_content(STREAM_CHUNK_SIZE))
     try:
-        check_status(homework)
-        return {**homework, 'error': 0}
-    except WrongRecordHomeworkException as error:
-        logger.error(
-            HOMEWORK_EXCEPTIONS_TO_STR[WrongRecordHomeworkException],
-            error)
-        return {
-            'error': HOMEWORK_EXCEPTIONS_TO_STR[WrongRecordHomeworkException]
-        }
-    except EmptyHomeworkException as error:
-        logger.error(
-            HOMEWORK_EXCEPTIONS_TO_STR[EmptyHomeworkException],
-            error
-        )
-        return {
-            'error': HOMEWORK_EXCEPTIONS_TO_STR[EmptyHomeworkException]
-        }
-    except NoKeyInHomeworkException as error:
-        logger.error(
-            HOMEWORK_EXCEPTIONS_TO_STR[NoKeyInHomeworkException],
-            error
-        )
-        return {
-            'error': HOMEWORK_EXCEPTIONS_TO_STR[NoKeyInHomeworkException]
-        }
-    except WrongStatusInHomeworkException as error:
-        logger.error(
-            HOMEWORK_EXCEPTIONS_TO_STR[WrongStatusInHomeworkException],
-            error
-        )
-        homework['status'] = 'unknown'
-        return {
-            **homework,
-            'error': HOMEWORK_EXCEPTIONS_TO_STR[WrongStatusInHomeworkException]
-        }
+        # Записи проверяются по мере чтения, так что стадия одна
+        with profiling.stage('decode'):
+            homeworks_state_list = [parse_hw_with_error(hw) for hw in stream]
+    finally:
+        response.close()
+        metrics.API_RESPONSE_BYTES.observe(stream.bytes_read)
+    metrics.HOMEWORKS_PER_POLL.observe(len(homeworks_state_list))
+    check_response(stream.document)
+    unchanged = stream.fingerprint == previous.get('fingerprint')
+    return {
+        'global_error': 0,
+        'homeworks_state': [] if unchanged else homeworks_state_list,
+        'current_date': get_current_date(stream.document),
+        'full_resync': current_timestamp == 0,
+        'unchanged': unchanged,
+        'etag': response.headers.get('ETag'),
+        'fingerprint': stream.fingerprint,
+    }
+
+
+def process_yandex_api(current_timestamp: int = 0,
+                       headers: Optional[Dict] = None,
+                       previous: Optional[Dict] = None):
+    """Проверяем ошибки связанные с API Yandex.
+    previous — хранилище с etag и отпечатком прошлого ответа: если ответ
+    не изменился, разбор, проверка и дифф пропускаются.
+    Одинаковые запросы из разных потоков делят один поход в API и разбор.
+    """
+    previous = previous or {}
+    if current_timestamp == 0:
+        # Полная ресинхронизация ищет пропавшие домашки: её ответ диффаем
+        # целиком, даже если тело совпало с прошлым инкрементальным
+        previous = {}
+    headers = headers or HEADERS
+    # От etag и отпечатка зависит, что вернёт разбор, поэтому они
+    # тоже часть ключа, а не только токен и from_date
+    key = (headers.get('Authorization'), current_timestamp,
+           previous.get('etag'), previous.get('fingerprint'))
+    new_hw_state, shared = API_FLIGHTS.do(
+        key, fetch_homeworks_state, current_timestamp, headers, previous)
+    # Список состояний общий и только читается, словарь копируем
+    return dict(new_hw_state) if shared else new_hw_state
 
 
-def process_yandex_api():
-    """Проверяем ошибки связанные с API Yandex."""
-    current_timestamp = 0
+def fetch_homeworks_state(current_timestamp: int, headers: Dict,
+                          previous: Dict):
+    """Запрос к API и разбор ответа в состояние ДЗ или ошибку."""
     try:
-        response_json = get_api_answer(current_timestamp)
-        homeworks_list = check_response(response_json)
-        homeworks_state_list = []
-        for homework in homeworks_list:
-            homework_state = parse_hw_with_error(homework)
-            homeworks_state_list.append(homework_state)
-        return {
-            'global_error': 0,
-            'homeworks_state': homeworks_state_list
-        }
-    except YandexRequestException as error:
-        logger.error(EXCEPTION_TO_STR[YandexRequestException], error)
-        return {
-            'global_error': EXCEPTION_TO_STR[YandexRequestException],
-            'homeworks_state': []
-        }
-    except StatusCodeException as error:
-        logger.error(EXCEPTION_TO_STR[StatusCodeException], error)
-        return {
-            'global_error': EXCEPTION_TO_STR[StatusCodeException],
-            'homeworks_state': []
-        }
-    except EmptyResponseException as error:
-        logger.error(EXCEPTION_TO_STR[EmptyResponseException], error)
-        return {
-            'global_error': EXCEPTION_TO_STR[EmptyResponseException],
-            'homeworks_state': []
-        }
-    except WrongTypeResponseException as error:
-        logger.error(EXCEPTION_TO_STR[WrongTypeResponseException], error)
-        return {
-            'global_error': EXCEPTION_TO_STR[WrongTypeResponseException],
-            'homeworks_state': []
-        }
-    except NoKeyInResponseException as error:
-        logger.error(EXCEPTION_TO_STR[NoKeyInResponseException], error)
-        return {
-            'global_error': EXCEPTION_TO_STR[NoKeyInResponseException],
-            'homeworks_state': []
-        }
-    except WrongKeyTypeResponseException as error:
-        logger.error(EXCEPTION_TO_STR[WrongKeyTypeResponseException], error)
-        return {
-            'global_error': EXCEPTION_TO_STR[WrongKeyTypeResponseException],
-            'homeworks_state': []
-        }
-
-
-def process_homework_changes(new_hw_state, homeworks_storage):
-    """Обрабатываем изменения в ДЗ."""
+        with profiling.stage('fetch'):
+            response = request_api(current_timestamp, headers,
+                                   previous.get('etag'))
+        try:
+            new_hw_state = read_response(response, previous,
+                                         current_timestamp)
+        except requests.exceptions.RequestException as error:
+            # Тело читается уже после requests.get (stream=True), и
+            # таймаут чтения или оборванный chunked всплывают здесь
+            release_response(response)
+            raise YandexRequestException(repr(error))
+        metrics.LAST_SUCCESS.set(time.time())
+        return new_hw_state
+    except tuple(EXCEPTION_TO_STR) as error:
+        global_error = EXCEPTION_TO_STR[type(error)]
+        metrics.ERRORS.inc(category=type(error).__name__)
+        logger.error('%s: %s', global_error, error)
+    except ValueError as error:
+        # Тело ответа не разобралось как JSON
+        global_error = EXCEPTION_TO_STR[WrongTypeResponseException]
+        metrics.ERRORS.inc(category=WrongTypeResponseException.__name__)
+        logger.error('%s: %s', global_error, error)
+    return {
+        'global_error': global_error,
+        'homeworks_state': []
+    }
+
+
+class Changeset(NamedTuple):
+    """Изменения между хранилищем и новым ответом API."""
+
+    added: List[HomeworkState]
+    changed: List[HomeworkState]
+    removed: List[HomeworkState]
+    broken: List[HomeworkState]
+    current: Dict
+
+
+def diff_homeworks(old_state: Dict, new_states: List[HomeworkState],
+                   full_resync: bool = False) -> Changeset:
+    """Сравниваем хранилище с новым ответом за один проход.
+    Пропавшие домашки ищем только при полной ресинхронизации:
+    инкрементальный ответ содержит лишь изменившиеся записи.
+    """
+    current = {}
+    broken = []
+    for hw_state in new_states:
+        if hw_state.error != 0 and hw_state.homework_name is None:
+            broken.append(hw_state)
+        else:
+            current[hw_state.key] = hw_state
+
+    added = []
+    changed = []
+    for key, hw_state in current.items():
+        old_hw_state = old_state.get(key)
+        if old_hw_state is None:
+            added.append(hw_state)
+        elif old_hw_state.status != hw_state.status:
+            changed.append(hw_state)
+
+    removed = []
+    if full_resync:
+        removed = [old_state[key] for key in old_state.keys() - current.keys()]
+    return Changeset(added, changed, removed, broken, current)
+
+
+def apply_changeset(changeset: Changeset, homeworks_storage: Dict) -> None:
+    """Переносим изменения в хранилище."""
+    homeworks_state = homeworks_storage['homeworks_state']
+    homeworks_state.update(changeset.current)
+    for hw_state in changeset.removed:
+        del homeworks_state[hw_state.key]
+
+
+def render_messages(changeset: Changeset) -> List[str]:
+    """Собираем сообщения об изменениях."""
     msg_list = []
-    if new_hw_state["error"] != 0 and new_hw_state.get(
-            'homework_name', None) is None:
+    for hw_state in changeset.broken:
+        msg_list.append(
+            f'Получили неизвестную домашку с ошибкой {hw_state.error}')
+    for hw_state in changeset.added:
         msg_list.append(
-            f'Получили неизвестную домашку с ошибкой {new_hw_state["error"]}')
+            f'На проверке новая домашка: {hw_state.homework_name}')
+        # Если новая домашка с неизвестным статусом - сообщить об ошибке
+        if hw_state.status == 'unknown':
+            msg_list.append(
+                f'Новый статус домашки {hw_state.homework_name} не определён!')
+    for hw_state in changeset.changed:
+        msg_list.append(
+            'Изменился статус проверки работы'
+            f' "{hw_state.homework_name}".'
+            f'{VERDICT_STATUSES.get(hw_state.status, "")}')
+        if hw_state.status == 'unknown':
+            msg_list.append(
+                f'Неопределённый статус домашки: {hw_state.homework_name}.')
+    for hw_state in changeset.removed:
+        msg_list.append(
+            f'Домашка {hw_state.homework_name} пропала из ответа API.')
+    return msg_list
+
+
+def update_cursor(new_homeworks_state, homeworks_storage):
+    """Сдвигаем курсор инкрементального опроса после успешного ответа.
+    Заодно запоминаем etag и отпечаток ответа для следующего запроса.
+    """
+    if new_homeworks_state.get('full_resync', True):
+        homeworks_storage['polls_since_resync'] = 0
     else:
-        # Сначала найдем соответствующую домашку в старых записях,
-        # соответствие по ключу 'homework_name'
-        old_hw_state_founded = homeworks_storage['homeworks_state'].get(
-            new_hw_state['homework_name'],
-            dict()
+        homeworks_storage['polls_since_resync'] = (
+            homeworks_storage.get('polls_since_resync', 0) + 1
         )
-        new_homework_name = new_hw_state['homework_name']
-        # Если old_hw_state_founded остался пустым - значит новая домашка,
-        # добавляем её к старым
-        if len(old_hw_state_founded) == 0:
-            # Записываем в сторадж новую домашку
-
-            homeworks_storage[
-                'homeworks_state'][new_homework_name] = new_hw_state
-            msg_list.append(
-                f'На проверке новая домашка: {new_hw_state["homework_name"]}')
+    current_date = new_homeworks_state.get('current_date', 0)
+    # На ответ 304 сервер не присылает current_date, курсор оставляем
+    if current_date is not None:
+        homeworks_storage['current_date'] = current_date
+    homeworks_storage['etag'] = new_homeworks_state.get('etag')
+    homeworks_storage['fingerprint'] = new_homeworks_state.get('fingerprint')
 
-            # Если новая домашка с неизвестным статусом - сообщить об ошибке
-            if new_hw_state['status'] == 'unknown':
-                msg_list.append(
-                    'Новый статус домашки'
-                    f' {new_hw_state["homework_name"]} не определён!')
-            return homeworks_storage, msg_list
 
-        if new_hw_state['status'] != old_hw_state_founded['status']:
-            msg_list.append(
-                'Изменился статус проверки работы'
-                f' "{new_hw_state["homework_name"]}".'
-                f'{VERDICT_STATUSES[new_hw_state["status"]]}')
-            if new_hw_state['status'] == "unknown":
-                msg_list.append(
-                    'Неопределённый статус домашки:'
-                    f' {new_hw_state["homework_name"]}.')
+def count_api_failures(new_homeworks_state, homeworks_storage):
+    """Считаем опросы подряд, на которых API был недоступен."""
+    if new_homeworks_state['global_error'] in BACKOFF_ERRORS:
+        homeworks_storage['api_failures'] = (
+            homeworks_storage.get('api_failures', 0) + 1
+        )
+    else:
+        homeworks_storage['api_failures'] = 0
+
+
+def get_breaker(homework_storage: Dict) -> CircuitBreaker:
+    """Выключатель API поверх состояния в хранилище."""
+    return CircuitBreaker(
+        homework_storage.setdefault('breaker', new_breaker_state()))
+
+
+def probe_api(headers: Optional[Dict] = None) -> bool:
+    """Дешёвый пробный запрос: домашки, обновлённые с этой секунды."""
+    try:
+        request_api(int(time.time()), headers or HEADERS).close()
+    except (YandexRequestException, StatusCodeException) as error:
+        logger.warning('Пробный запрос к API не прошёл: %s', error)
+        return False
+    return True
+
+
+def guard_api(homework_storage: Dict, headers: Optional[Dict] = None):
+    """Решаем, идти ли в API в этом цикле.
+    Пока цепь разомкнута, не тратим ни соединений, ни разбора.
+    Возвращаем флаг и сообщения о восстановлении API.
+    """
+    breaker = get_breaker(homework_storage)
+    if not breaker.allow_request():
+        return False, []
+    if breaker.state != HALF_OPEN:
+        return True, []
+    if not probe_api(headers):
+        breaker.record_failure()
+        return False, []
+    breaker.record_success()
+    return True, [API_RECOVERED_MESSAGE]
+
 
-            [
-                homeworks_storage['homeworks_state'][new_homework_name]
-            ] = new_hw_state
-    return homeworks_storage, msg_list
+def handle_global_error(global_error: str, homeworks_storage) -> List[str]:
+    """Сообщения об ошибке опроса.
+    О недоступности API сообщает выключатель, один раз за сбой;
+    об остальных ошибках — один раз, пока ошибка не сменится.
+    """
+    if global_error in BACKOFF_ERRORS:
+        homeworks_storage['global_error'] = global_error
+        if get_breaker(homeworks_storage).record_failure() == DOWN:
+            return [API_DOWN_MESSAGE.format(global_error)]
+        return []
+    # API ответил, пусть и ерундой: для выключателя это успех
+    get_breaker(homeworks_storage).record_success()
+    if global_error == homeworks_storage['global_error']:
+        logger.debug('Статус не изменился: Глобальная ошибка')
+        return []
+    homeworks_storage['global_error'] = global_error
+    return [f'Global error: {global_error}']
 
 
-def control_state(new_homeworks_state, homeworks_storage):
+def record_transitions(transitions: TransitionLog,
+                       changeset: Changeset) -> None:
+    """Дописываем найденные смены статусов в лог переходов."""
+    changes = [(hw_state.homework_id, hw_state.status)
+               for hw_state in changeset.added + changeset.changed]
+    changes += [(hw_state.homework_id, 'removed')
+                for hw_state in changeset.removed]
+    if not changes:
+        return
+    try:
+        transitions.append(changes)
+    except OSError as error:
+        # История — не повод терять уведомления
+        logger.error('Не удалось записать смены статусов: %s', error)
+
+
+def control_state(new_homeworks_state, homeworks_storage,
+                  transitions: Optional[TransitionLog] = None):
     """Основная логика работы бота."""
-    if new_homeworks_state[
-        'global_error'
-    ] == homeworks_storage['global_error']:
-        if new_homeworks_state['global_error'] != 0:
-            logger.debug('Статус не изменился: Глобальная ошибка')
-            return [homeworks_storage, []]
+    count_api_failures(new_homeworks_state, homeworks_storage)
+    global_error = new_homeworks_state['global_error']
+    if global_error != 0:
+        return homeworks_storage, handle_global_error(global_error,
+                                                      homeworks_storage)
+    homeworks_storage['global_error'] = 0
+    get_breaker(homeworks_storage).record_success()
 
-    else:
-        if new_homeworks_state['global_error'] != 0:
-            homeworks_storage['global_error'] = [
-                new_homeworks_state['global_error']
-            ]
-            return [
-                homeworks_storage,
-                [f'Global error {homeworks_storage["global_error"]}']
-            ]
-        homeworks_storage['global_error'] = 0
-
-    hw_messages_list = []
-    # Пробегаемся по каждой записи в листе новых домашек
-    # (new_homeworks_state['homeworks_state'])
-    for new_hw_state in new_homeworks_state['homeworks_state']:
-        homeworks_storage, msg_list = process_homework_changes(
-            new_hw_state=new_hw_state, homeworks_storage=homeworks_storage)
-        hw_messages_list += msg_list
+    update_cursor(new_homeworks_state, homeworks_storage)
+    if new_homeworks_state.get('unchanged'):
+        return homeworks_storage, []
+    with metrics.DIFF_SECONDS.time(), profiling.stage('diff'):
+        changeset = diff_homeworks(
+            homeworks_storage['homeworks_state'],
+            new_homeworks_state['homeworks_state'],
+            new_homeworks_state.get('full_resync', False)
+        )
+        apply_changeset(changeset, homeworks_storage)
+        hw_messages_list = render_messages(changeset)
+    if transitions is not None:
+        record_transitions(transitions, changeset)
 
     if len(hw_messages_list) == 0:
         logger.debug('Статус не изменился.')
@@ -316,41 +784,260 @@ def control_state(new_homeworks_state, homeworks_storage):
     return homeworks_storage, hw_messages_list
 
 
-def bot_startup(homework_storage: Dict) -> Dict:
+def bot_startup(homework_storage: Dict,
+                headers: Optional[Dict] = None,
+                transitions: Optional[TransitionLog] = None) -> Dict:
     """Заполняем словарь с ДЗ, с которым впоследствии будем сравнивать."""
-    new_hw_state = process_yandex_api()
+    new_hw_state = process_yandex_api(get_from_date(homework_storage),
+                                      headers, homework_storage)
     homework_storage, _ = control_state(new_homeworks_state=new_hw_state,
-                                        homeworks_storage=homework_storage)
+                                        homeworks_storage=homework_storage,
+                                        transitions=transitions)
     return homework_storage
 
 
-def bot_process(homework_storage: Dict, bot) -> Dict:
+def bot_process(homework_storage: Dict, outbox,
+                headers: Optional[Dict] = None, chat_id=None,
+                transitions: Optional[TransitionLog] = None) -> Dict:
     """Перезаписываем словарь с ДЗ, с которым впоследствии будем сравнивать.
-    Отправляем сообщение в случае наличия их в message_list
+    Сообщения из message_list отправляем одним дайджестом через outbox.
+    headers и chat_id задают студента, по умолчанию берём их из окружения,
+    смены статусов дописываем в transitions.
     """
-    new_hw_state = process_yandex_api()
-    homework_storage, message_list = control_state(
-        new_homeworks_state=new_hw_state,
-        homeworks_storage=homework_storage
-    )
-    for message in message_list:
-        send_message(bot, message)
+    with profiling.cycle():
+        homework_storage['cycle'] = homework_storage.get('cycle', 0) + 1
+        allowed, message_list = guard_api(homework_storage, headers)
+        if allowed:
+            new_hw_state = process_yandex_api(
+                get_from_date(homework_storage), headers, homework_storage)
+            homework_storage, changes = control_state(
+                new_homeworks_state=new_hw_state,
+                homeworks_storage=homework_storage,
+                transitions=transitions
+            )
+            message_list += changes
+        if message_list:
+            record_history(homework_storage, message_list)
+            chat_id = chat_id or TELEGRAM_CHAT_ID
+            with profiling.stage('send'):
+                outbox.send(chat_id, message_list, key=make_digest_key(
+                    chat_id, homework_storage['cycle'], message_list))
     return homework_storage
 
 
+def make_digest_key(chat_id, cycle: int, message_list: List[str]) -> str:
+    """Ключ идемпотентности дайджеста.
+    Номер цикла сохраняется вместе с хранилищем: если процесс упал до
+    сохранения, повторный цикл получит тот же номер и тот же дифф, и
+    журнал не даст отправить дайджест второй раз. Одинаковый текст в
+    другом цикле (домашку снова взяли на проверку) — уже другой ключ.
+    """
+    hasher = hashlib.blake2b(digest_size=8)
+    for message in message_list:
+        hasher.update(message.encode())
+        hasher.update(b'\0')
+    return f'{chat_id}:{cycle}:{hasher.hexdigest()}'
+
+
+def record_history(homework_storage: Dict, message_list: List[str]) -> None:
+    """Запоминаем последние HISTORY_SIZE уведомлений для /history."""
+    history = homework_storage.setdefault('history', [])
+    now = int(time.time())
+    history.extend([now, message] for message in message_list)
+    del history[:-HISTORY_SIZE]
+
+
+def render_status(homework_storage: Dict) -> str:
+    """Ответ на /status: статусы из хранилища, без запроса к API."""
+    # list() снимает копию за один шаг под GIL, пока опрос меняет словарь
+    hw_states = list(homework_storage['homeworks_state'].values())
+    if not hw_states:
+        lines = ['Домашек пока нет.']
+    else:
+        lines = ['Статусы домашек:']
+    hw_states.sort(key=lambda hw_state: str(hw_state.homework_name))
+    for hw_state in hw_states[:STATUS_LIMIT]:
+        verdict = hw_state.error or VERDICT_STATUSES.get(
+            hw_state.status, hw_state.status)
+        lines.append(f'{hw_state.homework_name or "Без названия"}: {verdict}')
+    if len(hw_states) > STATUS_LIMIT:
+        lines.append(f'И ещё {len(hw_states) - STATUS_LIMIT}.')
+    if homework_storage['global_error']:
+        lines.append(
+            f'Последний опрос API не удался: '
+            f'{homework_storage["global_error"]}')
+    return '\n'.join(lines)
+
+
+def render_history(homework_storage: Dict) -> str:
+    """Ответ на /history: последние уведомления из хранилища."""
+    history = list(homework_storage.get('history', []))
+    if not history:
+        return 'Уведомлений пока не было.'
+    return '\n'.join(
+        f'{time.strftime("%d.%m %H:%M", time.localtime(sent))} {message}'
+        for sent, message in history)
+
+
+COMMAND_HANDLERS = {
+    '/status': render_status,
+    '/history': render_history,
+}
+
+
+def start_commands(bot, outbox, get_storage) -> Optional[CommandListener]:
+    """Слушаем команды из Telegram, если они включены."""
+    if not BOT_COMMANDS:
+        return None
+    return CommandListener(bot, outbox, get_storage,
+                           COMMAND_HANDLERS).start()
+
+
+def persist_storage(homework_storage: Dict,
+                    path: Optional[str] = None) -> None:
+    """Сохраняем снимок хранилища, записи ДЗ — компактными списками."""
+    save_storage(path or STORAGE_PATH, {
+        **homework_storage,
+        'homeworks_state': [
+            hw_state.to_list()
+            for hw_state in homework_storage['homeworks_state'].values()
+        ],
+    })
+
+
+def restore_storage(path: Optional[str] = None):
+    """Поднимаем хранилище ДЗ из снимка, None если снимка нет."""
+    path = path or STORAGE_PATH
+    homework_storage = load_storage(path)
+    if homework_storage is None:
+        return None
+    logger.info('Хранилище ДЗ восстановлено из снимка %s', path)
+    # Ключи JSON всегда строки, поэтому ключи записей собираем заново
+    homeworks_state = {}
+    for values in homework_storage.get('homeworks_state', []):
+        hw_state = HomeworkState(*values)
+        homeworks_state[hw_state.key] = hw_state
+    return {
+        **new_storage(),
+        **homework_storage,
+        'homeworks_state': homeworks_state,
+    }
+
+
+def create_bot(pool_size: int = DELIVERY_WORKERS):
+    """Создаём бота с пулом соединений под потоки отправки."""
+    from telegram.utils.request import Request
+
+    return telegram.Bot(token=TELEGRAM_TOKEN,
+                        request=Request(con_pool_size=pool_size))
+
+
+def handle_sigterm(signum, frame):
+    """Превращаем SIGTERM в SystemExit, чтобы отработали блоки finally."""
+    raise SystemExit(0)
+
+
 def main():
     """Делаем запрос каждые 10 мин в бесконечном цикле."""
-    homework_storage: Dict = {
-        'global_error': 0,
-        'homeworks_state': dict()
-    }
+    STARTUP.mark('import')
+    listener = setup_logging()
+    try:
+        run_bot()
+    finally:
+        # Дописываем в лог всё, что осталось в очереди
+        listener.stop()
+
+
+def run_bot():
+    """Поднимаем сессию, бота и очередь отправки и опрашиваем API."""
+    global http_session
 
     if not check_tokens():
         return
+    STARTUP.mark('check_tokens')
+
+    http_session = create_http_session()
+    metrics.start_metrics_server(METRICS_PORT)
+    signal.signal(signal.SIGTERM, handle_sigterm)
+    profiling.PROFILER.install_signal_handlers()
+    # Бот и telegram понадобятся только с первым сообщением
+    bot = LazyBot(create_bot)
+    # Из реплик на узле опрашивает и шлёт только держатель аренды
+    lease = Lease(LeaseStore(LEASE_PATH),
+                  f'homework:{TELEGRAM_CHAT_ID}').start()
+    STARTUP.mark('setup')
+    try:
+        run_polling(bot, lease, TransitionLog(TRANSITIONS_PATH))
+    finally:
+        lease.stop()
 
-    bot = telegram.Bot(token=TELEGRAM_TOKEN)
-    homework_storage = bot_startup(homework_storage)
 
+def run_polling(bot, lease=None, transitions=None):
+    """Ждём аренду в резерве и опрашиваем API, пока она наша.
+    Журнал отправки у реплик общий и открыт только у лидера, так что
+    ключи дайджестов переходят к новому лидеру вместе с арендой.
+    Без аренды считаем себя единственной репликой.
+    """
     while True:
-        time.sleep(RETRY_TIME)
-        homework_storage = bot_process(homework_storage, bot)
+        if lease is not None:
+            lease.wait()
+        journal = Journal.exclusive(JOURNAL_PATH)
+        outbox = DeliveryPool(Outbox(bot), journal=journal)
+        try:
+            lead(outbox, bot, lease, transitions)
+        finally:
+            # Дорассылаем всё, что успело попасть в очередь
+            outbox.close()
+            journal.close()
+
+
+def lead(outbox, bot=None, lease=None, transitions=None):
+    """Опрашиваем API по расписанию, пока не потеряем аренду.
+    С ботом ещё и отвечаем на команды из чата TELEGRAM_CHAT_ID.
+    """
+    if lease is not None and not lease.held():
+        # Аренду потеряли, пока ждали журнал прежнего лидера
+        return
+    # После тёплого рестарта или смены лидера сразу прогоняем цикл,
+    # чтобы сообщить об изменениях, случившихся без нас.
+    # Сначала дорассылаем то, что не успели доставить до рестарта
+    outbox.replay()
+    # Снимок общий для реплик: читаем то, что записал прежний лидер
+    homework_storage = restore_storage()
+    STARTUP.mark('restore')
+    if homework_storage is None:
+        homework_storage = bot_startup(new_storage(),
+                                       transitions=transitions)
+    else:
+        homework_storage = bot_process(homework_storage, outbox,
+                                       transitions=transitions)
+    STARTUP.mark('first_poll')
+    STARTUP.report()
+    persist_storage(homework_storage)
+    listener = None
+    if bot is not None:
+        # Замыкание видит текущее хранилище, даже когда его пересобрали
+        listener = start_commands(bot, outbox, lambda chat_id: (
+            homework_storage if str(chat_id) == str(TELEGRAM_CHAT_ID)
+            else None))
+
+    scheduler = PollScheduler(RETRY_TIME)
+    try:
+        while True:
+            delay = scheduler.next_delay(homework_storage['api_failures'])
+            if lease is None:
+                time.sleep(delay)
+            elif lease.lost.wait(delay) or not lease.held():
+                # Опрос и команды перешли к другой реплике
+                return
+            outbox.replay()
+            homework_storage = bot_process(homework_storage, outbox,
+                                           transitions=transitions)
+            persist_storage(homework_storage)
+    finally:
+        if listener is not None:
+            listener.stop()
+
+
+if __name__ == '__main__':
+    main()
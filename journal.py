@@ -0,0 +1,253 @@
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import metrics
+from storage import fsync_directory
+
+logger = logging.getLogger(__name__)
+
+# Сколько ключей доставленных сообщений помним для отсева повторов
+KEEP_DONE = 1000
+# После стольких записей журнал переписывается без доставленного
+COMPACT_RECORDS = 10000
+# Сколько реплик на узле могут держать по своему журналу
+JOURNAL_SLOTS = 16
+
+ENQUEUE = 'enqueue'
+# Доставлена очередная часть длинного дайджеста
+SENT = 'sent'
+DONE = 'done'
+
+FSYNCS = metrics.Counter(
+    'homework_journal_fsyncs_total',
+    'Сбросы журнала отправки на диск')
+PENDING = metrics.Gauge(
+    'homework_journal_pending',
+    'Сообщения в журнале, ещё не доставленные в Telegram')
+
+
+class Journal:
+    """Журнал отправки (write-ahead log) для сообщений в Telegram.
+    Сообщение попадает в журнал и на диск до того, как сохраняется
+    хранилище ДЗ, а после доставки помечается done. После падения
+    недоставленное отправляется заново, а ключ идемпотентности не даёт
+    поставить в очередь то же сообщение второй раз.
+    Записи — строки JSON. fsync общий: поток, пришедший за сбросом,
+    когда его запись уже сбросил другой поток, на диск не ходит.
+    """
+
+    def __init__(self, path: str, keep_done: int = KEEP_DONE,
+                 compact_records: int = COMPACT_RECORDS):
+        """Читаем журнал, ужимаем его и открываем на дозапись."""
+        self.path = path
+        self.keep_done = keep_done
+        self.compact_records = compact_records
+        self.pending: Dict[str, Tuple] = OrderedDict()
+        # Сколько частей дайджеста уже доставлено
+        self.sent: Dict[str, int] = {}
+        self.done: Dict[str, None] = OrderedDict()
+        self.lock = threading.Lock()
+        self.sync_lock = threading.Lock()
+        self.written = 0
+        self.synced = 0
+        self.lock_file = None
+        self.load()
+        self.compact()
+        PENDING.function = lambda: len(self.pending)
+
+    @classmethod
+    def exclusive(cls, path: str, **kwargs) -> 'Journal':
+        """Открываем общий журнал реплик, дождавшись прежнего владельца.
+        Замок держим до закрытия журнала: прежний лидер успевает
+        дорассылать очередь и закрыть журнал раньше, чем его прочитает
+        новый, и ключи дайджестов переходят к новому лидеру целиком.
+        """
+        lock_file = open(path + '.lock', 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            journal = cls(path, **kwargs)
+        except BaseException:
+            lock_file.close()
+            raise
+        journal.lock_file = lock_file
+        return journal
+
+    @classmethod
+    def claim(cls, path: str, slots: int = JOURNAL_SLOTS,
+              **kwargs) -> 'Journal':
+        """Открываем первый журнал, не занятый другой репликой.
+        path, path-1, path-2...: замок держим до закрытия журнала, а
+        журнал упавшей реплики подхватит и дорассылает следующая.
+        """
+        base, extension = os.path.splitext(path)
+        for slot in range(slots):
+            slot_path = path if slot == 0 else f'{base}-{slot}{extension}'
+            lock_file = open(slot_path + '.lock', 'a')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                continue
+            journal = cls(slot_path, **kwargs)
+            journal.lock_file = lock_file
+            return journal
+        raise RuntimeError(f'Все {slots} журналов {path} заняты')
+
+    def load(self) -> None:
+        """Проигрываем журнал: что поставлено и что уже доставлено."""
+        try:
+            journal_file = open(self.path, encoding='utf-8')
+        except FileNotFoundError:
+            return
+        with journal_file:
+            for line in journal_file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Хвост, недописанный при падении
+                    logger.warning('Пропускаем битую запись журнала %s',
+                                   self.path)
+                    continue
+                self.apply(record)
+        if self.pending:
+            logger.info('В журнале %s недоставленных сообщений',
+                        len(self.pending))
+
+    def apply(self, record: Dict) -> None:
+        """Применяем одну запись журнала к состоянию в памяти."""
+        key = record['key']
+        if record['op'] == ENQUEUE:
+            self.pending[key] = (record['chat_id'], record['messages'])
+            if record.get('sent'):
+                self.sent[key] = record['sent']
+        elif record['op'] == SENT:
+            if key in self.pending:
+                self.sent[key] = max(self.sent.get(key, 0),
+                                     record['part'] + 1)
+        elif record['op'] == DONE:
+            self.pending.pop(key, None)
+            self.sent.pop(key, None)
+            self.remember_done(key)
+
+    def remember_done(self, key: str) -> None:
+        """Помним последние keep_done доставленных ключей."""
+        self.done[key] = None
+        while len(self.done) > self.keep_done:
+            self.done.popitem(last=False)
+
+    def compact(self) -> None:
+        """Атомарно переписываем журнал: недоставленное и свежие ключи."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as tmp_file:
+                for key in self.done:
+                    tmp_file.write(self.dump({'op': DONE, 'key': key}))
+                for key, (chat_id, messages) in self.pending.items():
+                    tmp_file.write(self.dump({
+                        'op': ENQUEUE, 'key': key,
+                        'chat_id': chat_id, 'messages': messages,
+                        'sent': self.sent.get(key, 0),
+                    }))
+                tmp_file.flush()
+                os.fsync(tmp_file.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        fsync_directory(directory)
+        self.records = len(self.done) + len(self.pending)
+        self.file = open(self.path, 'a', encoding='utf-8')
+
+    @staticmethod
+    def dump(record: Dict) -> str:
+        """Запись журнала одной строкой."""
+        return json.dumps(record, ensure_ascii=False,
+                          separators=(',', ':')) + '\n'
+
+    def write(self, record: Dict) -> int:
+        """Дописываем запись в буфер файла, возвращаем её номер."""
+        self.file.write(self.dump(record))
+        self.written += 1
+        self.records += 1
+        return self.written
+
+    def append(self, key: str, chat_id, messages: List[str]) -> bool:
+        """Ставим сообщение в журнал и сбрасываем на диск.
+        False — сообщение с таким ключом уже было, слать его не нужно.
+        """
+        with self.lock:
+            if key in self.pending or key in self.done:
+                return False
+            self.pending[key] = (chat_id, list(messages))
+            number = self.write({'op': ENQUEUE, 'key': key,
+                                 'chat_id': chat_id, 'messages': messages})
+        self.commit(number)
+        return True
+
+    def is_pending(self, key: str) -> bool:
+        """Ждёт ли сообщение доставки."""
+        with self.lock:
+            return key in self.pending
+
+    def progress(self, key: str) -> int:
+        """Сколько первых частей дайджеста уже доставлено."""
+        with self.lock:
+            return self.sent.get(key, 0)
+
+    def part_sent(self, key: str, part: int) -> None:
+        """Отмечаем доставку части part, чтобы после сбоя не слать её снова."""
+        with self.lock:
+            if key not in self.pending:
+                return
+            self.sent[key] = part + 1
+            number = self.write({'op': SENT, 'key': key, 'part': part})
+        self.commit(number)
+
+    def complete(self, key: str) -> None:
+        """Помечаем сообщение доставленным."""
+        with self.lock:
+            if self.pending.pop(key, None) is None:
+                return
+            self.sent.pop(key, None)
+            self.remember_done(key)
+            number = self.write({'op': DONE, 'key': key})
+        self.commit(number)
+        if self.records > self.compact_records:
+            with self.sync_lock, self.lock:
+                self.file.close()
+                self.compact()
+
+    def commit(self, number: int) -> None:
+        """Сбрасываем журнал на диск хотя бы до записи number."""
+        with self.sync_lock:
+            if self.synced >= number:
+                return
+            with self.lock:
+                self.file.flush()
+                written = self.written
+            os.fsync(self.file.fileno())
+            FSYNCS.inc()
+            self.synced = written
+
+    def pending_items(self) -> List[Tuple[str, object, List[str]]]:
+        """Недоставленные сообщения в порядке постановки."""
+        with self.lock:
+            return [(key, chat_id, messages)
+                    for key, (chat_id, messages) in self.pending.items()]
+
+    def close(self) -> None:
+        """Сбрасываем и закрываем журнал."""
+        with self.sync_lock, self.lock:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+        if self.lock_file is not None:
+            self.lock_file.close()
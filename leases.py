@@ -0,0 +1,170 @@
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# База аренд общая для всех реплик на узле
+LEASE_PATH = os.getenv('LEASE_PATH', 'homework_leases.db')
+# Лидер, не продливший аренду за LEASE_TTL секунд, считается упавшим
+LEASE_TTL = float(os.getenv('LEASE_TTL', 10))
+
+LEADER = metrics.Gauge(
+    'homework_lease_leader',
+    'Держит ли реплика аренду: 1 — опрашивает и шлёт, 0 — в резерве')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    expires REAL NOT NULL
+)
+'''
+# Берём аренду, если она свободна, просрочена или уже наша
+ACQUIRE = '''
+INSERT INTO leases (name, holder, expires) VALUES (:name, :holder, :expires)
+ON CONFLICT (name) DO UPDATE
+SET holder = excluded.holder, expires = excluded.expires
+WHERE leases.holder = excluded.holder OR leases.expires <= :now
+'''
+
+
+def holder_id() -> str:
+    """Id реплики: узел и процесс."""
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+class LeaseStore:
+    """Аренды в SQLite: кто из реплик опрашивает API и шлёт сообщения.
+    Захват и продление — один атомарный UPSERT, так что из двух реплик
+    аренду получает ровно одна. Работает без сети и внешних сервисов;
+    часы у реплик общие, потому что они живут на одном узле. База
+    должна лежать на локальном диске: WAL не работает на сетевом.
+    """
+
+    def __init__(self, path: str = LEASE_PATH,
+                 holder: Optional[str] = None, ttl: float = LEASE_TTL,
+                 clock=time.time):
+        """Создаём таблицу аренд, если её ещё нет."""
+        self.path = path
+        self.holder = holder or holder_id()
+        self.ttl = ttl
+        self.clock = clock
+        with closing(self.connect()) as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(SCHEMA)
+
+    def connect(self) -> sqlite3.Connection:
+        """Своё соединение на вызов: store делят потоки."""
+        return sqlite3.connect(self.path, timeout=self.ttl,
+                               isolation_level=None)
+
+    def acquire(self, name: str) -> bool:
+        """Берём или продлеваем аренду name на ttl секунд."""
+        now = self.clock()
+        with closing(self.connect()) as connection:
+            cursor = connection.execute(ACQUIRE, {
+                'name': name, 'holder': self.holder,
+                'expires': now + self.ttl, 'now': now,
+            })
+            return cursor.rowcount == 1
+
+    def release(self, name: str) -> None:
+        """Отдаём аренду, чтобы резерв подхватил её сразу."""
+        with closing(self.connect()) as connection:
+            connection.execute(
+                'DELETE FROM leases WHERE name = ? AND holder = ?',
+                (name, self.holder))
+
+    def owner(self, name: str) -> Optional[str]:
+        """Кто держит аренду сейчас."""
+        with closing(self.connect()) as connection:
+            row = connection.execute(
+                'SELECT holder FROM leases WHERE name = ? AND expires > ?',
+                (name, self.clock())).fetchone()
+        return row and row[0]
+
+
+class Lease:
+    """Аренда лидера с продлением в фоновом потоке.
+    Продлеваем каждые ttl/3 секунд; если продлить не удалось, считаем
+    аренду потерянной не позже, чем её может забрать другая реплика.
+    """
+
+    def __init__(self, store: LeaseStore, name: str,
+                 renew_time: Optional[float] = None):
+        """Пока аренду не взяли, мы в резерве."""
+        self.store = store
+        self.name = name
+        self.renew_time = renew_time or store.ttl / 3
+        self.expires = 0.0
+        self.leader = False
+        # Взводится, когда аренду потеряли: лидер бросает опрос
+        self.lost = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def held(self) -> bool:
+        """Держим ли аренду прямо сейчас."""
+        return self.store.clock() < self.expires
+
+    def renew(self) -> bool:
+        """Берём или продлеваем аренду и запоминаем, до каких пор она наша."""
+        started = self.store.clock()
+        try:
+            acquired = self.store.acquire(self.name)
+        except sqlite3.Error as error:
+            logger.error('Не удалось продлить аренду %s: %s',
+                         self.name, error)
+            acquired = False
+        if acquired:
+            self.expires = started + self.store.ttl
+        held = self.held()
+        if held and not self.leader:
+            logger.info('Реплика %s стала лидером %s',
+                        self.store.holder, self.name)
+            self.lost.clear()
+        elif self.leader and not held:
+            logger.warning('Реплика %s потеряла аренду %s',
+                           self.store.holder, self.name)
+            self.lost.set()
+        self.leader = held
+        LEADER.set(int(held))
+        return acquired
+
+    def wait(self) -> None:
+        """Ждём в резерве, пока аренда не освободится и не станет нашей."""
+        while not self.held():
+            if self.renew():
+                return
+            self.stopped.wait(self.renew_time)
+
+    def run(self) -> None:
+        """Продлеваем аренду, пока реплику не остановят."""
+        while not self.stopped.wait(self.renew_time):
+            self.renew()
+
+    def start(self) -> 'Lease':
+        """Запускаем продление в фоновом потоке."""
+        self.thread = threading.Thread(
+            target=self.run, name='lease', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Останавливаем продление и отдаём аренду резерву."""
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        if self.held():
+            self.store.release(self.name)
+        self.expires = 0.0
+        self.leader = False
+        LEADER.set(0)
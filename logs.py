@@ -0,0 +1,66 @@
+import json
+import logging
+import os
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+# text — привычные строки, json — по объекту JSON на строку
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class JsonFormatter(logging.Formatter):
+    """Запись лога одной строкой JSON."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        """Собираем поля записи, кириллицу не экранируем."""
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, separators=(',', ':'))
+
+
+class LazyQueueHandler(QueueHandler):
+    """Кладёт запись в очередь как есть.
+    Стандартный QueueHandler склеивает сообщение ещё в вызывающем потоке;
+    здесь и это, и форматирование делает фоновый поток. Поэтому в лог
+    передаём значения, которые после вызова уже не меняются.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Очередь внутри процесса, копировать запись не нужно."""
+        return record
+
+
+def make_formatter(log_format: str = LOG_FORMAT) -> logging.Formatter:
+    """Форматтер для выбранного формата логов."""
+    if log_format == 'json':
+        return JsonFormatter()
+    return logging.Formatter(TEXT_FORMAT)
+
+
+def setup_logging(level: str = LOG_LEVEL, log_format: str = LOG_FORMAT,
+                  stream=None) -> QueueListener:
+    """Один обработчик на корневом логгере, запись в фоновом потоке.
+    Прежние обработчики корневого логгера снимаем, чтобы строки не
+    дублировались. Возвращаем запущенный слушатель: его stop()
+    дописывает очередь при остановке.
+    """
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(make_formatter(log_format))
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for old_handler in root.handlers[:]:
+        root.removeHandler(old_handler)
+    root.addHandler(LazyQueueHandler(log_queue))
+    root.setLevel(level)
+    listener = QueueListener(log_queue, handler)
+    listener.start()
+    return listener
@@ -0,0 +1,262 @@
+import bisect
+import logging
+import math
+import threading
+import time
+from typing import Dict, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+                   30)
+BYTES_BUCKETS = tuple(4 ** power * 256 for power in range(11))
+COUNT_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 10000, 100000, 1000000)
+
+
+def escape(value: str) -> str:
+    """Экранируем значение метки для текстового формата Prometheus."""
+    return (value.replace('\\', '\\\\').replace('\n', '\\n')
+            .replace('"', '\\"'))
+
+
+def format_labels(names: Sequence[str], values: Tuple, extra: str = '') -> str:
+    """Собираем {метка="значение",...}."""
+    pairs = [f'{name}="{escape(str(value))}"'
+             for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def format_value(value: float) -> str:
+    """Число в текстовом формате Prometheus."""
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """Базовая метрика: имя, описание, метки и значения по меткам."""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str,
+                 labelnames: Sequence[str] = ()):
+        """Регистрируем метрику в общем реестре."""
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[Tuple, object] = {}
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def key(self, labels: Dict) -> Tuple:
+        """Значения меток в порядке labelnames."""
+        return tuple(labels.get(name, '') for name in self.labelnames)
+
+    def render(self):
+        """Строки метрики в текстовом формате Prometheus."""
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} {self.kind}'
+        with self.lock:
+            items = sorted(self.values.items())
+        for labels, value in items:
+            yield from self.render_value(labels, value)
+
+    def render_value(self, labels: Tuple, value):
+        """Строка одного значения."""
+        yield (f'{self.name}{format_labels(self.labelnames, labels)} '
+               f'{format_value(value)}')
+
+
+class Counter(Metric):
+    """Монотонный счётчик."""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """Увеличиваем счётчик."""
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Значение, которое может расти и падать."""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str,
+                 labelnames: Sequence[str] = (), function=None):
+        """function, если задана, вычисляет значение в момент выдачи."""
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+
+    def set(self, value: float, **labels) -> None:
+        """Задаём значение."""
+        with self.lock:
+            self.values[self.key(labels)] = value
+
+    def render(self):
+        """Перед выдачей пересчитываем значение-функцию."""
+        if self.function is not None:
+            value = self.function()
+            if value is not None:
+                self.set(value)
+        yield from super().render()
+
+
+class Histogram(Metric):
+    """Гистограмма с накопительными корзинами, как в Prometheus."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str,
+                 buckets: Sequence[float] = LATENCY_BUCKETS,
+                 labelnames: Sequence[str] = ()):
+        """Корзины сортируем и добавляем +Inf."""
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels) -> None:
+        """Добавляем наблюдение."""
+        key = self.key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            counts, total = self.values.get(
+                key, ([0] * len(self.buckets), 0.0))
+            counts[index] += 1
+            self.values[key] = (counts, total + value)
+
+    def time(self, **labels):
+        """Контекстный менеджер, замеряющий длительность блока."""
+        return Timer(self, labels)
+
+    def render_value(self, labels: Tuple, value):
+        """Корзины, сумма и число наблюдений."""
+        counts, total = value
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            le = f'le="{format_value(bound)}"'
+            yield (f'{self.name}_bucket'
+                   f'{format_labels(self.labelnames, labels, le)} '
+                   f'{cumulative}')
+        suffix = format_labels(self.labelnames, labels)
+        yield f'{self.name}_sum{suffix} {format_value(total)}'
+        yield f'{self.name}_count{suffix} {cumulative}'
+
+
+class Timer:
+    """Замер длительности блока в секундах."""
+
+    def __init__(self, histogram: Histogram, labels: Dict):
+        """Запоминаем, куда писать замер."""
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        """Засекаем время."""
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        """Пишем замер и не глотаем исключения."""
+        self.histogram.observe(time.perf_counter() - self.started,
+                               **self.labels)
+        return False
+
+
+REGISTRY = []
+
+
+def render_metrics() -> str:
+    """Все метрики в текстовом формате Prometheus."""
+    lines = []
+    for metric in list(REGISTRY):
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def make_metrics_handler():
+    """Обработчик /metrics.
+    http.server тянет за собой заметную часть стандартной библиотеки,
+    поэтому импортируем его, только когда метрики включены.
+    """
+    from http import HTTPStatus
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        """Отдаём /metrics."""
+
+        def do_GET(self):
+            """Отвечаем метриками на любой путь /metrics."""
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(HTTPStatus.NOT_FOUND)
+                return
+            body = render_metrics().encode()
+            self.send_response(HTTPStatus.OK)
+            self.send_header('Content-Type',
+                             'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            """Опросы Prometheus в лог не пишем."""
+
+    return MetricsHandler
+
+
+def start_metrics_server(port: int, host: str = '127.0.0.1'):
+    """Поднимаем /metrics в фоновом потоке, port=0 — метрики выключены."""
+    if not port:
+        return None
+    from http.server import ThreadingHTTPServer
+
+    server = ThreadingHTTPServer((host, port), make_metrics_handler())
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True,
+                     name='metrics').start()
+    logger.info('Метрики доступны на http://%s:%s/metrics', host, port)
+    return server
+
+
+# Метрики бота
+API_REQUEST_SECONDS = Histogram(
+    'homework_api_request_seconds',
+    'Время от запроса к API Практикума до заголовков ответа')
+API_RESPONSE_BYTES = Histogram(
+    'homework_api_response_bytes',
+    'Размер тела ответа API Практикума', BYTES_BUCKETS)
+HOMEWORKS_PER_POLL = Histogram(
+    'homework_homeworks_per_poll',
+    'Число домашек в разобранном ответе API', COUNT_BUCKETS)
+DIFF_SECONDS = Histogram(
+    'homework_diff_seconds',
+    'Длительность диффа хранилища в control_state')
+MESSAGES_SENT = Counter(
+    'homework_messages_sent_total',
+    'Сообщения, доставленные в Telegram')
+MESSAGES_FAILED = Counter(
+    'homework_messages_failed_total',
+    'Сообщения, которые не удалось доставить в Telegram')
+TELEGRAM_SEND_SECONDS = Histogram(
+    'homework_telegram_send_seconds',
+    'Длительность одного вызова send_message в Telegram')
+ERRORS = Counter(
+    'homework_errors_total',
+    'Ошибки API и записей ДЗ по категориям', ['category'])
+LAST_SUCCESS = Gauge(
+    'homework_last_success_timestamp_seconds',
+    'Время последнего успешного опроса API (unix time)')
+LAST_SUCCESS_AGE = Gauge(
+    'homework_last_success_age_seconds',
+    'Сколько секунд прошло с последнего успешного опроса API',
+    function=lambda: (time.time() - LAST_SUCCESS.values[()]
+                      if () in LAST_SUCCESS.values else None))
+DELIVERY_QUEUE_DEPTH = Gauge(
+    'homework_delivery_queue_depth',
+    'Дайджесты в очереди на отправку в Telegram')
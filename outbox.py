@@ -0,0 +1,371 @@
+import logging
+import queue
+import threading
+import time
+import zlib
+from typing import Dict, List
+
+import metrics
+from startup import lazy_import
+
+telegram = lazy_import('telegram')
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_MESSAGE_LIMIT = 4096
+# Лимиты Telegram: около 30 сообщений в секунду на бота
+# и не больше одного сообщения в секунду в один чат
+GLOBAL_RATE = 30
+CHAT_RATE = 1
+MAX_SEND_ATTEMPTS = 5
+# Сколько раз переотправляем недоставленное из журнала, прежде чем бросить
+MAX_REPLAYS = 5
+DELIVERY_WORKERS = 4
+DELIVERY_QUEUE_SIZE = 1000
+DIGEST_SEPARATOR = '\n\n'
+
+
+class TokenBucket:
+    """Ведро токенов: rate токенов в секунду, не больше capacity."""
+
+    def __init__(self, rate: float, capacity: float, clock=time.monotonic):
+        """Начинаем с полного ведра."""
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Забираем токен и возвращаем, сколько секунд ждать до него."""
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(self.capacity,
+                              self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0
+            return -self.tokens / self.rate
+
+    def try_acquire(self) -> bool:
+        """Забираем токен, только если он есть прямо сейчас."""
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(self.capacity,
+                              self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+def make_digest(messages: List[str],
+                limit: int = TELEGRAM_MESSAGE_LIMIT) -> List[str]:
+    """Склеиваем сообщения одного прохода в дайджест.
+    Дайджест режем на части не длиннее лимита Telegram,
+    не разрывая отдельные сообщения, если они сами влезают в лимит.
+    """
+    digests = []
+    current = ''
+    for message in messages:
+        for part in split_message(message, limit):
+            if not current:
+                current = part
+            elif len(current) + len(DIGEST_SEPARATOR) + len(part) <= limit:
+                current += DIGEST_SEPARATOR + part
+            else:
+                digests.append(current)
+                current = part
+    if current:
+        digests.append(current)
+    return digests
+
+
+def split_message(message: str, limit: int) -> List[str]:
+    """Режем слишком длинное сообщение на куски по лимиту."""
+    return [message[i:i + limit]
+            for i in range(0, len(message), limit)] or ['']
+
+
+class LazyBot:
+    """Бот, который создаётся при первой отправке.
+    Импорт telegram и создание бота не задерживают первый опрос.
+    """
+
+    def __init__(self, factory):
+        """Фабрика без аргументов возвращает настоящего бота."""
+        self.factory = factory
+        self.bot = None
+        self.lock = threading.Lock()
+
+    def get_bot(self):
+        """Создаём бота один раз, даже из нескольких потоков отправки."""
+        if self.bot is None:
+            with self.lock:
+                if self.bot is None:
+                    self.bot = self.factory()
+        return self.bot
+
+    def __getattr__(self, name: str):
+        """send_message, get_updates и прочее берём у настоящего бота."""
+        return getattr(self.get_bot(), name)
+
+
+class Outbox:
+    """Отправляем сообщения в Telegram с учётом лимитов.
+    Общее ведро ограничивает бота целиком, ведро на чат — каждый чат.
+    На RetryAfter ждём столько, сколько попросил Telegram, на сетевые
+    сбои повторяем с растущей паузой, и ни одна ошибка Telegram
+    не роняет цикл опроса.
+    """
+
+    def __init__(self, bot, global_rate: float = GLOBAL_RATE,
+                 chat_rate: float = CHAT_RATE, sleep=time.sleep,
+                 clock=time.monotonic):
+        """Заводим общее ведро, вёдра чатов создаём по мере надобности."""
+        self.bot = bot
+        self.chat_rate = chat_rate
+        self.sleep = sleep
+        self.clock = clock
+        self.global_bucket = TokenBucket(global_rate, global_rate, clock)
+        self.chat_buckets: Dict = {}
+        self.lock = threading.Lock()
+
+    def chat_bucket(self, chat_id) -> TokenBucket:
+        """Ведро токенов конкретного чата."""
+        with self.lock:
+            bucket = self.chat_buckets.get(chat_id)
+            if bucket is None:
+                bucket = TokenBucket(self.chat_rate, 1, self.clock)
+                self.chat_buckets[chat_id] = bucket
+            return bucket
+
+    def throttle(self, chat_id) -> None:
+        """Ждём токены в ведре чата и в общем ведре."""
+        self.sleep(self.chat_bucket(chat_id).reserve())
+        self.sleep(self.global_bucket.reserve())
+
+    def send(self, chat_id, messages: List[str], key=None) -> bool:
+        """Отправляем сообщения одного прохода одним дайджестом.
+        key нужен только журналу DeliveryPool, здесь он не используется.
+        """
+        delivered = True
+        for text in make_digest(messages):
+            delivered = self.deliver(chat_id, text) and delivered
+        return delivered
+
+    def deliver(self, chat_id, text: str) -> bool:
+        """Отправляем одно сообщение с повторами."""
+        for attempt in range(MAX_SEND_ATTEMPTS):
+            self.throttle(chat_id)
+            try:
+                with metrics.TELEGRAM_SEND_SECONDS.time():
+                    self.bot.send_message(chat_id=chat_id, text=text)
+            except telegram.error.RetryAfter as error:
+                logger.warning('Telegram просит подождать %s с',
+                               error.retry_after)
+                self.sleep(error.retry_after)
+            except (telegram.error.BadRequest,
+                    telegram.error.Unauthorized) as error:
+                # BadRequest наследует NetworkError, но повтор не поможет
+                logger.error('Telegram отклонил сообщение: %s', error)
+                metrics.MESSAGES_FAILED.inc()
+                return False
+            except telegram.error.NetworkError as error:
+                logger.warning('Сбой сети при отправке сообщения: %s', error)
+                self.sleep(2 ** attempt)
+            except telegram.error.TelegramError as error:
+                logger.error('Сбой при отправке сообщения: %s', error)
+                metrics.MESSAGES_FAILED.inc()
+                return False
+            else:
+                logger.info('Сообщение успешно отправлено. Сообщение: %s',
+                            text)
+                metrics.MESSAGES_SENT.inc()
+                return True
+        logger.error('Сообщение не отправлено за %s попыток: %s',
+                     MAX_SEND_ATTEMPTS, text)
+        metrics.MESSAGES_FAILED.inc()
+        return False
+
+
+class DeliveryPool:
+    """Доставляем дайджесты в фоновых потоках, не задерживая опрос.
+    Каждый чат закреплён за одним потоком, поэтому сообщения в чат
+    приходят по порядку. Очереди ограничены: если Telegram не успевает,
+    send() блокируется (backpressure), а не копит сообщения без конца.
+    """
+
+    def __init__(self, outbox: Outbox, workers: int = DELIVERY_WORKERS,
+                 maxsize: int = DELIVERY_QUEUE_SIZE, journal=None):
+        """Запускаем рабочие потоки, у каждого своя очередь.
+        С журналом дайджесты с ключом переживают падение процесса.
+        """
+        self.outbox = outbox
+        self.journal = journal
+        self.in_flight = set()
+        self.replays: Dict[str, int] = {}
+        self.queues = [queue.Queue(maxsize) for _ in range(workers)]
+        self.stats = {
+            'queued': 0,
+            'delivered': 0,
+            'failed': 0,
+            'blocked': 0,
+            'blocked_seconds': 0.0,
+            'max_depth': 0,
+        }
+        self.lock = threading.Lock()
+        self.threads = [
+            threading.Thread(target=self.work, args=(worker_queue,),
+                             name=f'delivery-{number}', daemon=True)
+            for number, worker_queue in enumerate(self.queues)
+        ]
+        for thread in self.threads:
+            thread.start()
+        metrics.DELIVERY_QUEUE_DEPTH.function = self.depth
+
+    def queue_for(self, chat_id) -> queue.Queue:
+        """Очередь потока, за которым закреплён чат."""
+        index = zlib.crc32(str(chat_id).encode()) % len(self.queues)
+        return self.queues[index]
+
+    def send(self, chat_id, messages: List[str], key=None) -> bool:
+        """Ставим дайджест в очередь на отправку.
+        С ключом сначала пишем дайджест в журнал; уже виденный ключ
+        повторно не отправляем и возвращаем False.
+        """
+        if key is not None and self.journal is not None:
+            # Ключ в полёте раньше, чем в журнале: иначе replay() успел
+            # бы поставить дайджест в очередь, пока журнал пишется на диск
+            duplicate = not self.take(key)
+            if not duplicate and not self.journal.append(
+                    key, chat_id, messages):
+                self.release(key)
+                duplicate = True
+            if duplicate:
+                logger.info('Дайджест %s уже в журнале, не дублируем', key)
+                return False
+        self.enqueue(chat_id, messages, key)
+        return True
+
+    def replay(self) -> int:
+        """Ставим в очередь недоставленное из журнала."""
+        if self.journal is None:
+            return 0
+        replayed = 0
+        for key, chat_id, messages in self.journal.pending_items():
+            if not self.take(key):
+                continue
+            self.enqueue(chat_id, messages, key)
+            replayed += 1
+        if replayed:
+            logger.info('Переотправляем из журнала %s дайджестов', replayed)
+        return replayed
+
+    def take(self, key) -> bool:
+        """Отмечаем ключ в полёте; False — его уже отправляют."""
+        with self.lock:
+            if key in self.in_flight:
+                return False
+            self.in_flight.add(key)
+            return True
+
+    def release(self, key) -> None:
+        """Ключ больше не в полёте."""
+        with self.lock:
+            self.in_flight.discard(key)
+
+    def enqueue(self, chat_id, messages: List[str], key=None) -> None:
+        """Кладём дайджест в очередь потока, закреплённого за чатом."""
+        worker_queue = self.queue_for(chat_id)
+        item = (chat_id, list(messages), key)
+        try:
+            worker_queue.put_nowait(item)
+        except queue.Full:
+            started = time.monotonic()
+            worker_queue.put(item)
+            self.count('blocked', 1)
+            self.count('blocked_seconds', time.monotonic() - started)
+            logger.warning('Очередь отправки переполнена, опрос ждал %.2f с',
+                           time.monotonic() - started)
+        with self.lock:
+            self.stats['queued'] += 1
+            self.stats['max_depth'] = max(self.stats['max_depth'],
+                                          worker_queue.qsize())
+
+    def count(self, name: str, value) -> None:
+        """Увеличиваем счётчик статистики."""
+        with self.lock:
+            self.stats[name] += value
+
+    def depth(self) -> int:
+        """Сколько дайджестов сейчас ждут отправки."""
+        return sum(worker_queue.qsize() for worker_queue in self.queues)
+
+    def work(self, worker_queue: queue.Queue) -> None:
+        """Рабочий поток: отправляем дайджесты из своей очереди."""
+        while True:
+            item = worker_queue.get()
+            if item is None:
+                worker_queue.task_done()
+                return
+            chat_id, messages, key = item
+            delivered = False
+            try:
+                delivered = self.deliver(chat_id, messages, key)
+            except Exception as error:
+                logger.exception('Сбой потока отправки: %s', error)
+            finally:
+                self.count('delivered' if delivered else 'failed', 1)
+                self.settle(key, delivered)
+                worker_queue.task_done()
+
+    def deliver(self, chat_id, messages: List[str], key=None) -> bool:
+        """Отправляем дайджест; журналируемый — по частям.
+        Каждая доставленная часть отмечается в журнале, а повторная
+        отправка начинается с первой недоставленной. На первой неудачной
+        части останавливаемся, чтобы не слать следующие вперёд неё.
+        """
+        if key is None or self.journal is None:
+            return self.outbox.send(chat_id, messages)
+        if not self.journal.is_pending(key):
+            # Уже доставлен и отмечен: в очереди оказалась вторая копия
+            return True
+        parts = make_digest(messages)
+        for part in range(self.journal.progress(key), len(parts)):
+            if not self.outbox.send(chat_id, [parts[part]]):
+                return False
+            self.journal.part_sent(key, part)
+        return True
+
+    def settle(self, key, delivered: bool) -> None:
+        """Отмечаем в журнале доставку дайджеста.
+        Недоставленный остаётся в журнале до следующего replay(),
+        пока не кончатся MAX_REPLAYS попыток. Ключ остаётся в полёте,
+        пока журнал не отмечен, иначе replay() успел бы отправить
+        доставленный дайджест ещё раз.
+        """
+        if key is None:
+            return
+        with self.lock:
+            attempts = self.replays.pop(key, 0) + 1
+            retry = not delivered and attempts < MAX_REPLAYS
+            if retry:
+                self.replays[key] = attempts
+        if not retry and self.journal is not None:
+            if not delivered:
+                logger.error('Дайджест %s не доставлен за %s попыток, '
+                             'убираем из журнала', key, attempts)
+            self.journal.complete(key)
+        self.release(key)
+
+    def close(self) -> None:
+        """Дожидаемся отправки всей очереди и останавливаем потоки."""
+        for worker_queue in self.queues:
+            worker_queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        logger.info('Очередь отправки остановлена: %s', self.stats)
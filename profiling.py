@@ -0,0 +1,178 @@
+import cProfile
+import logging
+import os
+import signal
+import threading
+import time
+from typing import Dict, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Сколько циклов снимать профилировщиком по сигналу и куда класть дамп
+PROFILE_CYCLES = int(os.getenv('PROFILE_CYCLES', 3))
+PROFILE_PATH = os.getenv('PROFILE_PATH', 'homework.prof')
+
+STAGE_SECONDS = metrics.Histogram(
+    'homework_stage_seconds',
+    'Длительность стадий цикла опроса (когда замеры включены)',
+    labelnames=['stage'])
+
+
+class NullStage:
+    """Пустая стадия: замеры выключены, ничего не делаем."""
+
+    def __enter__(self):
+        """Ничего не засекаем."""
+        return self
+
+    def __exit__(self, *args):
+        """И ничего не пишем."""
+        return False
+
+
+NULL_STAGE = NullStage()
+
+
+class Stage:
+    """Замер одной стадии цикла."""
+
+    def __init__(self, profiler: 'Profiler', name: str):
+        """Запоминаем, куда писать замер."""
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        """Засекаем время."""
+        self.started = self.profiler.clock()
+        return self
+
+    def __exit__(self, *args):
+        """Копим длительность стадии в текущем цикле потока."""
+        elapsed = self.profiler.clock() - self.started
+        stages = self.profiler.stages()
+        stages[self.name] = stages.get(self.name, 0) + elapsed
+        STAGE_SECONDS.observe(elapsed, stage=self.name)
+        return False
+
+
+class Cycle:
+    """Границы цикла: сводка стадий и захват профиля."""
+
+    def __init__(self, profiler: 'Profiler'):
+        """Цикл принадлежит профилировщику."""
+        self.profiler = profiler
+
+    def __enter__(self):
+        """Обнуляем стадии и при запросе включаем cProfile."""
+        self.profiler.local.stages = {}
+        self.profiler.start_capture()
+        return self
+
+    def __exit__(self, *args):
+        """Пишем сводку стадий и считаем снятые циклы."""
+        self.profiler.finish_cycle()
+        return False
+
+
+class Profiler:
+    """Замеры стадий и снятие профиля следующих N циклов на лету.
+    Обе вещи включаются сигналами, без перезапуска процесса.
+    Профиль снимается только в том потоке, где начался цикл:
+    в движке это один из циклов студентов, а не все сразу.
+    """
+
+    def __init__(self, cycles: int = PROFILE_CYCLES,
+                 path: str = PROFILE_PATH, clock=time.perf_counter):
+        """По умолчанию всё выключено и почти ничего не стоит."""
+        self.timing = False
+        self.cycles = cycles
+        self.path = path
+        self.clock = clock
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.requested = 0
+        self.profile: Optional[cProfile.Profile] = None
+        self.owner = None
+        self.left = 0
+        self.captured = 0
+
+    def stage(self, name: str):
+        """Контекстный менеджер вокруг стадии цикла."""
+        if not self.timing:
+            return NULL_STAGE
+        return Stage(self, name)
+
+    def cycle(self):
+        """Контекстный менеджер вокруг всего цикла."""
+        return Cycle(self)
+
+    def stages(self) -> Dict[str, float]:
+        """Стадии текущего цикла в этом потоке."""
+        stages = getattr(self.local, 'stages', None)
+        if stages is None:
+            stages = self.local.stages = {}
+        return stages
+
+    def toggle_timing(self) -> bool:
+        """Включаем или выключаем замеры стадий."""
+        self.timing = not self.timing
+        return self.timing
+
+    def request_capture(self, cycles: Optional[int] = None) -> None:
+        """Просим снять профиль следующих циклов."""
+        self.requested = cycles or self.cycles
+
+    def start_capture(self) -> None:
+        """Включаем cProfile, если его просили и он ещё не идёт."""
+        if not self.requested:
+            return
+        with self.lock:
+            if self.profile is not None or not self.requested:
+                return
+            self.left, self.requested = self.requested, 0
+            self.captured = self.left
+            self.owner = threading.get_ident()
+            self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def finish_cycle(self) -> None:
+        """Закрываем цикл: сводка стадий и, если пора, дамп профиля."""
+        stages = self.stages()
+        if self.timing and stages:
+            logger.info('Стадии цикла: %s', ', '.join(
+                f'{name}={seconds * 1000:.1f}ms'
+                for name, seconds in stages.items()))
+        if self.owner != threading.get_ident():
+            return
+        self.left -= 1
+        if self.left > 0:
+            return
+        profile = self.profile
+        profile.disable()
+        profile.dump_stats(self.path)
+        with self.lock:
+            self.profile = None
+            self.owner = None
+        logger.info('Профиль %s циклов записан в %s',
+                    self.captured, self.path)
+
+    def handle_timing_signal(self, signum, frame):
+        """SIGUSR1: переключаем замеры стадий."""
+        self.toggle_timing()
+
+    def handle_capture_signal(self, signum, frame):
+        """SIGUSR2: снимаем профиль следующих циклов."""
+        self.request_capture()
+
+    def install_signal_handlers(self) -> None:
+        """Вешаем обработчики, если платформа знает про SIGUSR1/2."""
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, self.handle_timing_signal)
+            signal.signal(signal.SIGUSR2, self.handle_capture_signal)
+
+
+PROFILER = Profiler()
+stage = PROFILER.stage
+cycle = PROFILER.cycle
@@ -0,0 +1,47 @@
+import random
+import time
+
+# Потолок интервала опроса, пока API Практикума лежит
+MAX_RETRY_TIME = 6 * 60 * 60
+
+
+class PollScheduler:
+    """Планировщик опросов по сетке монотонных часов.
+    Пока API отвечает, тики идут строго через interval секунд и не
+    уплывают на время запроса и отправки сообщений. Пока API лежит,
+    интервал растёт экспоненциально со случайным разбросом и
+    возвращается к interval после восстановления.
+    """
+
+    def __init__(self, interval: float, max_interval: float = MAX_RETRY_TIME,
+                 clock=time.monotonic, rng=random.random):
+        """Ставим первый тик на текущий момент."""
+        self.interval = interval
+        self.max_interval = max_interval
+        self.clock = clock
+        self.rng = rng
+        self.next_tick = clock()
+
+    def backoff(self, failures: int) -> float:
+        """Задержка после failures неудач подряд: от b/2 до b, b = i*2^n."""
+        ceiling = min(self.max_interval,
+                      self.interval * 2 ** min(failures, 32))
+        return ceiling / 2 + self.rng() * ceiling / 2
+
+    def next_delay(self, failures: int = 0) -> float:
+        """Считаем, сколько ждать до следующего опроса."""
+        now = self.clock()
+        if failures:
+            self.next_tick = now + self.backoff(failures)
+        else:
+            self.next_tick += self.interval
+            if self.next_tick <= now:
+                # Цикл затянулся дольше периода: пропущенные тики не
+                # догоняем, а встаём на ближайший тик сетки
+                missed = (now - self.next_tick) // self.interval + 1
+                self.next_tick += missed * self.interval
+        return self.next_tick - now
+
+    def wait(self, failures: int = 0) -> None:
+        """Спим до следующего опроса."""
+        time.sleep(self.next_delay(failures))
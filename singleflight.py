@@ -0,0 +1,58 @@
+import threading
+from typing import Callable, Dict, Hashable, Tuple
+
+import metrics
+
+COALESCED = metrics.Counter(
+    'homework_api_coalesced_total',
+    'Запросы к API, которые дождались чужого такого же запроса')
+
+
+class Call:
+    """Запрос в полёте: его ждут все, кто пришёл с тем же ключом."""
+
+    def __init__(self):
+        """Результата пока нет."""
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Склеиваем одновременные одинаковые вызовы в один.
+    Первый пришедший с ключом выполняет функцию, остальные ждут и
+    получают его результат или его исключение. Результат не кэшируется:
+    следующий вызов после завершения снова идёт в функцию.
+    """
+
+    def __init__(self):
+        """Вызовов в полёте нет."""
+        self.lock = threading.Lock()
+        self.calls: Dict[Hashable, Call] = {}
+
+    def do(self, key: Hashable, function: Callable,
+           *args, **kwargs) -> Tuple[object, bool]:
+        """Вызываем function или ждём такой же вызов в полёте.
+        Возвращаем результат и флаг, что он получен от чужого вызова.
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = Call()
+        if not leader:
+            COALESCED.inc()
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = function(*args, **kwargs)
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result, False
@@ -0,0 +1,73 @@
+import importlib
+import logging
+import time
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """Разбивка времени старта по этапам и отложенным импортам."""
+
+    def __init__(self, clock=time.perf_counter):
+        """Отсчёт идёт с импорта этого модуля."""
+        self.clock = clock
+        self.started = self.last = clock()
+        self.phases: List[Tuple[str, float]] = []
+        self.imports: Dict[str, float] = {}
+        self.reported = False
+
+    def mark(self, phase: str) -> None:
+        """Закрываем этап: время с конца предыдущего."""
+        now = self.clock()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def report(self) -> None:
+        """Один раз пишем в лог, куда ушло время до первого опроса."""
+        if self.reported:
+            return
+        self.reported = True
+        logger.info(
+            'Старт за %.1f мс: %s; отложенные импорты: %s',
+            (self.last - self.started) * 1000,
+            ', '.join(f'{phase}={seconds * 1000:.1f}'
+                      for phase, seconds in self.phases),
+            ', '.join(f'{name}={seconds * 1000:.1f}'
+                      for name, seconds in self.imports.items()) or '-')
+
+
+STARTUP = StartupTimer()
+
+
+class LazyModule:
+    """Модуль, который импортируется при первом обращении к атрибуту.
+    Тяжёлые библиотеки (telegram, requests) не нужны, пока не дошло
+    до запроса или отправки, и на старте их можно не грузить.
+    """
+
+    def __init__(self, name: str):
+        """Запоминаем только имя модуля."""
+        self.name = name
+        self.module = None
+
+    def load(self):
+        """Импортируем модуль, время пишем в разбивку старта."""
+        if self.module is None:
+            started = time.perf_counter()
+            # import_module потокобезопасен, повторный вызов берёт модуль
+            # из sys.modules
+            module = importlib.import_module(self.name)
+            if self.name not in STARTUP.imports:
+                STARTUP.imports[self.name] = time.perf_counter() - started
+            self.module = module
+        return self.module
+
+    def __getattr__(self, attr: str):
+        """Атрибуты берём у настоящего модуля."""
+        return getattr(self.load(), attr)
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Откладываем импорт модуля до первого использования."""
+    return LazyModule(name)
@@ -0,0 +1,63 @@
+import json
+import logging
+import os
+import tempfile
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 2
+
+
+def save_storage(path: str, homework_storage: Dict) -> None:
+    """Атомарно сохраняем снимок хранилища ДЗ на диск.
+    Пишем во временный файл рядом и подменяем им старый снимок,
+    так что при падении на диске остаётся либо старая, либо новая версия.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    snapshot = {'version': SNAPSHOT_VERSION, 'storage': homework_storage}
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as tmp_file:
+            json.dump(snapshot, tmp_file, ensure_ascii=False,
+                      separators=(',', ':'))
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    fsync_directory(directory)
+
+
+def fsync_directory(directory: str) -> None:
+    """Фиксируем переименование файла в каталоге (где это поддерживается)."""
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
+
+def load_storage(path: str) -> Optional[Dict]:
+    """Загружаем снимок хранилища ДЗ, None если снимка нет или он битый."""
+    try:
+        with open(path, encoding='utf-8') as snapshot_file:
+            snapshot = json.load(snapshot_file)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as error:
+        logger.error('Не удалось прочитать снимок %s: %s', path, error)
+        return None
+    if (not isinstance(snapshot, dict)
+            or snapshot.get('version') != SNAPSHOT_VERSION
+            or not isinstance(snapshot.get('storage'), dict)):
+        logger.error('Неподходящий формат снимка %s', path)
+        return None
+    return snapshot['storage']
@@ -0,0 +1,131 @@
+import codecs
+import hashlib
+import json
+from typing import Dict, Iterable, Iterator
+
+WHITESPACE = ' \t\n\r'
+# Ключ, который меняется в каждом ответе и не входит в отпечаток
+VOLATILE_KEYS = {'current_date'}
+
+
+class HomeworksStream:
+    """Потоково разбираем ответ API вида {"homeworks": [...], ...}.
+    Записи из массива homeworks отдаём по одной, поэтому в памяти
+    держим только текущую запись и недочитанный кусок ответа.
+    Остальные ключи верхнего уровня собираем в document, а отпечаток
+    ответа без current_date считаем по ходу чтения.
+    """
+
+    def __init__(self, chunks: Iterable[bytes]):
+        """Готовимся читать ответ кусками."""
+        self.chunks = iter(chunks)
+        self.utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.decoder = json.JSONDecoder()
+        self.hasher = hashlib.blake2b(digest_size=16)
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.document = None
+        self.bytes_read = 0
+
+    @property
+    def fingerprint(self) -> str:
+        """Отпечаток ответа без current_date."""
+        return self.hasher.hexdigest()
+
+    def fill(self) -> bool:
+        """Дочитываем следующий кусок, False если ответ закончился."""
+        if self.eof:
+            return False
+        self.buffer = self.buffer[self.pos:]
+        self.pos = 0
+        for chunk in self.chunks:
+            if chunk:
+                self.bytes_read += len(chunk)
+                self.buffer += self.utf8.decode(chunk)
+                return True
+        self.buffer += self.utf8.decode(b'', final=True)
+        self.eof = True
+        return False
+
+    def peek(self) -> str:
+        """Следующий значимый символ, пустая строка в конце ответа."""
+        while True:
+            while self.pos < len(self.buffer):
+                if self.buffer[self.pos] not in WHITESPACE:
+                    return self.buffer[self.pos]
+                self.pos += 1
+            if not self.fill():
+                return ''
+
+    def expect(self, chars: str) -> str:
+        """Забираем один из ожидаемых символов."""
+        char = self.peek()
+        if not char or char not in chars:
+            raise json.JSONDecodeError(
+                f'Ожидался один из символов {chars!r}', self.buffer, self.pos)
+        self.pos += 1
+        return char
+
+    def value(self, hashed: bool = True):
+        """Разбираем одно JSON-значение целиком."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            # Число в самом конце буфера могло оборваться на полуслове
+            if end == len(self.buffer) and self.fill():
+                continue
+            break
+        if hashed:
+            self.hasher.update(self.buffer[self.pos:end].encode())
+        self.pos = end
+        return value
+
+    def __iter__(self) -> Iterator[Dict]:
+        """Отдаём записи homeworks по одной."""
+        if self.peek() != '{':
+            self.document = self.value()
+            self.expect_end()
+            return
+        self.expect('{')
+        self.document = {}
+        if self.peek() == '}':
+            self.pos += 1
+        else:
+            yield from self.members()
+        self.expect_end()
+
+    def members(self) -> Iterator[Dict]:
+        """Разбираем ключи объекта верхнего уровня."""
+        while True:
+            key = self.value()
+            self.expect(':')
+            if key == 'homeworks' and self.peek() == '[':
+                self.document[key] = []
+                yield from self.homeworks()
+            else:
+                self.document[key] = self.value(key not in VOLATILE_KEYS)
+            if self.expect(',}') == '}':
+                return
+
+    def homeworks(self) -> Iterator[Dict]:
+        """Разбираем массив homeworks, не держа его в памяти целиком."""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(',]') == ']':
+                return
+
+    def expect_end(self) -> None:
+        """Проверяем, что после документа ничего нет."""
+        if self.peek():
+            raise json.JSONDecodeError(
+                'Лишние данные после ответа', self.buffer, self.pos)
@@ -0,0 +1,238 @@
+"""Локальная замена API Практикум.Домашки.
+
+Сервер отвечает как ENDPOINT: проверяет заголовок OAuth, фильтрует
+домашки по from_date, отдаёт current_date и ETag. Через него можно
+подмешать задержку, ответы 5xx, зависание дольше таймаута, битое тело
+и огромную историю, чтобы гонять get_api_answer целиком без сети.
+
+    python -m tests.fake_api --port 8080 --token sometoken --history 100000
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+API_PATH = '/api/user_api/homework_statuses/'
+STATUSES = ('reviewing', 'approved', 'rejected')
+CHUNK_SIZE = 64 * 1024
+
+
+class FakePracticumAPI:
+    """Сервер-заглушка API Практикума в отдельном потоке."""
+
+    def __init__(self, host='localhost', port=0):
+        """Поднимаем сервер на свободном порту."""
+        self.homeworks = {}
+        self.faults = []
+        self.latency = 0.0
+        self.hang_time = 5.0
+        self.chunked = False
+        self.requests = []
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), make_handler(self))
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       args=(0.05,), daemon=True)
+
+    @property
+    def url(self):
+        """Адрес, который подставляется вместо ENDPOINT."""
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}{API_PATH}'
+
+    def start(self):
+        """Запускаем обработку запросов."""
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Останавливаем сервер."""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        """Сервер как контекстный менеджер."""
+        return self.start()
+
+    def __exit__(self, *args):
+        """Останавливаем сервер на выходе из контекста."""
+        self.stop()
+
+    def add_homework(self, token, homework_id, status='reviewing',
+                     updated=None, **fields):
+        """Добавляем или обновляем домашку студента."""
+        updated = int(time.time() if updated is None else updated)
+        record = {
+            'id': homework_id,
+            'status': status,
+            'homework_name': f'student__hw{homework_id}.zip',
+            'reviewer_comment': '',
+            'date_updated': datetime.fromtimestamp(
+                updated, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'lesson_name': f'Спринт {homework_id}',
+            **fields,
+        }
+        with self.lock:
+            self.homeworks.setdefault(token, {})[homework_id] = (
+                updated, record)
+        return record
+
+    def add_history(self, token, size, start=1_500_000_000):
+        """Заводим студенту огромную историю из size домашек."""
+        for number in range(size):
+            self.add_homework(token, number, STATUSES[number % 3],
+                              updated=start + number)
+
+    def inject(self, *faults):
+        """Ставим сбои на следующие запросы по одному на запрос.
+        Виды: числовой HTTP-статус, 'timeout', 'malformed', 'empty'.
+        """
+        with self.lock:
+            self.faults.extend(faults)
+
+    def next_fault(self):
+        """Забираем сбой для текущего запроса."""
+        with self.lock:
+            return self.faults.pop(0) if self.faults else None
+
+    def select(self, token, from_date):
+        """Домашки студента, обновлённые начиная с from_date."""
+        with self.lock:
+            records = list(self.homeworks.get(token, {}).values())
+        records.sort(key=lambda item: item[0], reverse=True)
+        return [record for updated, record in records if updated >= from_date]
+
+
+class FakeAPIHandler(BaseHTTPRequestHandler):
+    """Обработчик запросов к заглушке, сервер лежит в атрибуте api."""
+
+    api = None
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        """Отвечаем как API Практикума."""
+        self.api.requests.append((self.path, dict(self.headers)))
+        if self.api.latency:
+            time.sleep(self.api.latency)
+        url = urlparse(self.path)
+        if url.path != API_PATH:
+            return self.reply_json(HTTPStatus.NOT_FOUND,
+                                   {'code': 'not_found'})
+        fault = self.api.next_fault()
+        if fault is not None and self.apply_fault(fault):
+            return None
+        token = self.token()
+        if token is None:
+            return self.reply_json(HTTPStatus.UNAUTHORIZED, {
+                'code': 'not_authenticated',
+                'message': 'Учетные данные не были предоставлены.',
+            })
+        try:
+            from_date = int(parse_qs(url.query)['from_date'][0])
+        except (KeyError, ValueError):
+            return self.reply_json(HTTPStatus.BAD_REQUEST, {
+                'code': 'UnknownError',
+                'error': {'error': 'Wrong from_date format'},
+            })
+        return self.reply_homeworks(self.api.select(token, from_date))
+
+    def token(self):
+        """Токен из заголовка OAuth, None если он неизвестен."""
+        authorization = self.headers.get('Authorization', '')
+        if not authorization.startswith('OAuth '):
+            return None
+        token = authorization[len('OAuth '):]
+        return token if token in self.api.homeworks else None
+
+    def apply_fault(self, fault):
+        """Отвечаем сбоем, True если ответ уже отправлен."""
+        if fault == 'timeout':
+            time.sleep(self.api.hang_time)
+            return False
+        if fault == 'malformed':
+            self.reply(HTTPStatus.OK, b'<html>502 Bad Gateway</html>')
+            return True
+        if fault == 'empty':
+            self.reply(HTTPStatus.OK, b'{}')
+            return True
+        self.reply_json(fault, {'code': 'server_error'})
+        return True
+
+    def reply_homeworks(self, homeworks):
+        """Отдаём список домашек с current_date и ETag."""
+        homeworks_body = json.dumps(
+            homeworks, ensure_ascii=False).encode()
+        etag = '"{}"'.format(
+            hashlib.blake2b(homeworks_body, digest_size=8).hexdigest())
+        if self.headers.get('If-None-Match') == etag:
+            return self.reply(HTTPStatus.NOT_MODIFIED, b'',
+                              {'ETag': etag})
+        body = (b'{"homeworks":' + homeworks_body
+                + b',"current_date":'
+                + str(int(time.time())).encode() + b'}')
+        return self.reply(HTTPStatus.OK, body, {'ETag': etag})
+
+    def reply_json(self, status, data):
+        """Отвечаем JSON-объектом."""
+        self.reply(status, json.dumps(data, ensure_ascii=False).encode())
+
+    def reply(self, status, body, headers=None):
+        """Отправляем ответ целиком или кусками."""
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if status == HTTPStatus.NOT_MODIFIED:
+            self.end_headers()
+            return
+        if not self.api.chunked:
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for start in range(0, len(body), CHUNK_SIZE):
+            chunk = body[start:start + CHUNK_SIZE]
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+        self.wfile.write(b'0\r\n\r\n')
+
+    def log_message(self, format, *args):
+        """Не засоряем вывод логами запросов."""
+
+
+def make_handler(api):
+    """Обработчик запросов, привязанный к серверу api."""
+    return type('Handler', (FakeAPIHandler,), {'api': api})
+
+
+def main():
+    """Запускаем заглушку API как отдельный процесс."""
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--token', default='sometoken')
+    parser.add_argument('--history', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--chunked', action='store_true')
+    args = parser.parse_args()
+
+    api = FakePracticumAPI(port=args.port)
+    api.add_history(args.token, args.history)
+    api.latency = args.latency
+    api.chunked = args.chunked
+    print(f'ENDPOINT={api.url}')
+    try:
+        api.server.serve_forever()
+    except KeyboardInterrupt:
+        api.server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,21 @@
+from benchmarks import pipeline
+
+
+class TestPipelineBenchmark:
+
+    def test_regression_is_detected(self):
+        baseline = {'parse/1000': {'p50_ms': 1.0}}
+        assert pipeline.compare(
+            {'parse/1000': {'p50_ms': 1.2}}, baseline, 0.3, 0.05) == []
+        regressions = pipeline.compare(
+            {'parse/1000': {'p50_ms': 2.0}}, baseline, 0.3, 0.05)
+        assert len(regressions) == 1, (
+            'Замедление больше допуска должно считаться регрессией'
+        )
+
+    def test_fixture_mixes_statuses_and_errors(self):
+        fixture = pipeline.Fixture(1000, error_rate=0.2)
+        errors = [hw_state.error for hw_state
+                  in fixture.new_state['homeworks_state'] if hw_state.error]
+        assert 100 < len(errors) < 300
+        assert fixture.storage['homeworks_state']
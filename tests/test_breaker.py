@@ -0,0 +1,112 @@
+import homework
+from breaker import (CLOSED, DOWN, HALF_OPEN, OPEN, RECOVERED,
+                     CircuitBreaker, new_breaker_state)
+from tests.utils import FakeClock, MockRawResponse, RecordingOutbox
+
+BODY = (b'{"homeworks": [{"id": 1, "homework_name": "hw1", '
+        b'"status": "approved"}], "current_date": 100}')
+
+
+class FlakyAPI:
+
+    def __init__(self):
+        self.down = False
+        self.calls = 0
+
+    def __call__(self, *args):
+        self.calls += 1
+        if self.down:
+            raise homework.YandexRequestException('timeout')
+        return MockRawResponse(BODY)
+
+
+def rewind(storage):
+    state = storage['breaker']
+    state['opened_at'] -= state['open_time']
+
+
+class TestCircuitBreaker:
+
+    def test_states(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(new_breaker_state(100), failure_threshold=2,
+                                 open_time=100, max_open_time=300,
+                                 clock=clock)
+        assert breaker.record_failure() is None
+        assert breaker.record_failure() == DOWN
+        assert breaker.state == OPEN
+        assert not breaker.allow_request(), (
+            'Разомкнутая цепь не пускает запросы'
+        )
+        clock.now += 100
+        assert breaker.allow_request()
+        assert breaker.state == HALF_OPEN
+        assert breaker.record_failure() is None, (
+            'О неудачной пробе второй раз не сообщаем'
+        )
+        assert breaker.data['open_time'] == 200
+        clock.now += 200
+        assert breaker.allow_request()
+        breaker.record_failure()
+        assert breaker.data['open_time'] == 300, (
+            'Время размыкания растёт не выше потолка'
+        )
+        clock.now += 300
+        assert breaker.allow_request()
+        assert breaker.record_success() == RECOVERED
+        assert breaker.state == CLOSED
+        assert breaker.data['open_time'] == 100
+
+    def test_one_down_and_one_recovered(self, monkeypatch):
+        api = FlakyAPI()
+        monkeypatch.setattr(homework, 'request_api', api)
+        outbox = RecordingOutbox()
+        storage = homework.bot_process(homework.new_storage(), outbox,
+                                       chat_id=1)
+        outbox.sent.clear()
+
+        api.down = True
+        calls = api.calls
+        for _ in range(6):
+            storage = homework.bot_process(storage, outbox, chat_id=1)
+        assert outbox.messages() == [homework.API_DOWN_MESSAGE.format(
+            homework.EXCEPTION_TO_STR[homework.YandexRequestException])], (
+            'О падении API сообщаем ровно один раз'
+        )
+        assert api.calls - calls == homework.get_breaker(
+            storage).failure_threshold, (
+            'Пока цепь разомкнута, в API не ходим'
+        )
+
+        rewind(storage)
+        homework.bot_process(storage, outbox, chat_id=1)
+        assert len(outbox.messages()) == 1, 'Неудачная проба молчит'
+
+        api.down = False
+        rewind(storage)
+        calls = api.calls
+        homework.bot_process(storage, outbox, chat_id=1)
+        homework.bot_process(storage, outbox, chat_id=1)
+        assert outbox.messages()[1:] == [homework.API_RECOVERED_MESSAGE], (
+            'О восстановлении API сообщаем ровно один раз'
+        )
+        assert api.calls - calls == 3, (
+            'После пробы в том же цикле идёт обычный опрос'
+        )
+        assert storage['global_error'] == 0
+
+    def test_other_errors_are_reported_once(self):
+        storage = homework.new_storage()
+        error = {
+            'global_error': homework.EXCEPTION_TO_STR[
+                homework.EmptyResponseException],
+            'homeworks_state': [],
+        }
+        _, first = homework.control_state(error, storage)
+        _, second = homework.control_state(error, storage)
+        assert len(first) == 1 and second == [], (
+            'Повторяющаяся ошибка не должна присылаться каждый опрос'
+        )
+        assert storage['global_error'] == error['global_error'], (
+            'global_error хранится строкой, а не списком'
+        )
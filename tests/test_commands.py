@@ -0,0 +1,133 @@
+from types import SimpleNamespace
+
+import homework
+from commands import CommandListener
+from engine import Tenant, make_storage_lookup
+from tests.utils import FakeClock, MockRawResponse, RecordingOutbox
+
+CHAT_ID = 42
+
+
+class FakeBot:
+
+    def __init__(self, updates):
+        self.updates = updates
+        self.offsets = []
+
+    def get_updates(self, offset=None, **kwargs):
+        self.offsets.append(offset)
+        updates, self.updates = self.updates, []
+        return updates
+
+
+def make_storage(*hw_states):
+    storage = homework.new_storage()
+    for hw_state in hw_states:
+        storage['homeworks_state'][hw_state.key] = hw_state
+    return storage
+
+
+def make_listener(storage, clock=None, bot=None):
+    outbox = RecordingOutbox()
+    listener = CommandListener(
+        bot, outbox,
+        lambda chat_id: storage if chat_id == CHAT_ID else None,
+        homework.COMMAND_HANDLERS, ttl=30, clock=clock or FakeClock())
+    return listener, outbox
+
+
+def fail_request(*args, **kwargs):
+    raise AssertionError('Команды не должны ходить в API Практикума')
+
+
+class TestCommands:
+
+    def test_status_from_storage(self, monkeypatch):
+        monkeypatch.setattr(homework, 'request_api', fail_request)
+        storage = make_storage(
+            homework.HomeworkState(1, 'hw1', 'approved'),
+            homework.HomeworkState(2, 'hw2', 'reviewing'))
+        listener, outbox = make_listener(storage)
+        reply = listener.handle(CHAT_ID, '/status')
+        assert reply == (
+            'Статусы домашек:\n'
+            f'hw1: {homework.VERDICT_STATUSES["approved"]}\n'
+            f'hw2: {homework.VERDICT_STATUSES["reviewing"]}'
+        )
+        assert outbox.sent == [(CHAT_ID, [reply])], (
+            'Ответ должен уходить через очередь отправки'
+        )
+
+    def test_reply_is_cached(self):
+        clock = FakeClock()
+        storage = make_storage(homework.HomeworkState(1, 'hw1', 'approved'))
+        listener, _ = make_listener(storage, clock)
+        first = listener.handle(CHAT_ID, '/status')
+        storage['homeworks_state'][1] = homework.HomeworkState(
+            1, 'hw1', 'rejected')
+        clock.now += 10
+        assert listener.handle(CHAT_ID, '/status') == first, (
+            'В пределах TTL отвечаем из кэша'
+        )
+        clock.now += 30
+        assert 'замечания' in listener.handle(CHAT_ID, '/status'), (
+            'После TTL ответ собирается заново'
+        )
+
+    def test_rate_limit_and_unknown_chat(self):
+        listener, outbox = make_listener(make_storage())
+        replies = [listener.handle(CHAT_ID, '/history') for _ in range(5)]
+        assert replies.count(None) == 2, (
+            'Сверх лимита команды чата отбрасываются'
+        )
+        assert listener.handle(7, '/status') is None, (
+            'Чужим чатам не отвечаем'
+        )
+        assert len(outbox.sent) == 3
+
+    def test_poll_dispatches_commands(self):
+        def update(update_id, text, chat_id=CHAT_ID):
+            message = SimpleNamespace(chat_id=chat_id, text=text)
+            return SimpleNamespace(update_id=update_id, message=message)
+
+        bot = FakeBot([update(5, 'привет'), update(6, '/start@hw_bot')])
+        listener, outbox = make_listener(make_storage(), bot=bot)
+        listener.poll()
+        listener.poll()
+        assert outbox.sent == [(CHAT_ID, ['Команды: /status, /history'])], (
+            'На обычный текст не отвечаем, на неизвестную команду — справкой'
+        )
+        assert bot.offsets == [None, 7], (
+            'Обработанные обновления нужно подтверждать offset'
+        )
+
+    def test_history_is_recorded_and_capped(self):
+        storage = homework.new_storage()
+        messages = [f'сообщение {number}' for number in range(25)]
+        homework.record_history(storage, messages)
+        assert [message for _, message in storage['history']] == (
+            messages[-homework.HISTORY_SIZE:]
+        ), '/history помнит только последние уведомления'
+        reply = homework.render_history(storage)
+        assert reply.endswith('сообщение 24')
+
+    def test_engine_lookup(self):
+        tenant = Tenant('token', CHAT_ID)
+        get_storage = make_storage_lookup([tenant])
+        assert get_storage(7) is None
+        assert get_storage(str(CHAT_ID))['homeworks_state'] == {}, (
+            'До первого опроса отвечаем по пустому хранилищу'
+        )
+        tenant.storage = make_storage()
+        assert get_storage(CHAT_ID) is tenant.storage
+
+    def test_bot_process_records_history(self, monkeypatch):
+        body = (b'{"homeworks": [{"id": 1, "homework_name": "hw1", '
+                b'"status": "approved"}], "current_date": 100}')
+        monkeypatch.setattr(homework, 'request_api',
+                            lambda *args: MockRawResponse(body))
+        storage = homework.bot_process(homework.new_storage(),
+                                       RecordingOutbox(), chat_id=CHAT_ID)
+        assert [message for _, message in storage['history']] == [
+            'На проверке новая домашка: hw1'
+        ]
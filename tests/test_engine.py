@@ -0,0 +1,82 @@
+import asyncio
+import threading
+import time
+
+import engine
+import homework
+
+
+class TestPollingEngine:
+
+    def test_tenants_polled_concurrently(self, monkeypatch):
+        lock = threading.Lock()
+        in_flight = {'now': 0, 'max': 0}
+        seen_headers = []
+
+        def mock_process_yandex_api(current_timestamp=0, headers=None,
+                                    previous=None):
+            with lock:
+                in_flight['now'] += 1
+                in_flight['max'] = max(in_flight['max'], in_flight['now'])
+                seen_headers.append(headers)
+            time.sleep(0.05)
+            with lock:
+                in_flight['now'] -= 1
+            return {'global_error': 0, 'homeworks_state': [],
+                    'current_date': 1, 'full_resync': True}
+
+        monkeypatch.setattr(homework, 'process_yandex_api',
+                            mock_process_yandex_api)
+
+        tenants = [engine.Tenant(f'token{i}', i) for i in range(12)]
+        polling_engine = engine.PollingEngine(
+            tenants, outbox=None, max_in_flight=4, storage_dir=None)
+
+        async def poll_all():
+            polling_engine.semaphore = asyncio.Semaphore(4)
+            await asyncio.gather(
+                *(polling_engine.poll_once(tenant) for tenant in tenants))
+
+        started = time.monotonic()
+        asyncio.run(poll_all())
+        elapsed = time.monotonic() - started
+
+        assert in_flight['max'] == 4, (
+            'Число запросов в полёте должно ограничиваться `max_in_flight`'
+        )
+        assert elapsed < 12 * 0.05, (
+            'Студенты должны опрашиваться параллельно'
+        )
+        assert len({h['Authorization'] for h in seen_headers}) == 12, (
+            'Каждый студент опрашивается со своим токеном'
+        )
+        for tenant in tenants:
+            assert tenant.storage['current_date'] == 1, (
+                'У каждого студента должно быть своё хранилище'
+            )
+
+    def test_journal_is_replayed_periodically(self):
+        class ReplayingOutbox:
+
+            def __init__(self):
+                self.replays = 0
+
+            def replay(self):
+                self.replays += 1
+
+        outbox = ReplayingOutbox()
+        polling_engine = engine.PollingEngine(
+            [], outbox=outbox, retry_time=0.01, storage_dir=None)
+
+        async def replay_for_a_while():
+            try:
+                await asyncio.wait_for(polling_engine.replay_journal(), 0.1)
+            except asyncio.TimeoutError:
+                pass
+
+        asyncio.run(replay_for_a_while())
+        polling_engine.executor.shutdown()
+        assert outbox.replays >= 2, (
+            'Недоставленное из журнала нужно переотправлять каждый тик, '
+            'а не только при старте'
+        )
@@ -0,0 +1,81 @@
+import pytest
+
+import homework
+from tests.fake_api import FakePracticumAPI
+
+TOKEN = 'sometoken'
+
+
+@pytest.fixture
+def fake_api(monkeypatch):
+    with FakePracticumAPI() as api:
+        api.add_homework(TOKEN, 1, 'approved', updated=1000)
+        api.add_homework(TOKEN, 2, 'reviewing', updated=2000)
+        monkeypatch.setattr(homework, 'ENDPOINT', api.url)
+        monkeypatch.setattr(homework, 'HEADERS', homework.make_headers(TOKEN))
+        session = homework.create_http_session()
+        monkeypatch.setattr(homework, 'http_session', session)
+        yield api
+        session.close()
+
+
+class TestFakePracticumAPI:
+
+    def test_from_date_is_honored(self, fake_api):
+        response = homework.get_api_answer(0)
+        assert [hw['id'] for hw in response['homeworks']] == [2, 1]
+        assert isinstance(response['current_date'], int)
+        response = homework.get_api_answer(1500)
+        assert [hw['id'] for hw in response['homeworks']] == [2], (
+            'Заглушка должна фильтровать домашки по `from_date`'
+        )
+
+    def test_wrong_token(self, fake_api):
+        state = homework.process_yandex_api(
+            0, homework.make_headers('wrong'))
+        assert state['global_error'] == homework.EXCEPTION_TO_STR[
+            homework.StatusCodeException]
+
+    @pytest.mark.parametrize('fault, exception', [
+        (500, homework.StatusCodeException),
+        (503, homework.StatusCodeException),
+        ('malformed', homework.WrongTypeResponseException),
+        ('empty', homework.EmptyResponseException),
+    ])
+    def test_faults(self, fake_api, fault, exception):
+        fake_api.inject(fault)
+        state = homework.process_yandex_api(0)
+        assert state['global_error'] == homework.EXCEPTION_TO_STR[exception]
+        assert homework.process_yandex_api(0)['global_error'] == 0, (
+            'Сбой действует только на один запрос'
+        )
+
+    def test_timeout(self, fake_api, monkeypatch):
+        monkeypatch.setattr(homework, 'READ_TIMEOUT', 0.2)
+        fake_api.hang_time = 1
+        fake_api.inject('timeout')
+        state = homework.process_yandex_api(0)
+        assert state['global_error'] == homework.EXCEPTION_TO_STR[
+            homework.YandexRequestException], (
+            'Зависший сервер должен обрываться по таймауту чтения'
+        )
+
+    def test_etag(self, fake_api):
+        storage = homework.new_storage()
+        storage = homework.bot_startup(storage)
+        # Полная ресинхронизация идёт без etag, сверяем инкрементальные
+        for _ in range(2):
+            state = homework.process_yandex_api(
+                homework.get_from_date(storage), previous=storage)
+            storage, _ = homework.control_state(state, storage)
+        assert state['unchanged']
+        assert fake_api.requests[-1][1].get('If-None-Match') == (
+            storage['etag']
+        )
+
+    def test_huge_chunked_history(self, fake_api, monkeypatch):
+        fake_api.add_history(TOKEN, 20000)
+        fake_api.chunked = True
+        state = homework.process_yandex_api(0)
+        assert state['global_error'] == 0
+        assert len(state['homeworks_state']) == 20000
@@ -0,0 +1,89 @@
+import asyncio
+import os
+from collections import Counter
+
+import engine
+import homework
+from fleet import HashRing, Membership, Shard
+from tests.utils import FakeClock
+
+KEYS = [f'tenant{number}' for number in range(10000)]
+
+
+class TestHashRing:
+
+    def test_keys_spread_evenly(self):
+        ring = HashRing(['a', 'b', 'c', 'd'])
+        shares = Counter(ring.node_for(key) for key in KEYS)
+        assert set(shares) == {'a', 'b', 'c', 'd'}
+        assert all(1500 < share < 3500 for share in shares.values()), (
+            'Студенты должны делиться между воркерами примерно поровну'
+        )
+
+    def test_join_moves_only_new_share(self):
+        before = HashRing(['a', 'b', 'c', 'd'])
+        after = HashRing(['a', 'b', 'c', 'd', 'e'])
+        moved = [key for key in KEYS
+                 if before.node_for(key) != after.node_for(key)]
+        assert all(after.node_for(key) == 'e' for key in moved), (
+            'При добавлении воркера студенты переезжают только к нему'
+        )
+        assert len(moved) < len(KEYS) * 0.3, (
+            'Переезжать должна примерно 1/N часть студентов'
+        )
+
+
+class TestMembership:
+
+    def test_stale_members_leave_the_ring(self, tmp_path):
+        clock = FakeClock()
+        directory = str(tmp_path)
+        first = Shard(Membership(directory, 'node-0', ttl=15, clock=clock))
+        second = Membership(directory, 'node-1', ttl=15, clock=clock)
+        second.heartbeat()
+        assert first.refresh()
+        assert first.members == ['node-0', 'node-1']
+        assert not first.refresh(), 'Состав не менялся'
+
+        clock.now += 20
+        assert first.refresh(), 'Воркер без пульса выпадает из флота'
+        assert first.members == ['node-0']
+        assert all(first.owns(key) for key in KEYS[:100])
+
+        second.heartbeat()
+        second.leave()
+        assert not os.path.exists(second.path)
+
+
+class TestShardedEngine:
+
+    def test_engine_polls_only_own_tenants(self, monkeypatch, tmp_path):
+        polled = []
+
+        def mock_process_yandex_api(current_timestamp=0, headers=None,
+                                    previous=None):
+            polled.append(headers['Authorization'])
+            return {'global_error': 0, 'homeworks_state': [],
+                    'current_date': 1, 'full_resync': True}
+
+        monkeypatch.setattr(homework, 'process_yandex_api',
+                            mock_process_yandex_api)
+        shard = Shard(Membership(str(tmp_path), 'node-0'))
+        shard.ring = HashRing(['node-0', 'node-1'])
+        tenants = [engine.Tenant(f'token{i}', i) for i in range(20)]
+        polling_engine = engine.PollingEngine(
+            tenants, outbox=None, storage_dir=None, shard=shard)
+        polling_engine.semaphore = asyncio.Semaphore(4)
+
+        async def poll_owned():
+            await asyncio.gather(*(
+                polling_engine.poll_once(tenant) for tenant in tenants
+                if polling_engine.owns(tenant)))
+
+        asyncio.run(poll_owned())
+        owned = [tenant for tenant in tenants if shard.owns(tenant.key)]
+        assert 0 < len(owned) < len(tenants)
+        assert sorted(polled) == sorted(
+            tenant.headers['Authorization'] for tenant in owned), (
+            'Воркер опрашивает только студентов своей доли'
+        )
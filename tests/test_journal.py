@@ -0,0 +1,215 @@
+import threading
+import time
+
+import homework
+import journal as journal_module
+from journal import Journal
+from outbox import DeliveryPool
+from tests.utils import MockRawResponse
+
+BODY = (b'{"homeworks": [{"id": 1, "homework_name": "hw1", '
+        b'"status": "approved"}], "current_date": 100}')
+
+
+class ScriptedOutbox:
+
+    def __init__(self, results=()):
+        self.results = list(results)
+        self.sent = []
+
+    def send(self, chat_id, messages):
+        self.sent.append((chat_id, messages))
+        return self.results.pop(0) if self.results else True
+
+
+class CrashingPool:
+
+    def __init__(self, journal):
+        self.journal = journal
+
+    def send(self, chat_id, messages, key=None):
+        self.journal.append(key, chat_id, messages)
+
+
+class TestJournal:
+
+    def test_pending_survives_restart(self, tmp_path):
+        path = str(tmp_path / 'outbox.journal')
+        journal = Journal(path)
+        assert journal.append('a', 1, ['первое'])
+        assert journal.append('b', 1, ['второе'])
+        journal.complete('a')
+        journal.close()
+
+        journal = Journal(path)
+        assert journal.pending_items() == [('b', 1, ['второе'])], (
+            'Недоставленное должно пережить рестарт'
+        )
+        assert not journal.append('a', 1, ['первое']), (
+            'Доставленный ключ повторно ставить нельзя'
+        )
+        assert not journal.append('b', 1, ['второе'])
+        journal.close()
+
+    def test_torn_tail_is_ignored(self, tmp_path):
+        path = str(tmp_path / 'outbox.journal')
+        journal = Journal(path)
+        journal.append('a', 1, ['текст'])
+        journal.close()
+        with open(path, 'a', encoding='utf-8') as journal_file:
+            journal_file.write('{"op": "done", "ke')
+        journal = Journal(path)
+        assert [key for key, _, _ in journal.pending_items()] == ['a']
+        journal.close()
+
+    def test_compaction(self, tmp_path):
+        path = str(tmp_path / 'outbox.journal')
+        journal = Journal(path, keep_done=5, compact_records=20)
+        for number in range(30):
+            journal.append(str(number), 1, ['текст'])
+            journal.complete(str(number))
+        journal.close()
+        with open(path, encoding='utf-8') as journal_file:
+            assert len(journal_file.readlines()) <= 20, (
+                'Журнал не должен расти без конца'
+            )
+        journal = Journal(path, keep_done=5)
+        assert not journal.append('29', 1, ['текст'])
+        journal.close()
+
+    def test_group_commit(self, tmp_path, monkeypatch):
+        fsyncs = []
+
+        def slow_fsync(fd):
+            fsyncs.append(fd)
+            time.sleep(0.01)
+
+        journal = Journal(str(tmp_path / 'outbox.journal'))
+        monkeypatch.setattr(journal_module.os, 'fsync', slow_fsync)
+        threads = [
+            threading.Thread(target=journal.append,
+                             args=(str(number), number, ['текст']))
+            for number in range(20)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(journal.pending_items()) == 20
+        assert len(fsyncs) < 20, (
+            'Параллельные записи должны делить один fsync'
+        )
+        monkeypatch.undo()
+        journal.close()
+
+
+class TestJournaledDelivery:
+
+    def test_failed_digest_is_replayed(self, tmp_path):
+        journal = Journal(str(tmp_path / 'outbox.journal'))
+        outbox = ScriptedOutbox([False])
+        pool = DeliveryPool(outbox, workers=1, journal=journal)
+        assert pool.send(1, ['текст'], key='k')
+        assert not pool.send(1, ['текст'], key='k'), (
+            'Тот же ключ второй раз в очередь не попадает'
+        )
+        pool.close()
+        assert journal.pending_items() == [('k', 1, ['текст'])], (
+            'Недоставленный дайджест остаётся в журнале'
+        )
+        pool = DeliveryPool(outbox, workers=1, journal=journal)
+        assert pool.replay() == 1
+        pool.close()
+        assert outbox.sent == [(1, ['текст'])] * 2
+        assert journal.pending_items() == []
+        journal.close()
+
+    def test_crash_before_storage_commit(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(homework, 'request_api',
+                            lambda *args: MockRawResponse(BODY))
+        path = str(tmp_path / 'outbox.journal')
+        storage_path = str(tmp_path / 'storage.json')
+        homework.persist_storage(homework.new_storage(), storage_path)
+
+        # Дайджест попал в журнал, а до отправки и сохранения
+        # хранилища процесс не дожил
+        journal = Journal(path)
+        homework.bot_process(homework.restore_storage(storage_path),
+                             CrashingPool(journal), chat_id=1)
+        journal.close()
+
+        journal = Journal(path)
+        outbox = ScriptedOutbox()
+        pool = DeliveryPool(outbox, workers=1, journal=journal)
+        pool.replay()
+        homework.bot_process(homework.restore_storage(storage_path), pool,
+                             chat_id=1)
+        pool.close()
+        journal.close()
+        assert outbox.sent == [(1, ['На проверке новая домашка: hw1'])], (
+            'После падения уведомление доставляется ровно один раз'
+        )
+
+    def test_long_digest_resumes_from_failed_part(self, tmp_path):
+        path = str(tmp_path / 'outbox.journal')
+        first, second = 'а' * 4000, 'б' * 4000
+        journal = Journal(path)
+        outbox = ScriptedOutbox([True, False])
+        pool = DeliveryPool(outbox, workers=1, journal=journal)
+        pool.send(1, [first, second], key='k')
+        pool.close()
+        journal.close()
+
+        # Прогресс по частям переживает и рестарт
+        journal = Journal(path)
+        assert journal.progress('k') == 1
+        pool = DeliveryPool(outbox, workers=1, journal=journal)
+        pool.replay()
+        pool.close()
+        assert outbox.sent == [(1, [first]), (1, [second]), (1, [second])], (
+            'Доставленную часть дайджеста повторно не шлём'
+        )
+        assert journal.pending_items() == []
+        journal.close()
+
+    def test_replay_during_settle(self, tmp_path):
+        journal = Journal(str(tmp_path / 'outbox.journal'))
+        pool = DeliveryPool(ScriptedOutbox(), workers=1, journal=journal)
+        replayed = []
+        complete = journal.complete
+
+        def complete_with_replay(key):
+            # replay() с потока опроса попадает ровно между доставкой
+            # и отметкой в журнале
+            replayed.append(pool.replay())
+            complete(key)
+
+        journal.complete = complete_with_replay
+        pool.send(1, ['текст'], key='k')
+        pool.close()
+        assert replayed == [0], (
+            'Доставленный, но ещё не отмеченный дайджест не переотправляем'
+        )
+        journal.close()
+
+    def test_replay_during_send(self, tmp_path, monkeypatch):
+        journal = Journal(str(tmp_path / 'outbox.journal'))
+        outbox = ScriptedOutbox()
+        pool = DeliveryPool(outbox, workers=1, journal=journal)
+        fsync = journal_module.os.fsync
+
+        def slow_fsync(descriptor):
+            # Дайджест уже в журнале, но send() ещё не вернулся:
+            # replay() с другого потока видит его недоставленным
+            replay = threading.Thread(target=pool.replay)
+            replay.start()
+            replay.join()
+            fsync(descriptor)
+
+        monkeypatch.setattr(journal_module.os, 'fsync', slow_fsync)
+        pool.send(1, ['hello'], key='k')
+        pool.close()
+        assert outbox.sent == [(1, ['hello'])], (
+            'Дайджест, который ещё пишется в журнал, не переотправляем'
+        )
+        journal.close()
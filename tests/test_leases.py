@@ -0,0 +1,175 @@
+import asyncio
+import threading
+
+import engine
+import homework
+from journal import Journal
+from leases import Lease, LeaseStore
+from tests.utils import FakeClock, MockRawResponse, RecordingOutbox
+
+BODY = (b'{"homeworks": [{"id": 1, "homework_name": "hw1", '
+        b'"status": "approved"}], "current_date": 100}')
+
+
+def make_stores(tmp_path, clock, ttl=10):
+    path = str(tmp_path / 'leases.db')
+    return (LeaseStore(path, 'first', ttl, clock),
+            LeaseStore(path, 'second', ttl, clock))
+
+
+class TestLeaseStore:
+
+    def test_only_one_holder(self, tmp_path):
+        clock = FakeClock()
+        first, second = make_stores(tmp_path, clock)
+        assert first.acquire('chat')
+        assert not second.acquire('chat'), (
+            'Чужую живую аренду взять нельзя'
+        )
+        clock.now += 5
+        assert first.acquire('chat'), 'Свою аренду можно продлить'
+        clock.now += 9
+        assert not second.acquire('chat')
+        clock.now += 2
+        assert second.acquire('chat'), (
+            'Непродлённая аренда переходит к резерву'
+        )
+        assert first.owner('chat') == 'second'
+
+    def test_release_hands_over_at_once(self, tmp_path):
+        clock = FakeClock()
+        first, second = make_stores(tmp_path, clock)
+        first.acquire('chat')
+        second.release('chat')
+        assert not second.acquire('chat'), 'Чужую аренду отдать нельзя'
+        first.release('chat')
+        assert second.acquire('chat')
+
+    def test_concurrent_acquire(self, tmp_path):
+        path = str(tmp_path / 'leases.db')
+        stores = [LeaseStore(path, f'replica{number}') for number in range(8)]
+        results = []
+        threads = [
+            threading.Thread(target=lambda store=store: results.append(
+                store.acquire('chat')))
+            for store in stores
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results.count(True) == 1, (
+            'Из одновременных претендентов аренду получает ровно один'
+        )
+
+
+class TestLease:
+
+    def test_failover(self, tmp_path):
+        clock = FakeClock()
+        first_store, second_store = make_stores(tmp_path, clock)
+        leader = Lease(first_store, 'chat')
+        standby = Lease(second_store, 'chat')
+        leader.wait()
+        assert leader.held() and not leader.lost.is_set()
+        assert not standby.renew()
+
+        # Лидер завис и не продлевал аренду
+        clock.now += 11
+        assert standby.renew()
+        leader.renew()
+        assert leader.lost.is_set(), 'Лидер должен заметить потерю аренды'
+        assert not leader.held()
+
+        standby.stop()
+        assert leader.renew(), 'Остановленная реплика отдаёт аренду'
+
+    def test_lead_stops_when_lease_is_lost(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(homework, 'STORAGE_PATH',
+                            str(tmp_path / 'storage.json'))
+        monkeypatch.setattr(homework, 'request_api',
+                            lambda *args: MockRawResponse(BODY))
+        homework.persist_storage(homework.new_storage())
+        lease = Lease(make_stores(tmp_path, FakeClock())[0], 'chat')
+        lease.wait()
+        lease.lost.set()
+        outbox = RecordingOutbox()
+        homework.lead(outbox, lease=lease)
+        assert outbox.replays == 1
+        assert len(outbox.sent) == 1, (
+            'Потеряв аренду, лидер больше не опрашивает API'
+        )
+
+
+class TestJournalSlots:
+
+    def test_replicas_get_own_journals(self, tmp_path):
+        path = str(tmp_path / 'outbox.journal')
+        first = Journal.claim(path)
+        second = Journal.claim(path)
+        assert first.path == path
+        assert second.path == str(tmp_path / 'outbox-1.journal'), (
+            'Второй реплике нужен свой журнал'
+        )
+        first.close()
+        third = Journal.claim(path)
+        assert third.path == path, 'Освободившийся журнал подхватывают'
+        second.close()
+        third.close()
+
+
+class TestSharedJournal:
+
+    def test_new_leader_waits_for_old_journal(self, tmp_path):
+        path = str(tmp_path / 'outbox.journal')
+        old_leader = Journal.exclusive(path)
+        old_leader.append('k', 1, ['текст'])
+        opened = []
+        thread = threading.Thread(
+            target=lambda: opened.append(Journal.exclusive(path)))
+        thread.start()
+        thread.join(0.1)
+        assert thread.is_alive(), (
+            'Новый лидер не открывает журнал, пока его держит прежний'
+        )
+        old_leader.complete('k')
+        old_leader.close()
+        thread.join()
+        new_leader = opened[0]
+        assert not new_leader.append('k', 1, ['текст']), (
+            'Ключи доставленных дайджестов переходят к новому лидеру'
+        )
+        new_leader.close()
+
+
+class TestEngineLeases:
+
+    def test_tenant_polled_by_one_replica(self, tmp_path, monkeypatch):
+        polled = []
+
+        def mock_process_tenant(self, tenant):
+            polled.append(self)
+            tenant.storage = homework.new_storage()
+
+        monkeypatch.setattr(engine.PollingEngine, 'process_tenant',
+                            mock_process_tenant)
+        first_store, second_store = make_stores(tmp_path, FakeClock())
+        engines = [
+            engine.PollingEngine([], outbox=None, storage_dir=None,
+                                 leases=store)
+            for store in (first_store, second_store)
+        ]
+        tenant = engine.Tenant('token', 1)
+
+        async def poll(polling_engine):
+            polling_engine.semaphore = asyncio.Semaphore(1)
+            if await polling_engine.take_lease(tenant):
+                await polling_engine.poll_once(tenant)
+            else:
+                await polling_engine.drop(tenant)
+
+        for polling_engine in engines:
+            asyncio.run(poll(polling_engine))
+        assert polled == [engines[0]], (
+            'Студента опрашивает только держатель аренды'
+        )
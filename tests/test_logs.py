@@ -0,0 +1,72 @@
+import io
+import json
+import logging
+
+import pytest
+
+import logs
+
+
+class Lazy:
+
+    def __init__(self):
+        self.calls = 0
+
+    def __str__(self):
+        self.calls += 1
+        return 'lazy'
+
+
+@pytest.fixture
+def root_logger():
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield root
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+class TestLogging:
+
+    def test_single_handler_no_duplicates(self, root_logger):
+        stream = io.StringIO()
+        logs.setup_logging(stream=io.StringIO()).stop()
+        listener = logs.setup_logging(stream=stream)
+        logging.getLogger('homework').info('Статус %s', 'approved')
+        listener.stop()
+        assert len(root_logger.handlers) == 1, (
+            'Повторная настройка не должна добавлять обработчики'
+        )
+        lines = stream.getvalue().splitlines()
+        assert len(lines) == 1, 'Каждая запись должна писаться один раз'
+        assert lines[0].endswith('homework - INFO - Статус approved')
+
+    def test_filtered_records_are_not_formatted(self, root_logger):
+        stream = io.StringIO()
+        listener = logs.setup_logging(level='INFO', stream=stream)
+        lazy = Lazy()
+        logging.getLogger('homework').debug('Отладка %s', lazy)
+        listener.stop()
+        assert lazy.calls == 0, (
+            'Отфильтрованное сообщение не нужно собирать'
+        )
+        assert stream.getvalue() == ''
+
+    def test_json_output(self, root_logger):
+        stream = io.StringIO()
+        listener = logs.setup_logging(log_format='json', stream=stream)
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            logging.getLogger('engine').exception('Сбой %s', 1)
+        listener.stop()
+        entry = json.loads(stream.getvalue())
+        assert entry['message'] == 'Сбой 1'
+        assert entry['level'] == 'ERROR'
+        assert entry['logger'] == 'engine'
+        assert 'ValueError: boom' in entry['exc_info'], (
+            'Трейсбек должен попасть в JSON'
+        )
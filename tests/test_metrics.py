@@ -0,0 +1,92 @@
+import socket
+import urllib.request
+
+import pytest
+
+import homework
+import metrics
+
+
+@pytest.fixture
+def registry():
+    created = []
+    yield created
+    for metric in created:
+        metrics.REGISTRY.remove(metric)
+
+
+class TestMetrics:
+
+    def test_counter_with_labels(self, registry):
+        counter = metrics.Counter('test_errors_total', 'Ошибки', ['category'])
+        registry.append(counter)
+        counter.inc(category='a')
+        counter.inc(2, category='b')
+        counter.inc(category='a')
+        lines = list(counter.render())
+        assert '# TYPE test_errors_total counter' in lines
+        assert 'test_errors_total{category="a"} 2' in lines, (
+            'Счётчик должен копиться по каждому значению метки'
+        )
+        assert 'test_errors_total{category="b"} 2' in lines
+
+    def test_histogram_buckets_are_cumulative(self, registry):
+        histogram = metrics.Histogram('test_seconds', 'Время', (1, 5))
+        registry.append(histogram)
+        for value in (0.5, 1, 3, 10):
+            histogram.observe(value)
+        lines = list(histogram.render())
+        assert 'test_seconds_bucket{le="1"} 2' in lines, (
+            'Граница корзины включается в неё, как в Prometheus'
+        )
+        assert 'test_seconds_bucket{le="5"} 3' in lines
+        assert 'test_seconds_bucket{le="+Inf"} 4' in lines
+        assert 'test_seconds_sum 14.5' in lines
+        assert 'test_seconds_count 4' in lines
+
+    def test_timer_records_on_error(self, registry):
+        histogram = metrics.Histogram('test_timer_seconds', 'Время')
+        registry.append(histogram)
+        with pytest.raises(ValueError):
+            with histogram.time():
+                raise ValueError
+        counts, _ = histogram.values[()]
+        assert sum(counts) == 1, (
+            'Упавший блок тоже должен попасть в гистограмму'
+        )
+
+    def test_function_gauge(self, registry):
+        gauge = metrics.Gauge('test_depth', 'Глубина', function=lambda: 7)
+        registry.append(gauge)
+        assert 'test_depth 7' in list(gauge.render())
+
+    def test_server_serves_metrics(self):
+        server = metrics.start_metrics_server(0)
+        assert server is None, 'Порт 0 выключает метрики'
+        with socket.socket() as free:
+            free.bind(('127.0.0.1', 0))
+            port = free.getsockname()[1]
+        server = metrics.start_metrics_server(port)
+        try:
+            url = f'http://127.0.0.1:{port}/metrics'
+            with urllib.request.urlopen(url, timeout=5) as response:
+                body = response.read().decode()
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert '# TYPE homework_api_request_seconds histogram' in body, (
+            'На /metrics должны отдаваться метрики бота'
+        )
+
+    def test_bot_counts_request_errors(self, monkeypatch):
+        def failing_request(*args, **kwargs):
+            raise homework.YandexRequestException('boom')
+
+        errors = metrics.ERRORS
+        category = ('YandexRequestException',)
+        before = errors.values.get(category, 0)
+        monkeypatch.setattr(homework, 'request_api', failing_request)
+        homework.process_yandex_api()
+        assert errors.values[category] == before + 1, (
+            'Ошибка запроса должна попасть в homework_errors_total'
+        )
@@ -0,0 +1,100 @@
+import time
+
+import telegram
+
+from outbox import DeliveryPool, Outbox, TokenBucket, make_digest
+
+
+class FlakyBot:
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.sent = []
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.sent.append((chat_id, text))
+
+
+class TestOutbox:
+
+    def test_digest_coalesces_messages(self):
+        bot = FlakyBot()
+        outbox = Outbox(bot, sleep=lambda seconds: None)
+        assert outbox.send(1, ['первое', 'второе', 'третье'])
+        assert bot.sent == [(1, 'первое\n\nвторое\n\nтретье')], (
+            'Сообщения одного прохода должны уходить одним дайджестом'
+        )
+
+    def test_digest_respects_limit(self):
+        digests = make_digest(['a' * 3000, 'b' * 3000, 'c' * 9000])
+        assert all(len(digest) <= 4096 for digest in digests)
+        assert ''.join(digests).replace('\n', '') == (
+            'a' * 3000 + 'b' * 3000 + 'c' * 9000
+        )
+
+    def test_retry_after_is_honored(self):
+        slept = []
+        bot = FlakyBot([telegram.error.RetryAfter(7),
+                        telegram.error.TimedOut()])
+        outbox = Outbox(bot, sleep=slept.append)
+        assert outbox.send(1, ['текст'])
+        assert 7 in slept, 'Нужно ждать столько, сколько просит RetryAfter'
+        assert bot.sent == [(1, 'текст')]
+
+    def test_telegram_error_does_not_escape(self):
+        bot = FlakyBot([telegram.error.BadRequest('Chat not found')])
+        outbox = Outbox(bot, sleep=lambda seconds: None)
+        assert not outbox.send(1, ['текст']), (
+            'Ошибка Telegram не должна ронять цикл опроса'
+        )
+
+    def test_token_bucket(self):
+        now = [0.0]
+        bucket = TokenBucket(rate=2, capacity=2, clock=lambda: now[0])
+        assert [bucket.reserve() for _ in range(3)] == [0, 0, 0.5]
+        now[0] += 1.5
+        assert bucket.reserve() == 0
+
+
+class SlowOutbox:
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.sent = []
+
+    def send(self, chat_id, messages):
+        time.sleep(self.delay)
+        self.sent.append((chat_id, messages))
+        return True
+
+
+class TestDeliveryPool:
+
+    def test_send_does_not_wait_for_telegram(self):
+        slow_outbox = SlowOutbox(0.2)
+        pool = DeliveryPool(slow_outbox, workers=2)
+        started = time.monotonic()
+        pool.send(1, ['текст'])
+        assert time.monotonic() - started < 0.1, (
+            'Медленный Telegram не должен задерживать опрос'
+        )
+        pool.close()
+        assert slow_outbox.sent == [(1, ['текст'])], (
+            'При остановке очередь нужно дорассылать'
+        )
+
+    def test_order_and_backpressure(self):
+        slow_outbox = SlowOutbox(0.01)
+        pool = DeliveryPool(slow_outbox, workers=3, maxsize=2)
+        for number in range(10):
+            pool.send(42, [str(number)])
+        pool.close()
+        assert [messages[0] for _, messages in slow_outbox.sent] == [
+            str(number) for number in range(10)
+        ], 'Сообщения в один чат должны приходить по порядку'
+        assert pool.stats['delivered'] == 10
+        assert pool.stats['blocked'] > 0, (
+            'Переполнение очереди нужно учитывать в статистике'
+        )
@@ -0,0 +1,201 @@
+import json
+from types import SimpleNamespace
+
+import requests
+
+import homework
+from tests.utils import MockRawResponse
+
+
+class TestIncrementalPolling:
+
+    def test_from_date_without_cursor(self):
+        storage = homework.new_storage()
+        assert homework.get_from_date(storage) == 0, (
+            'Без курсора `current_date` нужно запрашивать всю историю'
+        )
+
+    def test_from_date_with_overlap(self, random_timestamp):
+        storage = homework.new_storage()
+        storage['current_date'] = random_timestamp
+        assert homework.get_from_date(storage) == (
+            random_timestamp - homework.OVERLAP_TIME
+        ), 'Курсор нужно отправлять с запасом окна `OVERLAP_TIME`'
+
+        storage['polls_since_resync'] = homework.FULL_RESYNC_POLLS
+        assert homework.get_from_date(storage) == 0, (
+            'Раз в `FULL_RESYNC_POLLS` опросов нужна полная ресинхронизация'
+        )
+
+    def test_control_state_moves_cursor(self, random_timestamp):
+        storage = homework.new_storage()
+        new_state = {
+            'global_error': 0,
+            'homeworks_state': [],
+            'current_date': random_timestamp,
+            'full_resync': False,
+        }
+        storage, _ = homework.control_state(new_state, storage)
+        assert storage['current_date'] == random_timestamp
+        assert storage['polls_since_resync'] == 1
+
+        storage, _ = homework.control_state(
+            {'global_error': 'API недоступен', 'homeworks_state': []},
+            storage
+        )
+        assert storage['current_date'] == random_timestamp, (
+            'При ошибке API курсор сдвигать нельзя'
+        )
+
+
+class MockSession:
+
+    def __init__(self):
+        self.calls = []
+
+    def get(self, url, **kwargs):
+        self.calls.append(kwargs)
+
+        class Response:
+            status_code = 200
+
+            def json(self):
+                return {'homeworks': [], 'current_date': 0}
+
+        return Response()
+
+
+class TestHttpSession:
+
+    def test_session_and_timeouts(self, monkeypatch):
+        session = MockSession()
+        monkeypatch.setattr(homework, 'http_session', session)
+        homework.get_api_answer(0)
+        assert len(session.calls) == 1, (
+            'Если бот создал сессию, запрос должен идти через неё'
+        )
+        assert session.calls[0]['timeout'] == (
+            homework.CONNECT_TIMEOUT, homework.READ_TIMEOUT
+        ), 'Запрос к API должен уходить с таймаутами соединения и чтения'
+
+    def test_create_http_session(self):
+        session = homework.create_http_session(pool_size=3)
+        adapter = session.get_adapter(homework.ENDPOINT)
+        assert adapter._pool_maxsize == 3
+        session.close()
+
+
+class TestUnchangedResponse:
+
+    def test_fingerprint_ignores_current_date(self):
+        first, first_date = homework.fingerprint_response(
+            b'{"homeworks": [], "current_date": 100}')
+        second, second_date = homework.fingerprint_response(
+            b'{"homeworks": [], "current_date": 200}')
+        assert first == second, (
+            'Отпечаток не должен зависеть от `current_date`'
+        )
+        assert (first_date, second_date) == (100, 200)
+
+    def test_identical_body_skips_parsing(self, monkeypatch):
+        responses = [
+            MockRawResponse(b'{"homeworks": [], "current_date": 100}'),
+            MockRawResponse(b'{"homeworks": [], "current_date": 700}'),
+        ]
+        monkeypatch.setattr(homework, 'request_api',
+                            lambda *args: responses.pop(0))
+
+        storage = homework.new_storage()
+        first = homework.process_yandex_api(0, previous=storage)
+        storage, _ = homework.control_state(first, storage)
+        unchanged_response = responses[0]
+        second = homework.process_yandex_api(100, previous=storage)
+        assert second.get('unchanged'), (
+            'Совпавший ответ должен идти по быстрому пути'
+        )
+        assert unchanged_response.json_calls == 0, (
+            'Совпавший ответ не нужно разбирать'
+        )
+        storage, messages = homework.control_state(second, storage)
+        assert messages == []
+        assert storage['current_date'] == 700, (
+            'Курсор должен сдвигаться и на быстром пути'
+        )
+
+    def test_not_modified_keeps_cursor(self, monkeypatch):
+        monkeypatch.setattr(
+            homework, 'request_api',
+            lambda *args: MockRawResponse(b'', status_code=304))
+        storage = homework.new_storage()
+        storage.update(current_date=100, etag='"v1"', fingerprint='abc')
+        state = homework.process_yandex_api(40, previous=storage)
+        storage, messages = homework.control_state(state, storage)
+        assert state['unchanged'] and messages == []
+        assert storage['current_date'] == 100
+        assert storage['etag'] == '"v1"'
+
+
+class StalledResponse(MockRawResponse):
+
+    def __init__(self):
+        super().__init__(b'')
+        self.closed = False
+
+    @property
+    def content(self):
+        raise requests.exceptions.ConnectionError('Read timed out.')
+
+    @content.setter
+    def content(self, value):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class TestBodyReadErrors:
+
+    def test_stalled_body_is_api_error(self, monkeypatch):
+        response = StalledResponse()
+        monkeypatch.setattr(homework, 'request_api', lambda *args: response)
+        state = homework.process_yandex_api(0, previous={})
+        assert state['global_error'] == homework.EXCEPTION_TO_STR[
+            homework.YandexRequestException], (
+            'Таймаут чтения тела должен стать ошибкой API'
+        )
+        assert response.closed, 'Недочитанный ответ нужно закрыть'
+
+    def test_bad_status_releases_connection(self, monkeypatch):
+        response = StalledResponse()
+        response.status_code = 500
+        client = SimpleNamespace(get=lambda *args, **kwargs: response)
+        monkeypatch.setattr(homework, 'get_http_client', lambda: client)
+        state = homework.process_yandex_api(0, previous={})
+        assert state['global_error'] == homework.EXCEPTION_TO_STR[
+            homework.StatusCodeException]
+        assert response.closed, (
+            'Ответ с неверным статусом нужно закрыть и вернуть соединение'
+        )
+
+
+class TestFullResync:
+
+    def test_resync_finds_removed_homework(self, monkeypatch):
+        body = b'{"homeworks": [], "current_date": 1700000000}'
+        monkeypatch.setattr(homework, 'request_api',
+                            lambda *args: MockRawResponse(body, etag='"v1"'))
+        storage = homework.new_storage()
+        storage['homeworks_state'][1] = homework.HomeworkState(
+            1, 'hw1', 'reviewing')
+        # Прошлый инкрементальный ответ был таким же пустым
+        storage['fingerprint'], _ = homework.fingerprint_response(body)
+        storage.update(etag='"v1"', current_date=1700000000,
+                       polls_since_resync=homework.FULL_RESYNC_POLLS)
+        from_date = homework.get_from_date(storage)
+        assert from_date == 0
+        state = homework.process_yandex_api(from_date, previous=storage)
+        storage, messages = homework.control_state(state, storage)
+        assert messages == ['Домашка hw1 пропала из ответа API.'], (
+            'Полная ресинхронизация не должна идти по быстрому пути'
+        )
+        assert storage['homeworks_state'] == {}
@@ -0,0 +1,50 @@
+import os
+import pstats
+
+import homework
+import profiling
+from tests.utils import MockRawResponse, RecordingOutbox
+
+BODY = (b'{"homeworks": [{"id": 1, "homework_name": "hw", '
+        b'"status": "approved"}], "current_date": 100}')
+
+
+def run_cycle(monkeypatch, storage):
+    monkeypatch.setattr(homework, 'request_api',
+                        lambda *args: MockRawResponse(BODY))
+    return homework.bot_process(storage, RecordingOutbox(), chat_id=1)
+
+
+class TestProfiling:
+
+    def test_stages_are_free_when_disabled(self, monkeypatch):
+        monkeypatch.setattr(profiling.PROFILER, 'timing', False)
+        assert profiling.stage('fetch') is profiling.NULL_STAGE, (
+            'Выключенные замеры не должны ничего создавать'
+        )
+
+    def test_stage_timings(self, monkeypatch):
+        monkeypatch.setattr(profiling.PROFILER, 'timing', True)
+        run_cycle(monkeypatch, homework.new_storage())
+        stages = profiling.PROFILER.stages()
+        assert set(stages) == {'fetch', 'decode', 'validate', 'diff',
+                               'send'}, (
+            'Каждая стадия цикла должна попасть в сводку'
+        )
+
+    def test_capture_next_cycles(self, monkeypatch, tmp_path):
+        path = str(tmp_path / 'bot.prof')
+        monkeypatch.setattr(profiling.PROFILER, 'path', path)
+        profiling.PROFILER.request_capture(2)
+        storage = run_cycle(monkeypatch, homework.new_storage())
+        assert not os.path.exists(path), (
+            'Профиль пишется только после N циклов'
+        )
+        run_cycle(monkeypatch, storage)
+        assert os.path.exists(path), 'Профиль должен записаться в файл'
+        stats = pstats.Stats(path)
+        assert any(name == 'control_state'
+                   for _, _, name in stats.stats), (
+            'В профиле должны быть функции цикла'
+        )
+        assert profiling.PROFILER.profile is None
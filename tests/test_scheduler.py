@@ -0,0 +1,51 @@
+import homework
+from scheduler import PollScheduler
+from tests.utils import FakeClock
+
+
+class TestPollScheduler:
+
+    def test_grid_does_not_drift(self):
+        clock = FakeClock()
+        scheduler = PollScheduler(600, clock=clock, rng=lambda: 0.5)
+        clock.now += 37
+        assert scheduler.next_delay() == 600 - 37, (
+            'Время цикла нужно вычитать из паузы до следующего опроса'
+        )
+        clock.now += 600 - 37 + 1300
+        assert scheduler.next_delay() == 500, (
+            'После долгого цикла встаём на ближайший тик сетки'
+        )
+
+    def test_backoff_and_recovery(self):
+        clock = FakeClock()
+        scheduler = PollScheduler(600, max_interval=3000, clock=clock,
+                                  rng=lambda: 1.0)
+        delays = [scheduler.next_delay(failures) for failures in (1, 2, 3)]
+        assert delays == [1200, 2400, 3000], (
+            'Пока API лежит, интервал должен расти до `max_interval`'
+        )
+        clock.now += 3000
+        assert scheduler.next_delay(0) == 600, (
+            'После восстановления возвращаемся к базовому интервалу'
+        )
+
+    def test_jitter_bounds(self):
+        scheduler = PollScheduler(600, rng=lambda: 0.0)
+        assert scheduler.backoff(1) == 600, (
+            'Разброс не должен опускать паузу ниже базового интервала'
+        )
+
+    def test_api_failures_counter(self):
+        storage = homework.new_storage()
+        down = {
+            'global_error': homework.EXCEPTION_TO_STR[
+                homework.YandexRequestException],
+            'homeworks_state': [],
+        }
+        storage, _ = homework.control_state(down, storage)
+        storage, _ = homework.control_state(down, storage)
+        assert storage['api_failures'] == 2
+        storage, _ = homework.control_state(
+            {'global_error': 0, 'homeworks_state': []}, storage)
+        assert storage['api_failures'] == 0
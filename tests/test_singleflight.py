@@ -0,0 +1,118 @@
+import threading
+import time
+
+import pytest
+
+import homework
+from singleflight import COALESCED, SingleFlight
+from tests.utils import MockRawResponse
+
+BODY = (b'{"homeworks": [{"id": 1, "homework_name": "hw1", '
+        b'"status": "approved"}], "current_date": 100}')
+CALLERS = 8
+
+
+def coalesced():
+    return COALESCED.values.get((), 0)
+
+
+def call_concurrently(target, gate):
+    # Все вызовы, кроме первого, должны встать в ожидание до gate
+    before = coalesced()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(target()))
+               for _ in range(CALLERS)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while coalesced() - before < CALLERS - 1:
+        assert time.monotonic() < deadline, 'Вызовы не склеились'
+        time.sleep(0.001)
+    gate.set()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class TestSingleFlight:
+
+    def test_concurrent_calls_share_one(self):
+        flights = SingleFlight()
+        gate = threading.Event()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            gate.wait()
+            return 'ответ'
+
+        results = call_concurrently(lambda: flights.do('key', slow), gate)
+        assert len(calls) == 1, (
+            'Одинаковые вызовы в полёте должны склеиваться'
+        )
+        assert sorted(shared for _, shared in results) == (
+            [False] + [True] * (CALLERS - 1)
+        )
+        assert {result for result, _ in results} == {'ответ'}
+        assert flights.do('key', lambda: 'новый') == ('новый', False), (
+            'Завершённый вызов не кэшируется'
+        )
+
+    def test_error_is_shared(self):
+        flights = SingleFlight()
+        gate = threading.Event()
+        errors = []
+
+        def broken():
+            gate.wait()
+            raise ValueError('сбой')
+
+        def call():
+            try:
+                flights.do('key', broken)
+            except ValueError as error:
+                errors.append(error)
+
+        call_concurrently(call, gate)
+        assert len(errors) == CALLERS, (
+            'Исключение первого вызова получают все ждущие'
+        )
+        assert flights.calls == {}
+
+
+class TestApiCoalescing:
+
+    def test_same_query_hits_api_once(self, monkeypatch):
+        gate = threading.Event()
+        requests_made = []
+
+        def mock_request_api(current_timestamp, headers, etag=None):
+            requests_made.append(current_timestamp)
+            gate.wait()
+            return MockRawResponse(BODY)
+
+        monkeypatch.setattr(homework, 'request_api', mock_request_api)
+        headers = homework.make_headers('token')
+        results = call_concurrently(
+            lambda: homework.process_yandex_api(100, headers, {}), gate)
+        assert requests_made == [100], (
+            'Одинаковые запросы к API должны делить один поход и разбор'
+        )
+        assert all(result == results[0] for result in results)
+        assert len({id(result) for result in results}) == CALLERS, (
+            'Каждый вызов получает свой словарь состояния'
+        )
+
+    def test_different_queries_are_not_coalesced(self, monkeypatch):
+        queries = []
+
+        def mock_request_api(current_timestamp, headers, etag=None):
+            queries.append((headers['Authorization'], current_timestamp))
+            return MockRawResponse(BODY)
+
+        monkeypatch.setattr(homework, 'request_api', mock_request_api)
+        homework.process_yandex_api(100, homework.make_headers('a'), {})
+        homework.process_yandex_api(100, homework.make_headers('b'), {})
+        homework.process_yandex_api(200, homework.make_headers('b'), {})
+        assert queries == [('OAuth a', 100), ('OAuth b', 100),
+                           ('OAuth b', 200)]
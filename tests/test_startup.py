@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+import threading
+
+from outbox import LazyBot
+from startup import LazyModule, StartupTimer
+from tests.utils import FakeClock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestStartup:
+
+    def test_heavy_modules_are_not_imported(self):
+        code = ('import sys, homework; print(sorted(m for m in '
+                '("telegram", "requests", "http.server") '
+                'if m in sys.modules))')
+        output = subprocess.run([sys.executable, '-c', code], cwd=ROOT,
+                                capture_output=True, text=True, check=True)
+        assert output.stdout.strip() == '[]', (
+            'Импорт homework не должен тянуть telegram, requests '
+            'и http.server'
+        )
+
+    def test_lazy_module(self):
+        module = LazyModule('json')
+        assert module.module is None, 'До обращения модуль не грузим'
+        assert module.dumps([1]) == '[1]'
+        assert module.module is sys.modules['json']
+
+    def test_lazy_bot_is_created_once(self):
+        created = []
+
+        class Bot:
+            def send_message(self, **kwargs):
+                return kwargs['text']
+
+        def factory():
+            created.append(1)
+            return Bot()
+
+        bot = LazyBot(factory)
+        assert created == [], 'Бот создаётся только при первой отправке'
+        threads = [
+            threading.Thread(target=bot.send_message,
+                             kwargs={'chat_id': 1, 'text': 'hi'})
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert created == [1], 'Бот должен создаваться один раз'
+
+    def test_timer_breakdown(self, caplog):
+        clock = FakeClock(0.0)
+        timer = StartupTimer(clock)
+        clock.now = 0.01
+        timer.mark('import')
+        clock.now = 0.25
+        timer.mark('first_poll')
+        timer.imports['requests'] = 0.2
+        with caplog.at_level('INFO'):
+            timer.report()
+            timer.report()
+        messages = [record.getMessage() for record in caplog.records]
+        assert messages == [
+            'Старт за 250.0 мс: import=10.0, first_poll=240.0; '
+            'отложенные импорты: requests=200.0'
+        ], 'Разбивка старта пишется в лог один раз'
@@ -0,0 +1,98 @@
+import homework
+
+
+def make_state(homeworks, full_resync=True):
+    return {
+        'global_error': 0,
+        'homeworks_state': [
+            homework.parse_hw_with_error(hw) for hw in homeworks
+        ],
+        'current_date': 1,
+        'full_resync': full_resync,
+    }
+
+
+class TestHomeworkState:
+
+    def test_only_needed_fields_are_kept(self):
+        hw_state = homework.parse_hw_with_error({
+            'id': 123,
+            'status': 'approved',
+            'homework_name': 'hw123',
+            'reviewer_comment': 'Всё нравится',
+            'date_updated': '2020-02-13T14:40:57Z',
+            'lesson_name': 'Итоговый проект',
+        })
+        assert isinstance(hw_state, homework.HomeworkState)
+        assert not hasattr(hw_state, '__dict__'), (
+            'Запись о ДЗ должна быть компактной, на `__slots__`'
+        )
+        assert hw_state.to_list() == [123, 'hw123', 'approved', 0]
+        assert hw_state.key == 123, 'Ключ записи — id домашки'
+
+    def test_renamed_homework_is_not_new(self):
+        storage = homework.new_storage()
+        storage, _ = homework.control_state(make_state([
+            {'id': 1, 'homework_name': 'old.zip', 'status': 'reviewing'}
+        ]), storage)
+        storage, messages = homework.control_state(make_state([
+            {'id': 1, 'homework_name': 'new.zip', 'status': 'approved'}
+        ]), storage)
+        assert len(storage['homeworks_state']) == 1
+        assert messages == [
+            'Изменился статус проверки работы "new.zip".'
+            + homework.VERDICT_STATUSES['approved']
+        ]
+
+    def test_snapshot_roundtrip(self, tmp_path):
+        path = str(tmp_path / 'storage.json')
+        storage = homework.new_storage()
+        storage, _ = homework.control_state(make_state([
+            {'id': 1, 'homework_name': 'hw1', 'status': 'reviewing'},
+            {'homework_name': 'hw2', 'status': 'approved'},
+        ]), storage)
+        homework.persist_storage(storage, path)
+        restored = homework.restore_storage(path)
+        assert restored['homeworks_state'] == storage['homeworks_state'], (
+            'Записи о ДЗ должны восстанавливаться из снимка с теми же ключами'
+        )
+
+
+class TestDiffEngine:
+
+    def test_changeset(self):
+        old_state = {}
+        for hw in ({'id': 1, 'homework_name': 'hw1', 'status': 'reviewing'},
+                   {'id': 2, 'homework_name': 'hw2', 'status': 'reviewing'},
+                   {'id': 3, 'homework_name': 'hw3', 'status': 'approved'}):
+            hw_state = homework.parse_hw_with_error(hw)
+            old_state[hw_state.key] = hw_state
+        new_states = [homework.parse_hw_with_error(hw) for hw in (
+            {'id': 1, 'homework_name': 'hw1', 'status': 'reviewing'},
+            {'id': 2, 'homework_name': 'hw2', 'status': 'approved'},
+            {'id': 4, 'homework_name': 'hw4', 'status': 'reviewing'},
+        )] + [homework.HomeworkState.from_error('Пустая запись ДЗ')]
+        changeset = homework.diff_homeworks(old_state, new_states,
+                                            full_resync=True)
+        assert [hw.key for hw in changeset.added] == [4]
+        assert [hw.key for hw in changeset.changed] == [2]
+        assert [hw.key for hw in changeset.removed] == [3]
+        assert len(changeset.broken) == 1
+
+        changeset = homework.diff_homeworks(old_state, new_states)
+        assert changeset.removed == [], (
+            'Инкрементальный ответ неполный: пропавшие домашки '
+            'ищем только при полной ресинхронизации'
+        )
+
+    def test_removed_homework_message(self):
+        storage = homework.new_storage()
+        storage, _ = homework.control_state(make_state([
+            {'id': 1, 'homework_name': 'hw1', 'status': 'reviewing'}
+        ]), storage)
+        storage, messages = homework.control_state(make_state(
+            [], full_resync=False), storage)
+        assert messages == [] and len(storage['homeworks_state']) == 1
+        storage, messages = homework.control_state(make_state([]), storage)
+        assert messages == ['Домашка hw1 пропала из ответа API.']
+        assert storage['homeworks_state'] == {}
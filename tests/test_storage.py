@@ -0,0 +1,32 @@
+import os
+
+import storage
+
+
+class TestStorageSnapshot:
+
+    def test_save_and_load(self, tmp_path, random_timestamp):
+        path = str(tmp_path / 'storage.json')
+        homework_storage = {
+            'global_error': 0,
+            'homeworks_state': {
+                'hw123': {'homework_name': 'hw123', 'status': 'approved',
+                          'error': 0}
+            },
+            'current_date': random_timestamp,
+        }
+        storage.save_storage(path, homework_storage)
+        assert storage.load_storage(path) == homework_storage, (
+            'Снимок хранилища должен загружаться без изменений'
+        )
+        assert os.listdir(tmp_path) == ['storage.json'], (
+            'После сохранения не должно оставаться временных файлов'
+        )
+
+    def test_load_missing_or_broken(self, tmp_path):
+        path = tmp_path / 'storage.json'
+        assert storage.load_storage(str(path)) is None
+        path.write_text('{"version": 2, "stor')
+        assert storage.load_storage(str(path)) is None, (
+            'Битый снимок нужно игнорировать, а не падать'
+        )
@@ -0,0 +1,104 @@
+import json
+
+import pytest
+import requests
+
+import homework
+from stream import HomeworksStream
+
+
+def make_body(size):
+    return json.dumps({
+        'homeworks': [
+            {'id': number, 'homework_name': f'hw{number}',
+             'status': 'approved', 'reviewer_comment': 'Всё нравится'}
+            for number in range(size)
+        ],
+        'current_date': 1000198000,
+    }, ensure_ascii=False).encode()
+
+
+def split(body, size):
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+class MockStreamResponse:
+    status_code = 200
+
+    def __init__(self, body):
+        self.body = body
+        self.headers = {'Transfer-Encoding': 'chunked'}
+
+    def iter_content(self, chunk_size):
+        return iter(split(self.body, chunk_size))
+
+    def close(self):
+        pass
+
+
+class TestHomeworksStream:
+
+    @pytest.mark.parametrize('chunk_size', [1, 5, 4096])
+    def test_records_match_json(self, chunk_size):
+        body = make_body(50)
+        stream = HomeworksStream(split(body, chunk_size))
+        assert list(stream) == json.loads(body)['homeworks']
+        assert stream.document == {
+            'homeworks': [], 'current_date': 1000198000
+        }
+
+    def test_records_are_yielded_lazily(self):
+        consumed = []
+
+        def chunks():
+            for chunk in split(make_body(1000), 256):
+                consumed.append(chunk)
+                yield chunk
+
+        next(iter(HomeworksStream(chunks())))
+        assert len(consumed) == 1, (
+            'Первая запись должна отдаваться до чтения всего ответа'
+        )
+
+    def test_fingerprint_ignores_current_date(self):
+        body = make_body(3)
+        other = body.replace(b'1000198000', b'1000198999')
+        first = HomeworksStream([body])
+        second = HomeworksStream([other])
+        list(first), list(second)
+        assert first.fingerprint == second.fingerprint
+
+    def test_broken_body(self):
+        with pytest.raises(ValueError):
+            list(HomeworksStream([b'{"homeworks": [{"id": 1},']))
+
+
+class TestStreamingIngestion:
+
+    def test_process_large_response(self, monkeypatch):
+        monkeypatch.setattr(homework, 'request_api', lambda *args:
+                            MockStreamResponse(make_body(100)))
+        storage = homework.new_storage()
+        state = homework.process_yandex_api(0, previous=storage)
+        assert len(state['homeworks_state']) == 100
+        assert state['current_date'] == 1000198000
+        storage, _ = homework.control_state(state, storage)
+
+        state = homework.process_yandex_api(1000198000, previous=storage)
+        assert state['unchanged'], (
+            'Совпавший потоковый ответ не нужно диффать заново'
+        )
+
+    def test_broken_chunked_body(self, monkeypatch):
+        def broken_chunks(chunk_size):
+            yield make_body(10)[:50]
+            raise requests.exceptions.ChunkedEncodingError('оборвалось')
+
+        response = MockStreamResponse(b'')
+        response.iter_content = broken_chunks
+        monkeypatch.setattr(homework, 'request_api', lambda *args: response)
+        state = homework.process_yandex_api(0, previous={})
+        assert state['global_error'] == homework.EXCEPTION_TO_STR[
+            homework.YandexRequestException], (
+            'Обрыв тела ответа — это недоступность API, а не падение бота'
+        )
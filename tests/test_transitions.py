@@ -0,0 +1,70 @@
+import homework
+from transitions import RECORD, Transition, TransitionLog
+from tests.utils import MockRawResponse, RecordingOutbox
+
+
+def body(status):
+    return (b'{"homeworks": [{"id": 1, "homework_name": "hw1", '
+            b'"status": "' + status.encode() + b'"}], "current_date": 100}')
+
+
+class TestTransitionLog:
+
+    def test_timeline_and_scan(self, tmp_path):
+        log = TransitionLog(str(tmp_path / 'hw.transitions'))
+        assert log.timeline(1) == [] and list(log.scan()) == []
+        log.append([(1, 'reviewing'), (2, 'reviewing')], timestamp=100)
+        log.append([(1, 'rejected')], timestamp=200)
+        assert log.timeline(1) == [Transition(1, 'reviewing', 100),
+                                   Transition(1, 'rejected', 200)]
+        log.append([(1, 'approved'), ('без id', 'approved')],
+                   timestamp=300)
+        assert log.timeline(1)[-1] == Transition(1, 'approved', 300), (
+            'Индекс должен дочитывать новые записи'
+        )
+        assert len(log) == 4, 'Домашки без id в лог не попадают'
+        assert [record.homework_id for record in log.scan(100, 200)] == [
+            1, 2]
+        assert list(log.scan(250)) == [Transition(1, 'approved', 300)]
+        assert (tmp_path / 'hw.transitions').stat().st_size == (
+            4 * RECORD.size), 'Записи фиксированной ширины'
+
+    def test_time_never_goes_back(self, tmp_path):
+        log = TransitionLog(str(tmp_path / 'hw.transitions'))
+        log.append([(1, 'reviewing')], timestamp=500)
+        log.append([(1, 'approved')], timestamp=400)
+        assert [record.timestamp for record in log.timeline(1)] == [
+            500, 500], 'Порядок по времени нужен для среза двоичным поиском'
+
+    def test_torn_record_is_dropped(self, tmp_path):
+        path = tmp_path / 'hw.transitions'
+        log = TransitionLog(str(path))
+        log.append([(1, 'reviewing')], timestamp=100)
+        with open(path, 'ab') as log_file:
+            log_file.write(b'\x01\x02\x03')
+        assert log.timeline(1) == [Transition(1, 'reviewing', 100)]
+        log.append([(1, 'approved')], timestamp=200)
+        assert log.timeline(1) == [Transition(1, 'reviewing', 100),
+                                   Transition(1, 'approved', 200)], (
+            'Недописанная запись не должна сдвигать следующие'
+        )
+
+
+class TestBotTransitions:
+
+    def test_bot_records_status_changes(self, tmp_path, monkeypatch):
+        log = TransitionLog(str(tmp_path / 'hw.transitions'),
+                            clock=lambda: 1000)
+        monkeypatch.setattr(homework, 'request_api',
+                            lambda *args: MockRawResponse(body('reviewing')))
+        storage = homework.bot_startup(homework.new_storage(),
+                                       transitions=log)
+        storage = homework.bot_process(storage, RecordingOutbox(),
+                                       chat_id=1, transitions=log)
+        monkeypatch.setattr(homework, 'request_api',
+                            lambda *args: MockRawResponse(body('approved')))
+        homework.bot_process(storage, RecordingOutbox(), chat_id=1,
+                             transitions=log)
+        assert [record.status for record in log.timeline(1)] == [
+            'reviewing', 'approved'
+        ], 'В лог попадают только смены статуса'
@@ -0,0 +1,60 @@
+import json
+
+import homework
+
+
+class MockJSONResponse:
+    status_code = 200
+
+    def __init__(self, content):
+        self.content = content
+        self.headers = {}
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class TestValidator:
+
+    def test_batch_error_codes(self):
+        errors = homework.validate_homeworks([
+            {'homework_name': 'hw1', 'status': 'approved'},
+            'not a homework',
+            {},
+            {'status': 'approved'},
+            {'homework_name': 'hw2', 'status': 'lost'},
+        ])
+        assert errors == [
+            None,
+            homework.WrongRecordHomeworkException,
+            homework.EmptyHomeworkException,
+            homework.NoKeyInHomeworkException,
+            homework.WrongStatusInHomeworkException,
+        ], 'Валидатор должен вернуть код ошибки для каждой записи'
+
+    def test_parse_homeworks_does_not_raise(self):
+        states = homework.parse_homeworks([
+            {'homework_name': 'hw1', 'status': 'lost'},
+            [],
+        ])
+        assert states[0].status == 'unknown'
+        assert states[0].error == homework.HOMEWORK_EXCEPTIONS_TO_STR[
+            homework.WrongStatusInHomeworkException]
+        assert states[1].homework_name is None
+        assert states[1].error == homework.HOMEWORK_EXCEPTIONS_TO_STR[
+            homework.WrongRecordHomeworkException]
+
+    def test_response_errors_are_mapped(self, monkeypatch):
+        cases = {
+            b'{}': homework.EmptyResponseException,
+            b'[1]': homework.WrongTypeResponseException,
+            b'{"current_date": 1}': homework.NoKeyInResponseException,
+            b'{"homeworks": {}}': homework.WrongKeyTypeResponseException,
+            b'<html>502</html>': homework.WrongTypeResponseException,
+        }
+        for content, exception in cases.items():
+            monkeypatch.setattr(homework, 'request_api', lambda *args:
+                                MockJSONResponse(content))
+            state = homework.process_yandex_api(0)
+            assert state['global_error'] == homework.EXCEPTION_TO_STR[
+                exception], f'Неверная ошибка для ответа {content!r}'
@@ -1,3 +1,4 @@
+import json
 from inspect import signature
 from types import ModuleType
 
@@ -37,3 +38,43 @@ def check_default_var_exists(scope: ModuleType, var_name: str) -> None:
         f'{var_name} должна быть переменной, а не функцией.'
     )
 
+
+class FakeClock:
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class RecordingOutbox:
+
+    def __init__(self):
+        self.sent = []
+        self.replays = 0
+
+    def send(self, chat_id, messages, key=None):
+        self.sent.append((chat_id, messages))
+
+    def replay(self):
+        self.replays += 1
+
+    def messages(self):
+        return [message for _, messages in self.sent for message in messages]
+
+
+class MockRawResponse:
+
+    def __init__(self, content, status_code=200, etag=None):
+        self.content = content
+        self.status_code = status_code
+        self.headers = {'ETag': etag} if etag else {}
+        self.json_calls = 0
+
+    def json(self):
+        self.json_calls += 1
+        return json.loads(self.content)
+
+    def close(self):
+        pass
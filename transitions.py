@@ -0,0 +1,153 @@
+import bisect
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+# Запись фиксированной ширины: id домашки, код статуса, время (13 байт)
+RECORD = struct.Struct('<qBI')
+TIMESTAMP_OFFSET = 9
+TIMESTAMP = struct.Struct('<I')
+# Коды статусов; 'removed' — домашка пропала из ответа API
+STATUSES = ('unknown', 'reviewing', 'approved', 'rejected', 'removed')
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+
+
+class Transition(NamedTuple):
+    """Смена статуса домашки."""
+
+    homework_id: int
+    status: str
+    timestamp: int
+
+
+class Timestamps:
+    """Время записей лога как последовательность для bisect."""
+
+    def __init__(self, buffer, count: int):
+        """Оборачиваем отображённый в память лог."""
+        self.buffer = buffer
+        self.count = count
+
+    def __len__(self):
+        """Число записей."""
+        return self.count
+
+    def __getitem__(self, number: int) -> int:
+        """Время записи number, не распаковывая остальные поля."""
+        return TIMESTAMP.unpack_from(
+            self.buffer, number * RECORD.size + TIMESTAMP_OFFSET)[0]
+
+
+class TransitionLog:
+    """Журнал смен статусов домашек: API хранит только последний.
+    Файл — подряд записи RECORD, только дозапись, так что добавление
+    стоит O(1) и не требует держать файл открытым. Время записей не
+    убывает, поэтому срез по времени ищется двоичным поиском по
+    отображённому в память файлу, а хронология домашки — по индексу
+    id -> номера записей, который строится при первом запросе и потом
+    дочитывает только новый хвост.
+    """
+
+    def __init__(self, path: str, clock=time.time):
+        """Сам файл создаётся с первой записью."""
+        self.path = path
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.index: Dict[int, List[int]] = {}
+        self.indexed = 0
+
+    def append(self, changes, timestamp: Optional[int] = None) -> int:
+        """Дописываем смены статусов: пары (id домашки, статус).
+        Домашки без id пропускаем. Возвращаем число записей.
+        """
+        if timestamp is None:
+            timestamp = int(self.clock())
+        with self.lock, open(self.path, 'a+b') as log_file:
+            size = log_file.seek(0, os.SEEK_END)
+            torn = size % RECORD.size
+            if torn:
+                # Запись, недописанная при падении
+                size -= torn
+                log_file.truncate(size)
+            if size:
+                log_file.seek(size - RECORD.size + TIMESTAMP_OFFSET)
+                last = TIMESTAMP.unpack(log_file.read(TIMESTAMP.size))[0]
+                # Часы могли уйти назад: порядок по времени важнее
+                timestamp = max(timestamp, last)
+            records = b''.join(
+                RECORD.pack(homework_id,
+                            STATUS_CODES.get(status, 0), timestamp)
+                for homework_id, status in changes
+                if isinstance(homework_id, int))
+            log_file.write(records)
+        return len(records) // RECORD.size
+
+    def __len__(self) -> int:
+        """Число записей в логе."""
+        try:
+            return os.path.getsize(self.path) // RECORD.size
+        except FileNotFoundError:
+            return 0
+
+    def mapped(self):
+        """Отображаем лог в память только для чтения, None если он пуст."""
+        try:
+            log_file = open(self.path, 'rb')
+        except FileNotFoundError:
+            return None
+        with log_file:
+            if os.fstat(log_file.fileno()).st_size < RECORD.size:
+                return None
+            return mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @staticmethod
+    def read(buffer, number: int) -> Transition:
+        """Запись с номером number."""
+        homework_id, code, timestamp = RECORD.unpack_from(
+            buffer, number * RECORD.size)
+        return Transition(homework_id, STATUSES[code], timestamp)
+
+    def timeline(self, homework_id: int) -> List[Transition]:
+        """Все смены статусов домашки по порядку."""
+        buffer = self.mapped()
+        if buffer is None:
+            return []
+        with buffer:
+            count = len(buffer) // RECORD.size
+            with self.lock:
+                self.extend_index(buffer, count)
+                numbers = list(self.index.get(homework_id, ()))
+            return [self.read(buffer, number) for number in numbers
+                    if number < count]
+
+    def extend_index(self, buffer, count: int) -> None:
+        """Дочитываем в индекс записи, появившиеся с прошлого запроса."""
+        if count < self.indexed:
+            # Лог подменили: строим индекс заново
+            self.index, self.indexed = {}, 0
+        tail = memoryview(buffer)[self.indexed * RECORD.size:
+                                  count * RECORD.size]
+        try:
+            for number, (homework_id, _, _) in enumerate(
+                    RECORD.iter_unpack(tail), self.indexed):
+                self.index.setdefault(homework_id, []).append(number)
+        finally:
+            tail.release()
+        self.indexed = count
+
+    def scan(self, start: int = 0,
+             end: Optional[int] = None) -> Iterator[Transition]:
+        """Смены статусов всех домашек со временем в [start, end)."""
+        buffer = self.mapped()
+        if buffer is None:
+            return
+        with buffer:
+            timestamps = Timestamps(buffer, len(buffer) // RECORD.size)
+            first = bisect.bisect_left(timestamps, start)
+            last = (len(timestamps) if end is None
+                    else bisect.bisect_left(timestamps, end, first))
+            for number in range(first, last):
+                yield self.read(buffer, number)